@@ -1,928 +1,2550 @@
 #kerjaan bagian radit.
 
 
+import contextvars
+import csv
+import io
+import json
+import logging
+import re
+import select
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date
+
 import streamlit as st
 import psycopg2
-from psycopg2 import sql, extras
-import pandas as pd
+from psycopg2 import sql, extensions, pool
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+# pandas, pyarrow dan psycopg2.extras diimpor di dalam fungsi yang memakainya:
+# halaman tanpa tabel (beranda, form) tidak perlu menunggu modul-modul berat itu
+# dimuat. Anggaran waktu impor dicek dengan `python kelola.py waktu-impor`.
+
+# -------------------- KONFIGURASI --------------------
+# Bagian secrets database bawaan; outlet yang tidak ada di [outlet] memakainya
+DATABASE_UTAMA = 'database'
+
+# st.secrets dibaca sekali per proses menjadi satu objek; bagian lain memakai
+# get_konfigurasi() alih-alih membaca dan mengonversi secrets sendiri.
+@dataclass(frozen=True)
+class Konfigurasi:
+    koneksi: dict
+    # Nama bagian secrets -> kunci koneksi; 'database' selalu ada
+    database: dict
+    # outlet_id -> nama bagian secrets database-nya (bagian [outlet], opsional)
+    outlet_database: dict
+    pool_min: int
+    pool_max: int
+    pool_timeout: float
+    pool_idle_check: float
+    auto_migrate: bool
+    cache_ttl: float
+    cache_maks_entri: int
+    diagnostik_tampil: bool
+    ukuran_buffer: int
+    ambang_lambat_ms: float
+    # Opsional: [database_replika] untuk query baca; None berarti semua ke primer
+    replika: dict | None
+    replika_pool_max: int
+    replika_batas_lag: float
+    # Berkas SQLite jurnal offline (relatif ke direktori kerja) dan ukuran batch kirim ulang
+    jurnal_berkas: str
+    jurnal_batch: int
+
+@st.cache_resource
+def get_konfigurasi():
+    db = st.secrets["database"]
+    koneksi = {k: db[k] for k in ('dbname', 'user', 'password', 'host', 'port')}
+    outlet_database = dict(st.secrets.get("outlet", {}))
+    # Kunci koneksi yang tidak diisi di [database_replika] atau bagian database
+    # outlet ikut [database]
+    database = {DATABASE_UTAMA: koneksi}
+    for nama in set(outlet_database.values()) - {DATABASE_UTAMA}:
+        database[nama] = {k: st.secrets[nama].get(k, db[k]) for k in koneksi}
+    replika = st.secrets.get("database_replika")
+    cache = st.secrets.get("cache", {})
+    diagnostik = st.secrets.get("diagnostik", {})
+    jurnal = st.secrets.get("jurnal", {})
+    return Konfigurasi(
+        koneksi=koneksi,
+        database=database,
+        outlet_database=outlet_database,
+        pool_min=int(db.get("pool_min", 1)),
+        pool_max=int(db.get("pool_max", 10)),
+        pool_timeout=float(db.get("pool_timeout", 10)),
+        pool_idle_check=float(db.get("pool_idle_check", 30)),
+        auto_migrate=bool(db.get("auto_migrate", False)),
+        cache_ttl=float(cache.get("ttl", 300)),
+        cache_maks_entri=int(cache.get("maks_entri", 500)),
+        diagnostik_tampil=bool(diagnostik.get("tampil", False)),
+        ukuran_buffer=int(diagnostik.get("ukuran_buffer", 5000)),
+        ambang_lambat_ms=float(diagnostik.get("ambang_lambat_ms", 500)),
+        replika={k: replika.get(k, db[k]) for k in ('dbname', 'user', 'password', 'host', 'port')} if replika else None,
+        replika_pool_max=int((replika or {}).get("pool_max", db.get("pool_max", 10))),
+        replika_batas_lag=float((replika or {}).get("batas_lag_detik", 5)),
+        jurnal_berkas=str(jurnal.get("berkas", "jurnal_offline.sqlite3")),
+        jurnal_batch=int(jurnal.get("batch", 100)),
+    )
+
+# -------------------- INSTRUMENTASI --------------------
+# Setiap query dicatat durasinya per fungsi pemanggil dan per fase: tunggu
+# koneksi, eksekusi, ambil hasil, bangun DataFrame dan render. Catatan disimpan
+# di ring buffer memori proses (hilang saat restart) dan diringkas di halaman
+# Diagnostik. Query yang melewati ambang atau gagal juga ditulis ke log beserta
+# bentuk parameternya (tipe, bukan nilai).
+log = logging.getLogger("restorify")
+
+# Fungsi perantara yang dilewati saat mencari fungsi pemanggil sebuah query
+FUNGSI_PERANTARA = {
+    'fungsi_pemanggil', 'catat_waktu', 'ukur', '_ukur', 'execute', 'executemany', 'copy_expert',
+    'fetchone', 'fetchmany', 'fetchall', 'pinjam', 'get_connection', 'get_connection_baca', 'jalankan', 'tulis', '<lambda>',
+    '_baca_cache', '_baca', 'baca_tercache', 'baca_tabel', 'jalankan_tanpa_transaksi', 'tampilkan_dataframe',
+}
+
+class Instrumen:
+    def __init__(self, ukuran, ambang_lambat_ms):
+        # (waktu, fungsi, fase, durasi detik, gagal)
+        self.catatan = deque(maxlen=ukuran)
+        # (waktu, fungsi, fase, durasi detik, gagal, query, bentuk parameter)
+        self.lambat = deque(maxlen=200)
+        self.ambang_lambat_ms = ambang_lambat_ms
+        self._kunci = threading.Lock()
+
+    def catat(self, fungsi, fase, durasi, gagal=False):
+        with self._kunci:
+            self.catatan.append((time.time(), fungsi, fase, durasi, gagal))
+
+    def catat_lambat(self, fungsi, fase, durasi, gagal, query, bentuk):
+        with self._kunci:
+            self.lambat.append((time.time(), fungsi, fase, durasi, gagal, query, bentuk))
+
+    def salinan(self):
+        with self._kunci:
+            return list(self.catatan), list(self.lambat)
+
+    def kosongkan(self):
+        with self._kunci:
+            self.catatan.clear()
+            self.lambat.clear()
+
+@st.cache_resource
+def get_instrumen():
+    konfigurasi = get_konfigurasi()
+    return Instrumen(ukuran=konfigurasi.ukuran_buffer, ambang_lambat_ms=konfigurasi.ambang_lambat_ms)
+
+def fungsi_pemanggil():
+    frame = sys._getframe(1)
+    while frame is not None:
+        kode = frame.f_code
+        if kode.co_filename == __file__ and kode.co_name not in FUNGSI_PERANTARA:
+            return kode.co_name
+        frame = frame.f_back
+    return '?'
+
+def bentuk_params(params):
+    if params is None:
+        return '-'
+    if isinstance(params, dict):
+        return '{' + ', '.join(f"{k}: {bentuk_params(v) if isinstance(v, (list, tuple)) else type(v).__name__}"
+                               for k, v in params.items()) + '}'
+    if isinstance(params, (list, tuple)):
+        if len(params) > 10:
+            return f"{type(params).__name__}[{len(params)}]"
+        return '(' + ', '.join(bentuk_params(v) if isinstance(v, (list, tuple)) else type(v).__name__
+                               for v in params) + ')'
+    return type(params).__name__
+
+def catat_waktu(fase, durasi, gagal=False, query=None, params=None, kursor=None):
+    instrumen = get_instrumen()
+    fungsi = fungsi_pemanggil()
+    instrumen.catat(fungsi, fase, durasi, gagal)
+    if query is None or not (gagal or durasi * 1000 >= instrumen.ambang_lambat_ms):
+        return
+    try:
+        teks = query.as_string(kursor) if isinstance(query, sql.Composable) else query
+        teks = teks.decode() if isinstance(teks, bytes) else teks
+        teks = ' '.join(teks.split())[:500]
+    except Exception:
+        teks = '<query tidak bisa ditampilkan>'
+    bentuk = bentuk_params(params)
+    instrumen.catat_lambat(fungsi, fase, durasi, gagal, teks, bentuk)
+    if gagal:
+        log.error("Query gagal di %s setelah %.0f ms: %s params=%s", fungsi, durasi * 1000, teks, bentuk)
+    else:
+        log.warning("Query lambat (%.0f ms) di %s: %s params=%s", durasi * 1000, fungsi, teks, bentuk)
+
+@contextmanager
+def ukur(fase):
+    mulai = time.perf_counter()
+    try:
+        yield
+    finally:
+        catat_waktu(fase, time.perf_counter() - mulai)
+
+class KursorTerukur(extensions.cursor):
+    def _ukur(self, fase, fungsi, query, params, *args):
+        mulai = time.perf_counter()
+        gagal = False
+        try:
+            return fungsi(*args)
+        except Exception:
+            gagal = True
+            raise
+        finally:
+            catat_waktu(fase, time.perf_counter() - mulai, gagal, query, params, self)
+
+    def execute(self, query, params=None):
+        return self._ukur('eksekusi', super().execute, query, params, query, params)
+
+    def executemany(self, query, params_list):
+        return self._ukur('eksekusi', super().executemany, query, None, query, params_list)
+
+    def copy_expert(self, query, berkas, size=8192):
+        return self._ukur('eksekusi', super().copy_expert, query, None, query, berkas, size)
+
+    def fetchone(self):
+        return self._ukur('ambil', super().fetchone, None, None)
+
+    def fetchmany(self, size=None):
+        return self._ukur('ambil', super().fetchmany, None, None, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._ukur('ambil', super().fetchall, None, None)
+
+def tampilkan_dataframe(rows, kolom):
+    import pandas as pd
+    with ukur('dataframe'):
+        df = pd.DataFrame(rows, columns=kolom)
+    with ukur('render'):
+        st.dataframe(df)
+    return df
 
 # -------------------- KONEKSI DATABASE --------------------
+# Satu pool per database untuk seluruh proses: semua sesi (tablet) berbagi
+# koneksi yang sama, jadi tiap render tidak lagi membayar handshake TCP +
+# autentikasi baru. get_connection() memilih pool database outlet aktif.
+class KoneksiRestorify(extensions.connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Nama statement yang sudah di-PREPARE di sesi server koneksi ini
+        self.prepared = set()
+        self.cursor_factory = KursorTerukur
+        # Pool tempat koneksi ini dipinjam (primer atau replika)
+        self.pool_asal = None
+
+class PoolKoneksi(pool.ThreadedConnectionPool):
+    def __init__(self, minconn, maxconn, timeout, batas_idle, **kwargs):
+        super().__init__(minconn, maxconn, **kwargs)
+        # psycopg2 menutup koneksi di atas minconn saat dikembalikan;
+        # simpan semua koneksi idle sampai maxconn agar tidak connect ulang.
+        self.minconn = maxconn
+        self._slot = threading.BoundedSemaphore(maxconn)
+        self._timeout = timeout
+        self._batas_idle = batas_idle
+        self._terakhir_dipakai = {}
+
+    def pinjam(self):
+        mulai = time.perf_counter()
+        # Tunggu slot kosong alih-alih langsung gagal saat semua koneksi terpakai
+        if not self._slot.acquire(timeout=self._timeout):
+            catat_waktu('tunggu_koneksi', time.perf_counter() - mulai, gagal=True)
+            raise pool.PoolError("Semua koneksi database sedang dipakai, coba lagi.")
+        try:
+            conn = self.getconn()
+            if not self._masih_hidup(conn):
+                self._buang(conn)
+                conn = self.getconn()
+        except Exception:
+            self._slot.release()
+            catat_waktu('tunggu_koneksi', time.perf_counter() - mulai, gagal=True)
+            raise
+        catat_waktu('tunggu_koneksi', time.perf_counter() - mulai)
+        conn.pool_asal = self
+        return conn
+
+    def kembalikan(self, conn):
+        try:
+            if conn.closed:
+                self._buang(conn)
+            else:
+                self._terakhir_dipakai[id(conn)] = time.monotonic()
+                self.putconn(conn)
+        finally:
+            self._slot.release()
+
+    def _buang(self, conn):
+        self._terakhir_dipakai.pop(id(conn), None)
+        self.putconn(conn, close=True)
+
+    def _masih_hidup(self, conn):
+        if conn.closed:
+            return False
+        # Koneksi yang baru saja dipakai dianggap sehat; yang lama idle di-ping dulu
+        terakhir = self._terakhir_dipakai.get(id(conn))
+        if terakhir is not None and time.monotonic() - terakhir < self._batas_idle:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+@st.cache_resource
+def get_pool(database=DATABASE_UTAMA):
+    konfigurasi = get_konfigurasi()
+    return PoolKoneksi(
+        minconn=konfigurasi.pool_min,
+        maxconn=konfigurasi.pool_max,
+        timeout=konfigurasi.pool_timeout,
+        batas_idle=konfigurasi.pool_idle_check,
+        connection_factory=KoneksiRestorify,
+        **konfigurasi.database[database]
+    )
+
+@st.cache_resource
+def get_pool_replika():
+    konfigurasi = get_konfigurasi()
+    if konfigurasi.replika is None:
+        return None
+    # minconn=0: replika yang sedang mati tidak boleh menggagalkan pembuatan pool
+    return PoolKoneksi(
+        minconn=0,
+        maxconn=konfigurasi.replika_pool_max,
+        timeout=konfigurasi.pool_timeout,
+        batas_idle=konfigurasi.pool_idle_check,
+        connection_factory=KoneksiRestorify,
+        **konfigurasi.replika
+    )
+
 def get_connection():
     try:
-        conn = psycopg2.connect(
-            dbname=st.secrets["database"]["dbname"],
-            user=st.secrets["database"]["user"],
-            password=st.secrets["database"]["password"],
-            host=st.secrets["database"]["host"],
-            port=st.secrets["database"]["port"]
-        )
-        return conn
+        return get_pool(database_aktif()).pinjam()
     except Exception as e:
         st.error(f"Error connecting to database: {e}")
         return None
 
-# -------------------- CRUD FUNCTIONS --------------------
-# -------------------- KARYAWAN --------------------
-# Tambah Karyawan
-def tambah_karyawan(karyawan_id, employee_name, position, fingerprint_id=None):
-    conn = get_connection()
+def release_connection(conn):
+    conn.pool_asal.kembalikan(conn)
+
+# -------------------- REPLIKA BACA --------------------
+# Query baca-saja (lihat_*, laporan, pemilih baris, ekspor) boleh ke replika,
+# tulis selalu ke primer. Thread latar tiap JEDA_CEK_REPLIKA detik mencatat
+# LSN primer lalu memeriksa apakah replika sudah memutar ulang WAL sampai situ;
+# kalau ya, replika dijamin memuat semua commit sebelum saat pencatatan itu.
+# Baca diarahkan ke replika hanya bila tabelnya tidak ditulis proses ini sejak
+# saat tersebut (sesi langsung melihat tulisannya sendiri, dan cache tidak
+# terisi data lama), replika tidak tertinggal lebih dari batas_lag_detik, dan
+# replika bisa dihubungi. Selain itu baca jatuh ke primer.
+JEDA_CEK_REPLIKA = 1
+
+class StatusReplika:
+    def __init__(self, primer, replika, batas_lag):
+        self.primer = primer
+        self.replika = replika
+        self.batas_lag = batas_lag
+        # time.monotonic() terakhir saat replika dipastikan sudah menyusul primer
+        self.segar_sampai = None
+        self.galat = None
+        threading.Thread(target=self._jalan, name="status-replika", daemon=True).start()
+
+    def lag(self):
+        if self.segar_sampai is None:
+            return None
+        return time.monotonic() - self.segar_sampai
+
+    def boleh_dibaca(self, ditulis_terakhir):
+        lag = self.lag()
+        return (self.galat is None and lag is not None and lag <= self.batas_lag
+                and (ditulis_terakhir is None or ditulis_terakhir < self.segar_sampai))
+
+    def tandai_gagal(self, galat):
+        # Dipulihkan oleh pengecekan berikutnya yang berhasil
+        self.galat = str(galat)
+        log.warning("Replika tidak bisa dipakai, baca dialihkan ke primer: %s", galat)
+
+    def _jalan(self):
+        primer = replika = None
+        while True:
+            try:
+                if primer is None or primer.closed:
+                    primer = psycopg2.connect(**self.primer)
+                    primer.autocommit = True
+                if replika is None or replika.closed:
+                    replika = psycopg2.connect(**self.replika)
+                    replika.autocommit = True
+                # Waktu dicatat sebelum membaca LSN primer, jadi semua commit
+                # sebelum saat ini sudah tercakup oleh LSN tersebut
+                saat = time.monotonic()
+                with primer.cursor() as cursor:
+                    cursor.execute('SELECT pg_current_wal_lsn()')
+                    lsn = cursor.fetchone()[0]
+                with replika.cursor() as cursor:
+                    cursor.execute('SELECT pg_is_in_recovery() AND pg_last_wal_replay_lsn() >= %s::pg_lsn', (lsn,))
+                    if cursor.fetchone()[0]:
+                        self.segar_sampai = saat
+                self.galat = None
+            except Exception as e:
+                if self.galat is None:
+                    log.warning("Pengecekan replika gagal: %s", e)
+                self.galat = str(e)
+                for conn in (primer, replika):
+                    if conn is not None:
+                        conn.close()
+                primer = replika = None
+            time.sleep(JEDA_CEK_REPLIKA)
+
+@st.cache_resource
+def get_status_replika():
+    konfigurasi = get_konfigurasi()
+    if konfigurasi.replika is None:
+        return None
+    return StatusReplika(konfigurasi.koneksi, konfigurasi.replika, konfigurasi.replika_batas_lag)
+
+def get_connection_baca(tabel=None):
+    # tabel: tabel yang dibaca query; None berarti bisa tabel mana saja.
+    # Replika hanya ada untuk database utama, outlet di database lain ke primernya.
+    status = get_status_replika()
+    if status is None or database_aktif() != DATABASE_UTAMA:
+        return get_connection()
+    if tabel is not None:
+        tabel = [(DATABASE_UTAMA, t) for t in tabel]
+    if status.boleh_dibaca(get_cache_baca().ditulis_terakhir(tabel)):
+        try:
+            return get_pool_replika().pinjam()
+        except Exception as e:
+            status.tandai_gagal(e)
+    return get_connection()
+
+# -------------------- OUTLET --------------------
+# karyawan, transaksi, bahan_baku, absensi dan feedback dimiliki satu outlet
+# (kolom outlet_id); statement repositori, laporan, pemilih baris dan ekspor
+# selalu disaring ke outlet aktif. pelanggan, supplier, menu dan resep dipakai
+# bersama oleh outlet di database yang sama. Bagian [outlet] di secrets memetakan
+# outlet_id ke bagian database lain (mis. CBG02 = "database_cbg02"), jadi outlet
+# yang ramai bisa ditempatkan di instance sendiri; outlet yang tidak dipetakan
+# tinggal di [database].
+OUTLET_UTAMA = 'UTAMA'
+# Outlet untuk kode di luar sesi Streamlit (worker dasbor, kelola.py)
+OUTLET_AKTIF = contextvars.ContextVar('outlet_aktif', default=OUTLET_UTAMA)
+
+def outlet_aktif():
+    # Di thread skrip (termasuk callback tombol yang jalan sebelum sidebar
+    # digambar) pilihan sidebar dibaca langsung dari session_state
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        return st.session_state.get('outlet', OUTLET_AKTIF.get())
+    return OUTLET_AKTIF.get()
+
+def database_aktif():
+    return get_konfigurasi().outlet_database.get(outlet_aktif(), DATABASE_UTAMA)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def daftar_outlet():
+    # Tiap database hanya menyumbang outlet yang memang dirutekan ke sana
+    konfigurasi = get_konfigurasi()
+    outlet = {}
+    for database in konfigurasi.database:
+        try:
+            conn = get_pool(database).pinjam()
+        except Exception as e:
+            log.warning("Database %s tidak bisa dihubungi, outletnya tidak ditampilkan: %s", database, e)
+            continue
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT to_regclass('outlet') IS NOT NULL")
+                if cursor.fetchone()[0]:
+                    cursor.execute('SELECT outlet_id, nama_outlet FROM outlet')
+                    for outlet_id, nama in cursor.fetchall():
+                        if konfigurasi.outlet_database.get(outlet_id, DATABASE_UTAMA) == database:
+                            outlet[outlet_id] = nama
+            conn.commit()
+        finally:
+            release_connection(conn)
+    return {o: outlet[o] for o in sorted(outlet, key=lambda o: (o != OUTLET_UTAMA, o))}
+
+# Database lama: semua data yang sudah ada menjadi milik outlet UTAMA. Kunci
+# bahan_baku menjadi (outlet_id, bahan_id) supaya tiap cabang punya stok sendiri
+# untuk kode bahan yang sama; resep merujuk kode bahan itu tanpa foreign key.
+DDL_OUTLET = '''
+CREATE TABLE IF NOT EXISTS outlet (
+    outlet_id text PRIMARY KEY,
+    nama_outlet text NOT NULL
+);
+INSERT INTO outlet (outlet_id, nama_outlet) VALUES ('UTAMA', 'Outlet Utama') ON CONFLICT DO NOTHING;
+
+ALTER TABLE karyawan ADD COLUMN IF NOT EXISTS outlet_id text NOT NULL DEFAULT 'UTAMA' REFERENCES outlet (outlet_id);
+ALTER TABLE bahan_baku ADD COLUMN IF NOT EXISTS outlet_id text NOT NULL DEFAULT 'UTAMA' REFERENCES outlet (outlet_id);
+ALTER TABLE transaksi ADD COLUMN IF NOT EXISTS outlet_id text NOT NULL DEFAULT 'UTAMA' REFERENCES outlet (outlet_id);
+ALTER TABLE feedback ADD COLUMN IF NOT EXISTS outlet_id text NOT NULL DEFAULT 'UTAMA' REFERENCES outlet (outlet_id);
+ALTER TABLE absensi ADD COLUMN IF NOT EXISTS outlet_id text NOT NULL DEFAULT 'UTAMA' REFERENCES outlet (outlet_id);
+ALTER TABLE transaksi_harian ADD COLUMN IF NOT EXISTS outlet_id text NOT NULL DEFAULT 'UTAMA';
+-- Setelah data lama terisi, outlet wajib diberikan saat insert
+ALTER TABLE karyawan ALTER COLUMN outlet_id DROP DEFAULT;
+ALTER TABLE bahan_baku ALTER COLUMN outlet_id DROP DEFAULT;
+ALTER TABLE transaksi ALTER COLUMN outlet_id DROP DEFAULT;
+ALTER TABLE feedback ALTER COLUMN outlet_id DROP DEFAULT;
+ALTER TABLE absensi ALTER COLUMN outlet_id DROP DEFAULT;
+ALTER TABLE transaksi_harian ALTER COLUMN outlet_id DROP DEFAULT;
+
+DO $$
+DECLARE
+    c record;
+BEGIN
+    -- Foreign key ke bahan_baku (resep) dan primary key satu kolom diganti
+    FOR c IN
+        SELECT conrelid::regclass AS tabel, conname FROM pg_constraint
+        WHERE (confrelid = 'bahan_baku'::regclass AND contype = 'f')
+           OR (conrelid IN ('bahan_baku'::regclass, 'transaksi_harian'::regclass)
+               AND contype = 'p' AND cardinality(conkey) = 1)
+        ORDER BY contype
+    LOOP
+        EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', c.tabel, c.conname);
+    END LOOP;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = 'bahan_baku'::regclass AND contype = 'p') THEN
+        ALTER TABLE bahan_baku ADD PRIMARY KEY (outlet_id, bahan_id);
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = 'transaksi_harian'::regclass AND contype = 'p') THEN
+        ALTER TABLE transaksi_harian ADD PRIMARY KEY (outlet_id, tanggal);
+    END IF;
+END;
+$$;
+'''
+
+def pasang_outlet(conn):
+    # Trigger rekap harian dan notifikasi stok dipasang ulang versi per outlet
+    with conn.cursor() as cursor:
+        cursor.execute(DDL_OUTLET)
+        cursor.execute(DDL_NOTIFIKASI_STOK)
+    conn.commit()
+    pasang_rekap_harian(conn)
+
+def pilih_outlet():
+    outlet = daftar_outlet() or {OUTLET_UTAMA: "Outlet Utama"}
+    if st.session_state.get('outlet') not in outlet:
+        st.session_state.pop('outlet', None)
+    st.sidebar.selectbox("Outlet", list(outlet), format_func=lambda o: f"{o} - {outlet[o]}", key='outlet')
+
+# -------------------- CACHE BACA --------------------
+# Streamlit menjalankan ulang script di setiap interaksi, jadi hasil query baca
+# disimpan per (query, params, outlet, versi tabel). Setiap tambah_/perbarui_/hapus_
+# menaikkan versi tabelnya, sehingga entri lama otomatis tidak terpakai lagi.
+# Versi dicatat per (database, tabel): tulis di outlet yang databasenya lain
+# tidak membatalkan cache outlet lain.
+class CacheBaca:
+    def __init__(self, ttl, maks_entri):
+        self._ttl = ttl
+        self._maks_entri = maks_entri
+        self._lock = threading.Lock()
+        self._versi = {}
+        # time.monotonic() tulis terakhir per tabel, untuk memilih primer/replika
+        self._ditulis = {}
+        self._data = OrderedDict()
+
+    def versi(self, tabel):
+        with self._lock:
+            return tuple(self._versi.get(t, 0) for t in tabel)
+
+    def naikkan(self, tabel):
+        with self._lock:
+            self._versi[tabel] = self._versi.get(tabel, 0) + 1
+            self._ditulis[tabel] = time.monotonic()
+
+    def ditulis_terakhir(self, tabel=None):
+        with self._lock:
+            waktu = [self._ditulis[t] for t in (tabel or self._ditulis) if t in self._ditulis]
+            return max(waktu, default=None)
+
+    def ambil(self, kunci):
+        with self._lock:
+            entri = self._data.get(kunci)
+            if entri is None:
+                return None
+            waktu, rows = entri
+            if time.monotonic() - waktu > self._ttl:
+                del self._data[kunci]
+                return None
+            self._data.move_to_end(kunci)
+            return rows
+
+    def simpan(self, kunci, rows):
+        with self._lock:
+            self._data[kunci] = (time.monotonic(), rows)
+            self._data.move_to_end(kunci)
+            while len(self._data) > self._maks_entri:
+                self._data.popitem(last=False)
+
+@st.cache_resource
+def get_cache_baca():
+    konfigurasi = get_konfigurasi()
+    return CacheBaca(ttl=konfigurasi.cache_ttl, maks_entri=konfigurasi.cache_maks_entri)
+
+def naikkan_versi(tabel):
+    get_cache_baca().naikkan((database_aktif(), tabel))
+
+def baca_tercache(tabel, query, params=None):
+    return _baca_cache(tabel, repr(query), params, lambda cursor, params: cursor.execute(query, params))
+
+def baca_tabel(tabel, jenis, params=None):
+    # Sama seperti baca_tercache, tetapi lewat statement prepared repositori
+    return _baca_cache(tabel, f"{tabel}_{jenis}", params, lambda cursor, params: jalankan(cursor, tabel, jenis, params))
+
+def _baca_cache(tabel, kunci_query, params, eksekusi):
+    # tabel: nama tabel atau tuple nama tabel yang dibaca query (untuk JOIN)
+    cache = get_cache_baca()
+    tabel = (tabel,) if isinstance(tabel, str) else tuple(tabel)
+    params = tuple(params) if params else ()
+    database = database_aktif()
+    # Versi dibaca sebelum query: kalau ada tulis di tengah jalan, hasilnya
+    # tersimpan di versi lama dan tidak akan pernah disajikan.
+    kunci = (kunci_query, params, outlet_aktif(), tabel, cache.versi([(database, t) for t in tabel]))
+    rows = cache.ambil(kunci)
+    if rows is not None:
+        return rows
+    conn = get_connection_baca(tabel)
     if conn is None:
-        return
+        return None
+    try:
+        rows = _baca(conn, params, eksekusi)
+    except psycopg2.Error as e:
+        # Replika putus di tengah query (galat tanpa pgcode) atau query dibatalkan
+        # karena konflik dengan replay WAL: ulangi sekali di primer
+        if conn.pool_asal is not get_pool_replika() or not (e.pgcode is None or isinstance(e, psycopg2.OperationalError)):
+            raise
+        if e.pgcode is None:
+            get_status_replika().tandai_gagal(e)
+        conn = get_connection()
+        if conn is None:
+            return None
+        rows = _baca(conn, params, eksekusi)
+    cache.simpan(kunci, rows)
+    return rows
+
+def _baca(conn, params, eksekusi):
     cursor = conn.cursor()
     try:
-        cursor.execute('''
-            INSERT INTO karyawan (karyawan_id, employee_name, position, fingerprint_id)
-            VALUES (%s, %s, %s, %s)
-        ''', (karyawan_id, employee_name, position, fingerprint_id))
+        eksekusi(cursor, params)
+        rows = cursor.fetchall()
         conn.commit()
-        st.success("Data karyawan berhasil ditambahkan.")
-    except psycopg2.IntegrityError:
-        conn.rollback()
-        st.error("Error: ID Karyawan sudah ada.")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Error adding karyawan: {e}")
+        return rows
     finally:
         cursor.close()
-        conn.close()
+        release_connection(conn)
 
-# Lihat Karyawan
-def lihat_karyawan():
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor(cursor_factory=extras.DictCursor)
+# -------------------- METADATA TABEL --------------------
+# 'tipe' adalah tipe Postgres tiap kolom (urutan sama dengan 'kolom'), dipakai
+# untuk parameter statement prepared. 'urut' adalah kunci keyset untuk paginasi; kolom terakhirnya selalu primary key
+# supaya urutan unik walau tanggalnya sama. 'fk' memetakan kolom ke (tabel, kolom)
+# rujukannya, dipakai untuk memvalidasi impor massal. 'tampil' adalah kolom yang
+# ditampilkan di samping ID pada pemilih baris, 'cari' kolom teks yang bisa dicari.
+# 'tanggal' (opsional) adalah kolom untuk filter rentang tanggal; transaksi dan
+# absensi dipartisi per bulan pada kolom ini. 'outlet' menandai tabel per outlet
+# (kolom outlet_id tidak ada di 'kolom', diisi dari outlet aktif), 'kunci_outlet'
+# bahwa kuncinya unik per outlet saja (bahan_baku: kode bahan sama di tiap cabang).
+TABEL = {
+    'karyawan': {
+        'nama': 'Karyawan',
+        'kunci': 'karyawan_id',
+        'kolom': ['karyawan_id', 'employee_name', 'position', 'fingerprint_id'],
+        'tipe': ['text', 'text', 'text', 'text'],
+        'label': ['ID Karyawan', 'Nama', 'Posisi', 'Fingerprint ID'],
+        'urut': ['karyawan_id'],
+        'arah': 'ASC',
+        'fk': {},
+        'tampil': 'employee_name',
+        'cari': ['karyawan_id', 'employee_name'],
+        'outlet': True,
+    },
+    'pelanggan': {
+        'nama': 'Pelanggan',
+        'kunci': 'pelanggan_id',
+        'kolom': ['pelanggan_id', 'cus_name', 'contact_info'],
+        'tipe': ['text', 'text', 'text'],
+        'label': ['ID Pelanggan', 'Nama Pelanggan', 'Kontak Informasi'],
+        'urut': ['pelanggan_id'],
+        'arah': 'ASC',
+        'fk': {},
+        'tampil': 'cus_name',
+        'cari': ['pelanggan_id', 'cus_name'],
+    },
+    'supplier': {
+        'nama': 'Supplier',
+        'kunci': 'supplier_id',
+        'kolom': ['supplier_id', 'supplier_name', 'address'],
+        'tipe': ['text', 'text', 'text'],
+        'label': ['ID Supplier', 'Nama Supplier', 'Alamat'],
+        'urut': ['supplier_id'],
+        'arah': 'ASC',
+        'fk': {},
+        'tampil': 'supplier_name',
+        'cari': ['supplier_id', 'supplier_name'],
+    },
+    'bahan_baku': {
+        'nama': 'Bahan Baku',
+        'kunci': 'bahan_id',
+        'kolom': ['bahan_id', 'nama_bahan', 'stock', 'satuan', 'harga_bahan', 'supplier_id', 'stok_minimum'],
+        'tipe': ['text', 'text', 'numeric', 'text', 'numeric', 'text', 'numeric'],
+        'label': ['ID Bahan Baku', 'Nama Bahan', 'Stock', 'Satuan', 'Harga Bahan', 'ID Supplier', 'Stok Minimum'],
+        'urut': ['bahan_id'],
+        'arah': 'ASC',
+        'fk': {'supplier_id': ('supplier', 'supplier_id')},
+        'tampil': 'nama_bahan',
+        'cari': ['bahan_id', 'nama_bahan'],
+        'outlet': True,
+        'kunci_outlet': True,
+    },
+    'menu': {
+        'nama': 'Menu',
+        'kunci': 'menu_id',
+        'kolom': ['menu_id', 'nama_menu', 'harga'],
+        'tipe': ['text', 'text', 'numeric'],
+        'label': ['ID Menu', 'Nama Menu', 'Harga'],
+        'urut': ['menu_id'],
+        'arah': 'ASC',
+        'fk': {},
+        'tampil': 'nama_menu',
+        'cari': ['menu_id', 'nama_menu'],
+    },
+    'transaksi': {
+        'nama': 'Transaksi',
+        'kunci': 'transaksi_id',
+        'kolom': ['transaksi_id', 'tanggal_pembelian', 'pelanggan_id', 'karyawan_id', 'total_transaksi'],
+        'tipe': ['text', 'date', 'text', 'text', 'numeric'],
+        'label': ['ID Transaksi', 'Tanggal Pembelian', 'ID Pelanggan', 'ID Karyawan', 'Total Transaksi'],
+        'urut': ['tanggal_pembelian', 'transaksi_id'],
+        'arah': 'DESC',
+        'fk': {'pelanggan_id': ('pelanggan', 'pelanggan_id'), 'karyawan_id': ('karyawan', 'karyawan_id')},
+        'tampil': 'tanggal_pembelian',
+        'cari': ['transaksi_id'],
+        'tanggal': 'tanggal_pembelian',
+        'outlet': True,
+    },
+    'feedback': {
+        'nama': 'Feedback',
+        'kunci': 'feedback_id',
+        'kolom': ['feedback_id', 'pelanggan_id', 'karyawan_id', 'tanggal', 'rating', 'komentar'],
+        'tipe': ['text', 'text', 'text', 'date', 'integer', 'text'],
+        'label': ['ID Feedback', 'ID Pelanggan', 'ID Karyawan', 'Tanggal', 'Rating', 'Komentar'],
+        'urut': ['tanggal', 'feedback_id'],
+        'arah': 'DESC',
+        'fk': {'pelanggan_id': ('pelanggan', 'pelanggan_id'), 'karyawan_id': ('karyawan', 'karyawan_id')},
+        'tampil': 'tanggal',
+        'cari': ['feedback_id'],
+        'tanggal': 'tanggal',
+        'outlet': True,
+    },
+    'absensi': {
+        'nama': 'Absensi',
+        'kunci': 'absensi_id',
+        'kolom': ['absensi_id', 'karyawan_id', 'tanggal', 'status'],
+        'tipe': ['text', 'text', 'date', 'text'],
+        'label': ['ID Absensi', 'ID Karyawan', 'Tanggal', 'Status'],
+        'urut': ['tanggal', 'absensi_id'],
+        'arah': 'DESC',
+        'fk': {'karyawan_id': ('karyawan', 'karyawan_id')},
+        'tampil': 'tanggal',
+        'cari': ['absensi_id'],
+        'tanggal': 'tanggal',
+        'outlet': True,
+        'nilai': {'status': ['Hadir', 'Tidak Hadir', 'Izin', 'Cuti']},
+    },
+}
+
+# -------------------- REPOSITORI --------------------
+# Semua operasi CRUD kedelapan tabel dibangun dari TABEL. Tiap statement di-PREPARE
+# sekali per koneksi pool lalu dipanggil dengan EXECUTE, sehingga server tidak
+# mem-parse dan merencanakan ulang query yang sama di setiap panggilan.
+def _daftar_kolom(kolom):
+    return sql.SQL(', ').join(map(sql.Identifier, kolom))
+
+def _urutan(meta):
+    return sql.SQL(', ').join(sql.SQL('{} ' + meta['arah']).format(sql.Identifier(k)) for k in meta['urut'])
+
+def _tipe(meta, kolom):
+    return meta['tipe'][meta['kolom'].index(kolom)]
+
+def _parameter(mulai, jumlah):
+    return sql.SQL(', ').join(sql.SQL(f'${i}') for i in range(mulai, mulai + jumlah))
+
+def _filter(meta, rentang, mulai, sambung):
+    # Rentang tanggal inklusif di parameter $mulai dan $mulai+1 (bila ada), lalu
+    # outlet aktif di parameter berikutnya untuk tabel per outlet. Predikat
+    # langsung pada kolom partisi supaya Postgres bisa memangkas partisi bulanan.
+    syarat = []
+    if rentang:
+        syarat.append(sql.SQL('{kolom} BETWEEN ${a} AND ${b}').format(
+            kolom=sql.Identifier(meta['tanggal']), a=sql.SQL(str(mulai)), b=sql.SQL(str(mulai + 1))
+        ))
+        mulai += 2
+    if meta.get('outlet'):
+        syarat.append(sql.SQL(f'outlet_id = ${mulai}'))
+    if not syarat:
+        return sql.SQL('')
+    return sql.SQL(sambung + ' ') + sql.SQL(' AND ').join(syarat)
+
+def pernyataan(tabel, jenis):
+    # Mengembalikan (tipe parameter, query) untuk satu jenis statement.
+    # Akhiran '_rentang' pada semua/hitung/halaman_* menambah filter tanggal
+    # dengan dua parameter date setelah parameter lainnya. Tabel per outlet
+    # mendapat satu parameter outlet_id paling akhir (diisi oleh jalankan).
+    meta = TABEL[tabel]
+    rentang = jenis.endswith('_rentang')
+    if rentang:
+        jenis = jenis[:-len('_rentang')]
+    tipe_outlet = ['text'] if meta.get('outlet') else []
+    tipe_saring = (['date', 'date'] if rentang else []) + tipe_outlet
+    q = {
+        'tabel': sql.Identifier(tabel),
+        'kunci': sql.Identifier(meta['kunci']),
+        'kolom': _daftar_kolom(meta['kolom']),
+        'tampil': sql.Identifier(meta['tampil']),
+        'urutan': _urutan(meta),
+    }
+    tipe_kunci = _tipe(meta, meta['kunci'])
+
+    if jenis == 'tambah':
+        kolom = meta['kolom'] + (['outlet_id'] if meta.get('outlet') else [])
+        return meta['tipe'] + tipe_outlet, sql.SQL('INSERT INTO {tabel} ({kolom}) VALUES ({nilai})').format(
+            nilai=_parameter(1, len(kolom)), **{**q, 'kolom': _daftar_kolom(kolom)}
+        )
+    if jenis == 'perbarui':
+        # Parameter NULL berarti kolom itu tidak diubah
+        lain = [k for k in meta['kolom'] if k != meta['kunci']]
+        pasangan = sql.SQL(', ').join(
+            sql.SQL('{kolom} = COALESCE(${i}, {kolom})').format(kolom=sql.Identifier(k), i=sql.SQL(str(i)))
+            for i, k in enumerate(lain, start=2)
+        )
+        return [tipe_kunci] + [_tipe(meta, k) for k in lain] + tipe_outlet, sql.SQL(
+            'UPDATE {tabel} SET {pasangan} WHERE {kunci} = $1 {filter}'
+        ).format(pasangan=pasangan, filter=_filter(meta, False, len(lain) + 2, 'AND'), **q)
+    if jenis == 'hapus':
+        return [tipe_kunci] + tipe_outlet, sql.SQL('DELETE FROM {tabel} WHERE {kunci} = $1 {filter}').format(
+            filter=_filter(meta, False, 2, 'AND'), **q
+        )
+    if jenis == 'semua':
+        return tipe_saring, sql.SQL('SELECT {kolom} FROM {tabel} {filter} ORDER BY {urutan}').format(
+            filter=_filter(meta, rentang, 1, 'WHERE'), **q
+        )
+    if jenis == 'hitung':
+        return tipe_saring, sql.SQL('SELECT COUNT(*) FROM {tabel} {filter}').format(
+            filter=_filter(meta, rentang, 1, 'WHERE'), **q
+        )
+    if jenis == 'halaman_awal':
+        return ['bigint'] + tipe_saring, sql.SQL('SELECT {kolom} FROM {tabel} {filter} ORDER BY {urutan} LIMIT $1').format(
+            filter=_filter(meta, rentang, 2, 'WHERE'), **q
+        )
+    if jenis == 'halaman_lanjut':
+        # Keyset: lanjut tepat setelah baris terakhir halaman sebelumnya,
+        # jadi biaya query sama di halaman 1 maupun halaman 1000.
+        n = len(meta['urut'])
+        return [_tipe(meta, k) for k in meta['urut']] + ['bigint'] + tipe_saring, sql.SQL(
+            'SELECT {kolom} FROM {tabel} WHERE ({kolom_urut}) {banding} ({nilai}) {filter} ORDER BY {urutan} LIMIT {batas}'
+        ).format(
+            kolom_urut=_daftar_kolom(meta['urut']),
+            banding=sql.SQL('<' if meta['arah'] == 'DESC' else '>'),
+            nilai=_parameter(1, n),
+            batas=sql.SQL(f'${n + 1}'),
+            filter=_filter(meta, rentang, n + 2, 'AND'),
+            **q
+        )
+    if jenis == 'pilih':
+        return ['bigint'] + tipe_outlet, sql.SQL(
+            'SELECT {kunci}, {tampil} FROM {tabel} {filter} ORDER BY {kunci} LIMIT $1'
+        ).format(filter=_filter(meta, False, 2, 'WHERE'), **q)
+    if jenis == 'pilih_awalan':
+        return ['text', 'bigint'] + tipe_outlet, sql.SQL(
+            'SELECT {kunci}, {tampil} FROM {tabel} WHERE {kunci} LIKE $1 {filter} ORDER BY {kunci} LIMIT $2'
+        ).format(filter=_filter(meta, False, 3, 'AND'), **q)
+    if jenis == 'pilih_cari':
+        cocok = sql.SQL(' OR ').join(sql.SQL('{} ILIKE $1').format(sql.Identifier(k)) for k in meta['cari'])
+        return ['text', 'bigint'] + tipe_outlet, sql.SQL(
+            'SELECT {kunci}, {tampil} FROM {tabel} WHERE ({cocok}) {filter} ORDER BY {kunci} LIMIT $2'
+        ).format(cocok=cocok, filter=_filter(meta, False, 3, 'AND'), **q)
+    raise ValueError(f"Jenis statement tidak dikenal: {jenis}")
+
+def jalankan(cursor, tabel, jenis, params=None, outlet=None):
+    nama = f"{tabel}_{jenis}"
+    sudah = cursor.connection.prepared
+    if nama not in sudah:
+        tipe, query = pernyataan(tabel, jenis)
+        cursor.execute(sql.SQL('PREPARE {nama} {tipe} AS {query}').format(
+            nama=sql.Identifier(nama),
+            tipe=sql.SQL(f"({', '.join(tipe)})" if tipe else ''),
+            query=query
+        ))
+        sudah.add(nama)
+    if TABEL[tabel].get('outlet'):
+        params = [*(params or ()), outlet_aktif() if outlet is None else outlet]
+    if params:
+        cursor.execute(sql.SQL('EXECUTE {} ({})').format(
+            sql.Identifier(nama), sql.SQL(', ').join(sql.Placeholder() * len(params))
+        ), params)
+    else:
+        cursor.execute(sql.SQL('EXECUTE {}').format(sql.Identifier(nama)))
+
+def tulis(tabel, jenis, params):
+    # Satu statement tulis repositori dalam transaksinya sendiri. Mengembalikan
+    # jumlah baris yang kena, atau None bila database tidak terjangkau dan
+    # perubahan masuk jurnal offline. Galat lain diteruskan ke pemanggil.
     try:
-        cursor.execute('SELECT * FROM karyawan')
-        rows = cursor.fetchall()
-        if rows:
-            df = pd.DataFrame(rows, columns=['ID Karyawan', 'Nama', 'Posisi', 'Fingerprint ID'])
-            st.dataframe(df)
-            
-            # Opsi download CSV
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name='daftar_karyawan.csv',
-                mime='text/csv',
-            )
-        else:
-            st.info("Belum ada data karyawan.")
-    except Exception as e:
-        st.error(f"Error fetching data: {e}")
+        conn = get_pool(database_aktif()).pinjam()
+    except psycopg2.OperationalError as e:
+        catat_jurnal(tabel, jenis, params, e)
+        return None
+    try:
+        with conn.cursor() as cursor:
+            try:
+                jalankan(cursor, tabel, jenis, params)
+            except psycopg2.Error as e:
+                if not koneksi_putus(e):
+                    raise
+                # Putus sebelum commit: belum ada yang tersimpan, aman diulang dari jurnal
+                conn.close()
+                catat_jurnal(tabel, jenis, params, e)
+                return None
+            jumlah = cursor.rowcount
+        conn.commit()
+        return jumlah
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
     finally:
-        cursor.close()
-        conn.close()
+        release_connection(conn)
 
-# Perbarui Karyawan
-def perbarui_karyawan(karyawan_id, employee_name=None, position=None, fingerprint_id=None):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
-    fields = []
-    params = []
-    if employee_name:
-        fields.append("employee_name = %s")
-        params.append(employee_name)
-    if position:
-        fields.append("position = %s")
-        params.append(position)
-    if fingerprint_id is not None:
-        fields.append("fingerprint_id = %s")
-        params.append(fingerprint_id)
-    
-    if not fields:
+def tambah_baris(tabel, **nilai):
+    meta = TABEL[tabel]
+    nama = meta['nama']
+    try:
+        if tulis(tabel, 'tambah', [nilai.get(k) for k in meta['kolom']]) is None:
+            return
+        naikkan_versi(tabel)
+        st.success(f"Data {nama.lower()} berhasil ditambahkan.")
+    except psycopg2.IntegrityError:
+        st.error(f"Error: ID {nama} sudah ada.")
+    except Exception as e:
+        st.error(f"Error adding {nama.lower()}: {e}")
+
+def perbarui_baris(tabel, kunci, **nilai):
+    # nilai None = kolom tidak diubah
+    meta = TABEL[tabel]
+    nama = meta['nama']
+    if all(v is None for v in nilai.values()):
         st.warning("Tidak ada field yang diperbarui.")
         return
-    
-    params.append(karyawan_id)
-    sql_query = f"UPDATE karyawan SET {', '.join(fields)} WHERE karyawan_id = %s"
-    
     try:
-        cursor.execute(sql_query, params)
-        if cursor.rowcount == 0:
-            st.warning("Karyawan tidak ditemukan.")
+        jumlah = tulis(tabel, 'perbarui', [kunci] + [nilai.get(k) for k in meta['kolom'] if k != meta['kunci']])
+        if jumlah is None:
+            return
+        if jumlah == 0:
+            st.warning(f"{nama} tidak ditemukan.")
         else:
-            conn.commit()
-            st.success("Data karyawan berhasil diperbarui.")
+            naikkan_versi(tabel)
+            st.success(f"Data {nama.lower()} berhasil diperbarui.")
     except Exception as e:
-        conn.rollback()
-        st.error(f"Error updating karyawan: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+        st.error(f"Error updating {nama.lower()}: {e}")
 
-# Hapus Karyawan
-def hapus_karyawan(karyawan_id):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
+def hapus_baris(tabel, kunci):
+    nama = TABEL[tabel]['nama']
     try:
-        cursor.execute('DELETE FROM karyawan WHERE karyawan_id = %s', (karyawan_id,))
-        if cursor.rowcount == 0:
-            st.warning("Karyawan tidak ditemukan.")
+        jumlah = tulis(tabel, 'hapus', [kunci])
+        if jumlah is None:
+            return
+        if jumlah == 0:
+            st.warning(f"{nama} tidak ditemukan.")
         else:
-            conn.commit()
-            st.success("Data karyawan berhasil dihapus.")
+            naikkan_versi(tabel)
+            st.success(f"Data {nama.lower()} berhasil dihapus.")
     except Exception as e:
-        conn.rollback()
-        st.error(f"Error deleting karyawan: {e}")
+        st.error(f"Error deleting {nama.lower()}: {e}")
+
+# -------------------- JURNAL OFFLINE --------------------
+# Saat database tidak terjangkau, tambah_/perbarui_/hapus_baris tidak hilang:
+# statementnya dicatat ke berkas SQLite lokal (tetap ada setelah restart) lalu
+# dikirim ulang berurutan per batch begitu koneksi pulih. Tiap entri punya
+# id_operasi yang ditulis ke jurnal_diterapkan di transaksi yang sama dengan
+# perubahannya, jadi batch yang sudah di-commit tetapi belum terhapus dari
+# jurnal (mis. proses mati di antaranya) tidak diterapkan dua kali.
+JENIS_JURNAL = ('tambah', 'perbarui', 'hapus')
+JEDA_KIRIM_JURNAL = 5
+
+DDL_JURNAL_LOKAL = '''
+CREATE TABLE IF NOT EXISTS jurnal (
+    urutan INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_operasi TEXT NOT NULL UNIQUE,
+    database TEXT NOT NULL,
+    outlet TEXT NOT NULL,
+    tabel TEXT NOT NULL,
+    jenis TEXT NOT NULL,
+    params TEXT NOT NULL,
+    dicatat TEXT NOT NULL,
+    galat TEXT
+)
+'''
+
+DDL_JURNAL_DITERAPKAN = '''
+CREATE TABLE IF NOT EXISTS jurnal_diterapkan (
+    id_operasi uuid PRIMARY KEY,
+    diterapkan timestamptz NOT NULL DEFAULT now()
+);
+'''
+
+def koneksi_putus(e):
+    # Server mati di tengah query memberi DatabaseError tanpa pgcode, tidak
+    # selalu OperationalError
+    return isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError)) or (
+        type(e) is psycopg2.DatabaseError and e.pgcode is None)
+
+class JurnalOffline:
+    def __init__(self, berkas):
+        import sqlite3
+        self._lock = threading.Lock()
+        # Satu pengirim ulang sekaligus per proses; sesi lain melewatkan giliran
+        self.kirim = threading.Lock()
+        self._db = sqlite3.connect(berkas, check_same_thread=False, isolation_level=None)
+        # synchronous=FULL: entri sudah di disk saat kasir melihat pesannya
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=FULL')
+        self._db.execute(DDL_JURNAL_LOKAL)
+
+    def catat(self, database, outlet, tabel, jenis, params):
+        import uuid
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO jurnal (id_operasi, database, outlet, tabel, jenis, params, dicatat) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (str(uuid.uuid4()), database, outlet, tabel, jenis,
+                 json.dumps(params, default=str), time.strftime('%Y-%m-%d %H:%M:%S')))
+
+    def jumlah(self):
+        # (menunggu dikirim, ditolak database)
+        with self._lock:
+            return self._db.execute('SELECT count(*) - count(galat), count(galat) FROM jurnal').fetchone()
+
+    def database_menunggu(self):
+        with self._lock:
+            return [d for d, in self._db.execute('SELECT DISTINCT database FROM jurnal WHERE galat IS NULL')]
+
+    def ambil(self, database, batas):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT urutan, id_operasi, outlet, tabel, jenis, params FROM jurnal '
+                'WHERE database = ? AND galat IS NULL ORDER BY urutan LIMIT ?', (database, batas)).fetchall()
+        return [(*r[:5], json.loads(r[5])) for r in rows]
+
+    def selesai(self, diterapkan, ditolak):
+        # diterapkan: daftar urutan; ditolak: daftar (galat, urutan) yang disimpan untuk diperiksa
+        with self._lock:
+            self._db.execute('BEGIN')
+            try:
+                self._db.executemany('DELETE FROM jurnal WHERE urutan = ?', [(u,) for u in diterapkan])
+                self._db.executemany('UPDATE jurnal SET galat = ? WHERE urutan = ?', ditolak)
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def daftar_ditolak(self):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT dicatat, outlet, tabel, jenis, params, galat FROM jurnal '
+                'WHERE galat IS NOT NULL ORDER BY urutan').fetchall()
+        return [(*r[:4], json.loads(r[4]), r[5]) for r in rows]
+
+    def buang_ditolak(self):
+        with self._lock:
+            return self._db.execute('DELETE FROM jurnal WHERE galat IS NOT NULL').rowcount
+
+@st.cache_resource
+def get_jurnal():
+    return JurnalOffline(get_konfigurasi().jurnal_berkas)
+
+def catat_jurnal(tabel, jenis, params, galat):
+    log.warning("Database tidak terjangkau, %s %s dicatat di jurnal offline: %s", jenis, tabel, galat)
+    get_jurnal().catat(database_aktif(), outlet_aktif(), tabel, jenis, params)
+    st.warning(f"Database tidak terjangkau. Perubahan {TABEL[tabel]['nama'].lower()} disimpan di jurnal "
+               "offline dan dikirim otomatis saat koneksi pulih.")
+
+def kirim_ulang_jurnal(database):
+    # Mengembalikan (diterapkan, ditolak). Galat koneksi diteruskan ke pemanggil;
+    # batch yang belum di-commit tetap di jurnal untuk percobaan berikutnya.
+    jurnal = get_jurnal()
+    batas = get_konfigurasi().jurnal_batch
+    total_diterapkan = total_ditolak = 0
+    conn = get_pool(database).pinjam()
+    try:
+        while entri := jurnal.ambil(database, batas):
+            diterapkan, ditolak, berubah = [], [], set()
+            with conn.cursor() as cursor:
+                for urutan, id_operasi, outlet, tabel, jenis, params in entri:
+                    cursor.execute('SAVEPOINT entri_jurnal')
+                    try:
+                        cursor.execute('INSERT INTO jurnal_diterapkan (id_operasi) VALUES (%s) ON CONFLICT DO NOTHING',
+                                       (id_operasi,))
+                        # rowcount 0: sudah diterapkan pada percobaan sebelumnya
+                        if cursor.rowcount:
+                            if tabel not in TABEL or jenis not in JENIS_JURNAL:
+                                raise ValueError(f"Entri jurnal tidak dikenal: {jenis} {tabel}")
+                            jalankan(cursor, tabel, jenis, params, outlet)
+                            if cursor.rowcount == 0 and jenis == 'perbarui':
+                                raise ValueError(f"{TABEL[tabel]['nama']} {params[0]} tidak ditemukan")
+                            berubah.add(tabel)
+                        cursor.execute('RELEASE SAVEPOINT entri_jurnal')
+                        diterapkan.append(urutan)
+                    except (psycopg2.Error, ValueError) as e:
+                        if isinstance(e, psycopg2.Error) and koneksi_putus(e):
+                            raise
+                        # Ditolak database (mis. ID sudah dipakai): entri lain tetap dikirim
+                        cursor.execute('ROLLBACK TO SAVEPOINT entri_jurnal')
+                        ditolak.append((str(e).strip(), urutan))
+            conn.commit()
+            jurnal.selesai(diterapkan, ditolak)
+            for tabel in berubah:
+                get_cache_baca().naikkan((database, tabel))
+            total_diterapkan += len(diterapkan)
+            total_ditolak += len(ditolak)
+    except psycopg2.Error as e:
+        if koneksi_putus(e):
+            conn.close()
+        else:
+            conn.rollback()
+        raise
     finally:
-        cursor.close()
-        conn.close()
+        release_connection(conn)
+    return total_diterapkan, total_ditolak
+
+@st.fragment(run_every=JEDA_KIRIM_JURNAL)
+def status_jurnal():
+    # Dipanggil di dalam sidebar; diam saja bila jurnal kosong
+    jurnal = get_jurnal()
+    menunggu, ditolak = jurnal.jumlah()
+    if menunggu and jurnal.kirim.acquire(blocking=False):
+        try:
+            for database in jurnal.database_menunggu():
+                try:
+                    terkirim, _ = kirim_ulang_jurnal(database)
+                except Exception as e:
+                    log.info("Jurnal offline belum bisa dikirim ke %s: %s", database, e)
+                    continue
+                if terkirim:
+                    st.toast(f"{terkirim} perubahan offline terkirim ke database.", icon="✅")
+        finally:
+            jurnal.kirim.release()
+        menunggu, ditolak = jurnal.jumlah()
+    if menunggu:
+        st.warning(f"⏳ {menunggu} perubahan offline menunggu dikirim.")
+    if ditolak:
+        with st.expander(f"{ditolak} perubahan offline ditolak database"):
+            for dicatat, outlet, tabel, jenis, params, galat in jurnal.daftar_ditolak():
+                st.caption(f"{dicatat} · {outlet} · {jenis} {TABEL.get(tabel, {}).get('nama', tabel)} "
+                           f"{params[0] if params else ''}: {galat}")
+            if st.button("Buang catatan yang ditolak", key="buang_jurnal_ditolak"):
+                jurnal.buang_ditolak()
+                st.rerun(scope="fragment")
+
+# -------------------- RENTANG TANGGAL --------------------
+def pilih_rentang(key):
+    # Mengembalikan (dari, sampai) inklusif, atau None bila filter tidak dipakai
+    if not st.checkbox("Filter tanggal", key=f"filter_tanggal_{key}"):
+        return None
+    hari_ini = date.today()
+    nilai = st.date_input("Rentang tanggal", value=(hari_ini.replace(day=1), hari_ini), key=f"rentang_{key}")
+    if len(nilai) != 2:
+        st.caption("Pilih tanggal akhir rentang.")
+        return None
+    return tuple(nilai)
+
+def jenis_rentang(jenis, rentang):
+    return f"{jenis}_rentang" if rentang else jenis
+
+# -------------------- PAGINASI --------------------
+UKURAN_HALAMAN = [25, 50, 100, 250]
+
+def mode_halaman(tabel):
+    return st.toggle("Mode per halaman", value=True, key=f"mode_halaman_{tabel}")
+
+def perkiraan_jumlah_baris(tabel, rentang=None):
+    # reltuples dari statistik planner: gratis, cukup akurat untuk tabel besar.
+    # Tabel berpartisi tidak punya reltuples sendiri, jadi dijumlah dari partisinya.
+    # Tabel per outlet memakai perkiraan baris planner untuk outlet aktif (dari
+    # statistik nilai outlet_id). Tabel kecil (belum pernah di-ANALYZE, atau
+    # dengan filter rentang) dihitung persis.
+    if rentang:
+        return baca_tabel(tabel, 'hitung_rentang', rentang)[0][0], False
+    if TABEL[tabel].get('outlet'):
+        rows = baca_tercache(tabel, sql.SQL('EXPLAIN (FORMAT JSON) SELECT 1 FROM {} WHERE outlet_id = %s').format(
+            sql.Identifier(tabel)), (outlet_aktif(),))
+        perkiraan = rows[0][0][0]['Plan']['Plan Rows'] if rows else None
+    else:
+        rows = baca_tercache(tabel, '''
+            SELECT SUM(GREATEST(c.reltuples, 0))::bigint FROM pg_class c
+            WHERE (c.oid = to_regclass(%s) AND c.relkind <> 'p')
+               OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s))
+        ''', (tabel, tabel))
+        perkiraan = rows and rows[0][0]
+    if perkiraan is not None and perkiraan >= 10000:
+        return int(perkiraan), True
+    rows = baca_tabel(tabel, 'hitung')
+    return rows[0][0], False
+
+def _halaman_berikutnya(kunci_state, token):
+    st.session_state[kunci_state]['token'].append(token)
+
+def _halaman_sebelumnya(kunci_state):
+    st.session_state[kunci_state]['token'].pop()
+
+def tampilkan_per_halaman(tabel, pesan_kosong, grid=False, rentang=None):
+    meta = TABEL[tabel]
+    kunci_state = f"halaman_{tabel}"
+    ukuran = st.selectbox("Baris per halaman", UKURAN_HALAMAN, key=f"ukuran_{tabel}")
+    state = st.session_state.get(kunci_state)
+    if state is None or state['ukuran'] != ukuran or state.get('rentang') != rentang:
+        state = st.session_state[kunci_state] = {'ukuran': ukuran, 'rentang': rentang, 'token': [None]}
 
-# -------------------- PELANGGAN --------------------
-# Tambah Pelanggan
-def tambah_pelanggan(pelanggan_id, cus_name, contact_info):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
     try:
-        cursor.execute('''
-            INSERT INTO pelanggan (pelanggan_id, cus_name, contact_info)
-            VALUES (%s, %s, %s)
-        ''', (pelanggan_id, cus_name, contact_info))
-        conn.commit()
-        st.success("Data pelanggan berhasil ditambahkan.")
-    except psycopg2.IntegrityError:
-        conn.rollback()
-        st.error("Error: ID Pelanggan sudah ada.")
+        # Ambil satu baris ekstra untuk tahu apakah masih ada halaman berikutnya
+        token = state['token'][-1]
+        if token is None:
+            rows = baca_tabel(tabel, jenis_rentang('halaman_awal', rentang), (ukuran + 1, *(rentang or ())))
+        else:
+            rows = baca_tabel(tabel, jenis_rentang('halaman_lanjut', rentang), (*token, ukuran + 1, *(rentang or ())))
+        if rows is None:
+            return
+        ada_berikutnya = len(rows) > ukuran
+        rows = rows[:ukuran]
+        jumlah, perkiraan = perkiraan_jumlah_baris(tabel, rentang)
     except Exception as e:
-        conn.rollback()
-        st.error(f"Error adding pelanggan: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+        st.error(f"Error fetching data: {e}")
+        return
 
-# Lihat Pelanggan
-def lihat_pelanggan():
-    conn = get_connection()
-    if conn is None:
+    if not rows and len(state['token']) == 1 and not grid:
+        st.info(pesan_kosong)
+        return
+
+    if grid:
+        tampilkan_grid(tabel, rows)
+    else:
+        tampilkan_dataframe(rows, meta['label'])
+    halaman = len(state['token'])
+    st.caption(f"Halaman {halaman} dari {'±' if perkiraan else ''}{max(1, -(-jumlah // ukuran))} "
+               f"({'±' if perkiraan else ''}{jumlah} baris)")
+
+    col_prev, col_next = st.columns(2)
+    col_prev.button("Sebelumnya", key=f"prev_{tabel}", disabled=halaman == 1,
+                    on_click=_halaman_sebelumnya, args=(kunci_state,))
+    if rows:
+        posisi = [meta['kolom'].index(k) for k in meta['urut']]
+        token_berikutnya = tuple(rows[-1][i] for i in posisi)
+        col_next.button("Berikutnya", key=f"next_{tabel}", disabled=not ada_berikutnya,
+                        on_click=_halaman_berikutnya, args=(kunci_state, token_berikutnya))
+
+    # Opsi download CSV/Parquet/Arrow (seluruh tabel/rentang, di-stream langsung dari Postgres)
+    query, params = query_ekspor_tabel(tabel, rentang)
+    tombol_ekspor(query, f'daftar_{tabel}', params)
+
+def lihat_tabel(tabel, rentang=None):
+    meta = TABEL[tabel]
+    pesan_kosong = f"Belum ada data {meta['nama'].lower()}."
+    per_halaman = mode_halaman(tabel)
+    grid = mode_grid(tabel)
+    if per_halaman:
+        tampilkan_per_halaman(tabel, pesan_kosong, grid, rentang)
         return
-    cursor = conn.cursor(cursor_factory=extras.DictCursor)
     try:
-        cursor.execute('SELECT * FROM pelanggan')
-        rows = cursor.fetchall()
-        if rows:
-            df = pd.DataFrame(rows, columns=['ID Pelanggan', 'Nama Pelanggan', 'Kontak Informasi'])
-            st.dataframe(df)
-            
-            # Opsi download CSV
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name='daftar_pelanggan.csv',
-                mime='text/csv',
-            )
+        rows = baca_tabel(tabel, jenis_rentang('semua', rentang), rentang)
+        if rows is None:
+            return
+        if rows or grid:
+            if grid:
+                tampilkan_grid(tabel, rows)
+            else:
+                tampilkan_dataframe(rows, meta['label'])
+
+            # Opsi download CSV/Parquet/Arrow
+            query, params = query_ekspor_tabel(tabel, rentang)
+            tombol_ekspor(query, f'daftar_{tabel}', params)
         else:
-            st.info("Belum ada data pelanggan.")
+            st.info(pesan_kosong)
     except Exception as e:
         st.error(f"Error fetching data: {e}")
-    finally:
-        cursor.close()
-        conn.close()
 
-# Perbarui Pelanggan
-def perbarui_pelanggan(pelanggan_id, cus_name=None, contact_info=None):
+# -------------------- EDIT GRID --------------------
+# Perubahan di st.data_editor dikumpulkan per baris (tambah/ubah/hapus) lalu
+# diterapkan dalam satu transaksi: satu INSERT, satu UPDATE ... FROM (VALUES) dan
+# satu DELETE ... = ANY, masing-masing satu round trip lewat execute_values.
+# UPDATE hanya menyentuh sel yang diedit dan hanya jika nilainya masih sama dengan
+# saat grid dimuat, jadi edit pengguna lain tidak tertimpa diam-diam.
+def mode_grid(tabel):
+    return st.toggle("Mode edit grid", key=f"mode_grid_{tabel}")
+
+def _kunci_editor(tabel, rows):
+    # Kunci ikut berubah bila isi halaman berganti, supaya edit per posisi baris
+    # tidak terbawa ke baris lain setelah pindah halaman atau data dimuat ulang.
+    i_kunci = TABEL[tabel]['kolom'].index(TABEL[tabel]['kunci'])
+    versi = st.session_state.get(f"grid_versi_{tabel}", 0)
+    return f"grid_{tabel}_{versi}_{hash(tuple(r[i_kunci] for r in rows))}"
+
+def _nilai_grid(nilai):
+    import pandas as pd
+    if nilai is None or nilai == '' or pd.isna(nilai):
+        return None
+    return nilai
+
+def _template(tipe):
+    return '(' + ', '.join(f'%s::{t}' for t in tipe) + ')'
+
+def simpan_grid(tabel, rows, perubahan):
+    # rows: baris asli yang ditampilkan grid (posisi = indeks baris di editor).
+    # Mengembalikan daftar (jenis pesan, teks) untuk ditampilkan di bawah grid.
+    from psycopg2 import extras
+    meta = TABEL[tabel]
+    kolom, kunci = meta['kolom'], meta['kunci']
+    dari_label = dict(zip(meta['label'], kolom))
+    i_kunci = kolom.index(kunci)
+    lain = [k for k in kolom if k != kunci]
+    pesan = []
+
+    hapus = [rows[int(posisi)][i_kunci] for posisi in perubahan.get('deleted_rows', [])]
+
+    ubah = []
+    for posisi, edit in perubahan.get('edited_rows', {}).items():
+        asli = rows[int(posisi)]
+        if asli[i_kunci] in hapus:
+            continue
+        edit = {dari_label[label]: _nilai_grid(v) for label, v in edit.items() if label in dari_label}
+        if kunci in edit:
+            pesan.append(('warning', f"{asli[i_kunci]}: ID tidak bisa diubah lewat grid, baris dilewati."))
+            continue
+        # Per kolom: (diubah?, nilai baru, nilai saat dimuat)
+        nilai = [asli[i_kunci]]
+        for k in lain:
+            lama = asli[kolom.index(k)]
+            nilai += [k in edit, edit.get(k, lama), lama]
+        ubah.append(tuple(nilai))
+
+    baru = []
+    for i, baris in enumerate(perubahan.get('added_rows', []), start=1):
+        nilai = {dari_label[label]: _nilai_grid(v) for label, v in baris.items() if label in dari_label}
+        if nilai.get(kunci) is None:
+            pesan.append(('warning', f"Baris baru ke-{i}: ID kosong, dilewati."))
+        else:
+            baru.append(tuple(nilai.get(k) for k in kolom))
+
+    if not (hapus or ubah or baru):
+        pesan.append(('info', "Tidak ada perubahan untuk disimpan."))
+        return pesan
+
     conn = get_connection()
     if conn is None:
-        return
+        return pesan
+    q = {'tabel': sql.Identifier(tabel), 'kunci': sql.Identifier(kunci), 'kolom': _daftar_kolom(kolom), 'outlet': sql.SQL('')}
+    tipe_baru = meta['tipe']
+    if meta.get('outlet'):
+        # Baris outlet lain tidak ikut terhapus/terubah walau ID-nya sama
+        outlet = outlet_aktif()
+        q['outlet'] = sql.SQL('AND t.outlet_id = {}').format(sql.Literal(outlet))
+        q['kolom_baru'] = _daftar_kolom(kolom + ['outlet_id'])
+        tipe_baru = tipe_baru + ['text']
+        baru = [r + (outlet,) for r in baru]
+    else:
+        q['kolom_baru'] = q['kolom']
+    try:
+        with conn.cursor() as cursor:
+            terhapus = set()
+            if hapus:
+                cursor.execute(sql.SQL(
+                    'DELETE FROM {tabel} AS t WHERE t.{kunci} = ANY(%s) {outlet} RETURNING t.{kunci}'
+                ).format(**q), (hapus,))
+                terhapus = {r[0] for r in cursor.fetchall()}
+                pesan += [('warning', f"{k}: sudah dihapus sebelumnya.") for k in hapus if k not in terhapus]
+
+            diperbarui = set()
+            if ubah:
+                alias = [kunci] + [f"{awalan}_{k}" for k in lain for awalan in ('ubah', 'baru', 'lama')]
+                pasangan = sql.SQL(', ').join(
+                    sql.SQL('{k} = CASE WHEN v.{ubah} THEN v.{baru} ELSE t.{k} END').format(
+                        k=sql.Identifier(k), ubah=sql.Identifier(f'ubah_{k}'), baru=sql.Identifier(f'baru_{k}'))
+                    for k in lain
+                )
+                masih_sama = sql.SQL(' AND ').join(
+                    sql.SQL('(NOT v.{ubah} OR t.{k} IS NOT DISTINCT FROM v.{lama})').format(
+                        k=sql.Identifier(k), ubah=sql.Identifier(f'ubah_{k}'), lama=sql.Identifier(f'lama_{k}'))
+                    for k in lain
+                )
+                query = sql.SQL(
+                    'UPDATE {tabel} AS t SET {pasangan} FROM (VALUES %s) AS v ({alias}) '
+                    'WHERE t.{kunci} = v.{kunci} AND {masih_sama} {outlet} RETURNING t.{kunci}'
+                ).format(pasangan=pasangan, alias=_daftar_kolom(alias), masih_sama=masih_sama, **q)
+                tipe = [_tipe(meta, kunci)] + [t for k in lain for t in ('boolean', _tipe(meta, k), _tipe(meta, k))]
+                hasil = extras.execute_values(cursor, query, ubah, template=_template(tipe), page_size=len(ubah), fetch=True)
+                diperbarui = {r[0] for r in hasil}
+                pesan += [('warning', f"{r[0]}: sudah diubah atau dihapus pengguna lain sejak dimuat, perubahan tidak disimpan.")
+                          for r in ubah if r[0] not in diperbarui]
+
+            ditambah = []
+            if baru:
+                query = sql.SQL(
+                    'INSERT INTO {tabel} ({kolom_baru}) VALUES %s ON CONFLICT DO NOTHING RETURNING {kunci}'
+                ).format(**q)
+                hasil = extras.execute_values(cursor, query, baru, template=_template(tipe_baru), page_size=len(baru), fetch=True)
+                sisa = {r[0] for r in hasil}
+                for r in baru:
+                    if r[i_kunci] in sisa:
+                        sisa.discard(r[i_kunci])
+                        ditambah.append(r[i_kunci])
+                    else:
+                        pesan.append(('warning', f"{r[i_kunci]}: ID {meta['nama']} sudah ada, baris baru tidak disimpan."))
+        conn.commit()
+        naikkan_versi(tabel)
+        pesan.insert(0, ('success', f"{len(ditambah)} baris ditambahkan, {len(diperbarui)} diperbarui, "
+                                    f"{len(terhapus)} dihapus."))
+    except psycopg2.Error as e:
+        # Satu transaksi: pelanggaran FK/NOT NULL membatalkan seluruh perubahan
+        conn.rollback()
+        pesan.append(('error', f"Perubahan dibatalkan, tidak ada yang disimpan: {e}"))
+    finally:
+        release_connection(conn)
+    return pesan
+
+def _simpan_grid(tabel, rows):
+    kunci_editor = _kunci_editor(tabel, rows)
+    pesan = simpan_grid(tabel, rows, st.session_state.get(kunci_editor, {}))
+    st.session_state[f"hasil_grid_{tabel}"] = pesan
+    if not any(jenis == 'error' for jenis, _ in pesan):
+        # Mulai editor baru; edit yang gagal tetap ada di grid untuk diperbaiki
+        st.session_state[f"grid_versi_{tabel}"] = st.session_state.get(f"grid_versi_{tabel}", 0) + 1
+
+def tampilkan_grid(tabel, rows):
+    import pandas as pd
+    meta = TABEL[tabel]
+    with ukur('dataframe'):
+        df = pd.DataFrame(rows, columns=meta['label'])
+        for label, tipe in zip(meta['label'], meta['tipe']):
+            if tipe in ('numeric', 'integer'):
+                df[label] = pd.to_numeric(df[label])
+    with ukur('render'):
+        st.data_editor(df, key=_kunci_editor(tabel, rows), num_rows="dynamic", hide_index=True)
+    st.button("Simpan Perubahan", key=f"simpan_grid_{tabel}", on_click=_simpan_grid, args=(tabel, rows))
+    for jenis, teks in st.session_state.pop(f"hasil_grid_{tabel}", []):
+        getattr(st, jenis)(teks)
+
+# -------------------- EKSPOR --------------------
+# Hasil COPY ditampung di memori sampai batas ini, selebihnya tumpah ke disk.
+BATAS_MEMORI_EKSPOR = 8 * 1024 * 1024
+UKURAN_CHUNK_EKSPOR = 64 * 1024
+# Parquet/Arrow memakai aliran COPY yang sama dengan CSV, lalu dibaca per blok oleh
+# pembaca CSV Arrow (C++) dengan tipe dari deskripsi query dan ditulis per row
+# group. Jauh lebih cepat daripada mengambil baris lewat cursor psycopg2, dan
+# memori hanya menampung satu row group.
+UKURAN_ROW_GROUP = 100_000
+UKURAN_BLOK_CSV = 4 * 1024 * 1024
+# format: (ekstensi, mime)
+FORMAT_EKSPOR = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Arrow': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+# OID tipe Postgres -> (fungsi tipe pyarrow, argumen); tipe lain diekspor sebagai teks
+TIPE_ARROW = {
+    16: ('bool_',),
+    20: ('int64',),
+    21: ('int16',),
+    23: ('int32',),
+    700: ('float32',),
+    701: ('float64',),
+    1082: ('date32',),
+    1114: ('timestamp', 'us'),
+    1184: ('timestamp', 'us', 'UTC'),
+}
+OID_NUMERIC = 1700
+# Skala decimal untuk numeric tanpa skala tetap. Nilai dengan desimal lebih
+# banyak membuat ekspor gagal, bukan dibulatkan diam-diam.
+SKALA_NUMERIC_MAKS = 9
+
+def query_berlabel(query, label):
+    # Ganti nama kolom hasil query dengan label tampilan untuk header CSV
+    return sql.SQL('SELECT * FROM ({}) AS q ({})').format(
+        query, sql.SQL(', ').join(map(sql.Identifier, label))
+    )
+
+def query_ekspor_tabel(tabel, rentang=None):
+    # Mengembalikan (query, params): rentang (dari, sampai) dan outlet aktif
+    # untuk tabel per outlet
+    meta = TABEL[tabel]
+    syarat, params = [], []
+    if rentang:
+        syarat.append(sql.SQL('{} BETWEEN %s AND %s').format(sql.Identifier(meta['tanggal'])))
+        params += rentang
+    if meta.get('outlet'):
+        syarat.append(sql.SQL('outlet_id = %s'))
+        params.append(outlet_aktif())
+    saring = sql.SQL('WHERE ') + sql.SQL(' AND ').join(syarat) if syarat else sql.SQL('')
+    query = sql.SQL('SELECT {kolom} FROM {tabel} {saring} ORDER BY {urutan}').format(
+        kolom=_daftar_kolom(meta['kolom']),
+        tabel=sql.Identifier(tabel),
+        saring=saring,
+        urutan=_urutan(meta)
+    )
+    return query_berlabel(query, meta['label']), params
+
+def ekspor_csv(query, params=None):
+    # Tabel yang dibaca tidak diketahui, jadi replika hanya dipakai bila
+    # sudah menyusul semua tulis proses ini
+    conn = get_connection_baca()
+    if conn is None:
+        return None
     cursor = conn.cursor()
-    fields = []
-    params = []
-    if cus_name:
-        fields.append("cus_name = %s")
-        params.append(cus_name)
-    if contact_info:
-        fields.append("contact_info = %s")
-        params.append(contact_info)
-    
-    if not fields:
-        st.warning("Tidak ada field yang diperbarui.")
-        return
-    
-    params.append(pelanggan_id)
-    sql_query = f"UPDATE pelanggan SET {', '.join(fields)} WHERE pelanggan_id = %s"
-    
+    berkas = tempfile.SpooledTemporaryFile(max_size=BATAS_MEMORI_EKSPOR, mode='w+b')
     try:
-        cursor.execute(sql_query, params)
-        if cursor.rowcount == 0:
-            st.warning("Pelanggan tidak ditemukan.")
-        else:
-            conn.commit()
-            st.success("Data pelanggan berhasil diperbarui.")
+        perintah = sql.SQL('COPY ({}) TO STDOUT WITH (FORMAT csv, HEADER true)').format(query)
+        if params:
+            # COPY tidak menerima parameter, jadi nilai di-bind di sisi klien
+            perintah = cursor.mogrify(perintah, params)
+        cursor.copy_expert(perintah, berkas, size=UKURAN_CHUNK_EKSPOR)
+        conn.commit()
+        berkas.seek(0)
+        return berkas
     except Exception as e:
         conn.rollback()
-        st.error(f"Error updating pelanggan: {e}")
+        berkas.close()
+        st.error(f"Error exporting data: {e}")
+        return None
     finally:
         cursor.close()
-        conn.close()
+        release_connection(conn)
 
-# Hapus Pelanggan
-def hapus_pelanggan(pelanggan_id):
-    conn = get_connection()
+def tipe_arrow(oid):
+    import pyarrow as pa
+    nama, *argumen = TIPE_ARROW.get(oid, ('string',))
+    return getattr(pa, nama)(*argumen)
+
+def _skala_numeric(kolom):
+    # numeric tanpa (presisi, skala) dilaporkan sebagai None atau 65535
+    if kolom.scale is not None and kolom.scale <= 38:
+        return kolom.scale
+    return SKALA_NUMERIC_MAKS
+
+def _ke_decimal(teks, tipe, nama):
+    import pyarrow as pa
+    try:
+        return teks.cast(tipe)
+    except pa.ArrowInvalid as e:
+        raise ValueError(f"Kolom {nama} memuat nilai yang tidak muat di {tipe} tanpa pembulatan: {e}") from None
+
+def _penulis_kolumnar(berkas, skema, format):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    if format == 'Parquet':
+        return pq.ParquetWriter(berkas, skema, compression='zstd')
+    return pa.ipc.new_file(berkas, skema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+
+def tulis_kolumnar(mentah, deskripsi, berkas, format):
+    # mentah: hasil COPY csv tanpa header; numeric dibaca sebagai teks lalu di-cast
+    # ke decimal supaya nilai yang tidak muat ketahuan, bukan dibulatkan
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    nama = [k.name for k in deskripsi]
+    numeric = [i for i, k in enumerate(deskripsi) if k.type_code == OID_NUMERIC]
+    kosong = not mentah.read(1)
+    mentah.seek(0)
+    pembaca = [] if kosong else pa_csv.open_csv(
+        mentah,
+        read_options=pa_csv.ReadOptions(column_names=nama, block_size=UKURAN_BLOK_CSV),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={k.name: tipe_arrow(k.type_code) for k in deskripsi},
+            true_values=['t'], false_values=['f'],
+            # COPY menulis NULL sebagai kosong dan string kosong sebagai ""
+            strings_can_be_null=True, quoted_strings_can_be_null=False,
+        ),
+    )
+    skema = penulis = None
+    antre = []
+    for batch in pembaca:
+        if skema is None:
+            skema = pa.schema([
+                pa.field(k.name, pa.decimal128(38, _skala_numeric(k)) if i in numeric
+                         else batch.schema.field(i).type)
+                for i, k in enumerate(deskripsi)
+            ])
+            penulis = _penulis_kolumnar(berkas, skema, format)
+        kolom = [_ke_decimal(c, skema.field(i).type, nama[i]) if i in numeric else c
+                 for i, c in enumerate(batch.columns)]
+        antre.append(pa.RecordBatch.from_arrays(kolom, schema=skema))
+        if sum(b.num_rows for b in antre) >= UKURAN_ROW_GROUP:
+            penulis.write_table(pa.Table.from_batches(antre), UKURAN_ROW_GROUP)
+            antre = []
+    if penulis is None:
+        # Hasil kosong: tetap tulis berkas berisi skema
+        skema = pa.schema([pa.field(k.name, pa.decimal128(38, _skala_numeric(k)) if i in numeric
+                                    else tipe_arrow(k.type_code))
+                           for i, k in enumerate(deskripsi)])
+        penulis = _penulis_kolumnar(berkas, skema, format)
+    if antre:
+        penulis.write_table(pa.Table.from_batches(antre), UKURAN_ROW_GROUP)
+    penulis.close()
+
+def ekspor_kolumnar(query, params=None, format='Parquet'):
+    conn = get_connection_baca()
     if conn is None:
-        return
+        return None
     cursor = conn.cursor()
+    mentah = tempfile.SpooledTemporaryFile(max_size=BATAS_MEMORI_EKSPOR, mode='w+b')
     try:
-        cursor.execute('DELETE FROM pelanggan WHERE pelanggan_id = %s', (pelanggan_id,))
-        if cursor.rowcount == 0:
-            st.warning("Pelanggan tidak ditemukan.")
-        else:
-            conn.commit()
-            st.success("Data pelanggan berhasil dihapus.")
+        # Nama dan tipe kolom dari query yang sama tanpa baris
+        cursor.execute(sql.SQL('SELECT * FROM ({}) AS q LIMIT 0').format(query), params)
+        deskripsi = cursor.description
+        perintah = sql.SQL('COPY ({}) TO STDOUT WITH (FORMAT csv)').format(query)
+        if params:
+            perintah = cursor.mogrify(perintah, params)
+        cursor.copy_expert(perintah, mentah, size=UKURAN_CHUNK_EKSPOR)
+        conn.commit()
     except Exception as e:
         conn.rollback()
-        st.error(f"Error deleting pelanggan: {e}")
+        mentah.close()
+        st.error(f"Error exporting data: {e}")
+        return None
     finally:
         cursor.close()
-        conn.close()
+        release_connection(conn)
+
+    # Konversi setelah koneksi dikembalikan ke pool
+    berkas = tempfile.SpooledTemporaryFile(max_size=BATAS_MEMORI_EKSPOR, mode='w+b')
+    try:
+        with mentah, ukur('dataframe'):
+            mentah.seek(0)
+            tulis_kolumnar(mentah, deskripsi, berkas, format)
+        berkas.seek(0)
+        return berkas
+    except Exception as e:
+        berkas.close()
+        st.error(f"Error exporting data: {e}")
+        return None
+
+def tombol_ekspor(query, nama_file, params=None):
+    # Ekspor hanya dijalankan saat diminta, bukan di setiap rerun halaman.
+    # nama_file tanpa ekstensi; ekstensi mengikuti format yang dipilih.
+    kol_format, kol_tombol = st.columns([3, 1], vertical_alignment="bottom")
+    format = kol_format.radio("Format ekspor", list(FORMAT_EKSPOR), horizontal=True, key=f"format_{nama_file}")
+    ekstensi, mime = FORMAT_EKSPOR[format]
+    if kol_tombol.button(f"Siapkan {format}", key=f"siapkan_{nama_file}"):
+        berkas = ekspor_csv(query, params) if format == 'CSV' else ekspor_kolumnar(query, params, format)
+        if berkas is not None:
+            with berkas:
+                st.download_button(
+                    label=f"Download {format}",
+                    data=berkas.read(),
+                    file_name=f"{nama_file}.{ekstensi}",
+                    mime=mime,
+                    key=f"unduh_{nama_file}",
+                )
+
+# -------------------- IMPOR --------------------
+BATAS_TAMPIL_DITOLAK = 1000
+
+def baca_header_csv(berkas, tabel):
+    # Header boleh memakai nama kolom database atau label tampilan (hasil ekspor)
+    meta = TABEL[tabel]
+    dari_label = dict(zip(meta['label'], meta['kolom']))
+    baris = berkas.readline().decode('utf-8-sig')
+    header = next(csv.reader([baris]), [])
+    return [dari_label.get(h.strip(), h.strip()) for h in header]
+
+def impor_csv(tabel, berkas):
+    meta = TABEL[tabel]
+    kolom = baca_header_csv(berkas, tabel)
+    tidak_dikenal = [k for k in kolom if k not in meta['kolom']]
+    if tidak_dikenal:
+        st.error(f"Kolom tidak dikenal: {', '.join(tidak_dikenal)}")
+        return
+    if meta['kunci'] not in kolom:
+        st.error(f"Kolom {meta['kunci']} wajib ada di file.")
+        return
+    if len(set(kolom)) != len(kolom):
+        st.error("Ada kolom yang muncul lebih dari sekali di header.")
+        return
 
-# -------------------- SUPPLIER --------------------
-# Tambah Supplier
-def tambah_supplier(supplier_id, supplier_name, address):
     conn = get_connection()
     if conn is None:
         return
     cursor = conn.cursor()
+    q = {
+        'tabel': sql.Identifier(tabel),
+        'kunci': sql.Identifier(meta['kunci']),
+        'kolom': sql.SQL(', ').join(map(sql.Identifier, kolom)),
+        'kolom_tujuan': sql.SQL(', ').join(map(sql.Identifier, kolom)),
+        'nilai_tambahan': sql.SQL(''),
+        'outlet_sama': sql.SQL(''),
+    }
+    if meta.get('outlet'):
+        # Semua baris file masuk ke outlet aktif
+        outlet = sql.Literal(outlet_aktif())
+        q['kolom_tujuan'] = sql.SQL(', ').join(map(sql.Identifier, kolom + ['outlet_id']))
+        q['nilai_tambahan'] = sql.SQL(', {}').format(outlet)
+        if meta.get('kunci_outlet'):
+            q['outlet_sama'] = sql.SQL('AND t.outlet_id = {}').format(outlet)
     try:
+        # Kolom NOT NULL tanpa default wajib ada di file (outlet_id diisi otomatis)
+        cursor.execute('''
+            SELECT attname, atthasdef FROM pg_attribute
+            WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped AND attnotnull
+        ''', (tabel,))
+        tidak_null = dict(cursor.fetchall())
+        kurang = [k for k, ada_default in tidak_null.items()
+                  if k not in kolom and not ada_default and not (k == 'outlet_id' and meta.get('outlet'))]
+        if kurang:
+            conn.rollback()
+            st.error(f"Kolom {', '.join(kurang)} wajib ada di file.")
+            return
+
+        # Staging bertipe sama tapi tanpa constraint: semua baris masuk dulu,
+        # lalu diperiksa sekaligus
+        cursor.execute(sql.SQL('''
+            CREATE TEMP TABLE impor_staging ON COMMIT DROP AS
+            SELECT {kolom} FROM {tabel} WITH NO DATA;
+            ALTER TABLE impor_staging ADD COLUMN _baris bigserial, ADD COLUMN _alasan text;
+        ''').format(**q))
+        # Mulai dari awal file supaya nomor baris di pesan error COPY sama dengan file
+        berkas.seek(0)
+        cursor.copy_expert(
+            sql.SQL('COPY impor_staging ({kolom}) FROM STDIN WITH (FORMAT csv, HEADER true)').format(**q),
+            berkas
+        )
+
+        cursor.execute(sql.SQL('''
+            UPDATE impor_staging SET _alasan = 'ID kosong' WHERE {kunci} IS NULL;
+            UPDATE impor_staging s SET _alasan = 'ID duplikat di file'
+            FROM (
+                SELECT _baris, ROW_NUMBER() OVER (PARTITION BY {kunci} ORDER BY _baris) AS ke
+                FROM impor_staging
+            ) d
+            WHERE d._baris = s._baris AND d.ke > 1 AND s._alasan IS NULL;
+            UPDATE impor_staging s SET _alasan = 'ID sudah ada'
+            WHERE s._alasan IS NULL AND EXISTS (SELECT 1 FROM {tabel} t WHERE t.{kunci} = s.{kunci} {outlet_sama});
+        ''').format(**q))
+        for kolom_fk, (tabel_ref, kolom_ref) in meta['fk'].items():
+            if kolom_fk not in kolom:
+                continue
+            cursor.execute(sql.SQL('''
+                UPDATE impor_staging s SET _alasan = {alasan}
+                WHERE s._alasan IS NULL AND s.{kolom_fk} IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM {tabel_ref} r WHERE r.{kolom_ref} = s.{kolom_fk})
+            ''').format(
+                alasan=sql.Literal(f"{kolom_fk} tidak dikenal"),
+                kolom_fk=sql.Identifier(kolom_fk),
+                tabel_ref=sql.Identifier(tabel_ref),
+                kolom_ref=sql.Identifier(kolom_ref)
+            ))
+        # Constraint lain tabel tujuan juga dicek di staging, supaya baris yang
+        # melanggar ditolak sendiri dan tidak menggagalkan seluruh impor
+        for k in kolom:
+            if k in tidak_null and k != meta['kunci']:
+                cursor.execute(sql.SQL('''
+                    UPDATE impor_staging SET _alasan = {alasan} WHERE _alasan IS NULL AND {kolom} IS NULL
+                ''').format(alasan=sql.Literal(f"{k} kosong"), kolom=sql.Identifier(k)))
+        for k, nilai in meta.get('nilai', {}).items():
+            if k in kolom:
+                cursor.execute(sql.SQL('''
+                    UPDATE impor_staging SET _alasan = {alasan}
+                    WHERE _alasan IS NULL AND {kolom} IS NOT NULL AND {kolom} <> ALL (%s)
+                ''').format(alasan=sql.Literal(f"{k} tidak valid"), kolom=sql.Identifier(k)), (nilai,))
         cursor.execute('''
-            INSERT INTO supplier (supplier_id, supplier_name, address)
-            VALUES (%s, %s, %s)
-        ''', (supplier_id, supplier_name, address))
+            SELECT conname, pg_get_expr(conbin, conrelid),
+                   ARRAY(SELECT attname FROM pg_attribute WHERE attrelid = conrelid AND attnum = ANY (conkey))
+            FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'c'
+        ''', (tabel,))
+        for nama, ekspresi, kolom_cek in cursor.fetchall():
+            if set(kolom_cek) <= set(kolom):
+                cursor.execute(sql.SQL('''
+                    UPDATE impor_staging SET _alasan = {alasan} WHERE _alasan IS NULL AND NOT ({ekspresi})
+                ''').format(alasan=sql.Literal(f"melanggar {nama}"), ekspresi=sql.SQL(ekspresi)))
+        if meta.get('tanggal') in kolom and tabel_berpartisi(cursor, tabel):
+            rentang = rentang_partisi(cursor, tabel)
+            if rentang is not None:
+                cursor.execute(sql.SQL('''
+                    UPDATE impor_staging s SET _alasan = 'Tanggal di luar partisi'
+                    WHERE s._alasan IS NULL AND s.{tanggal} IS NOT NULL AND NOT EXISTS (
+                        SELECT 1 FROM unnest(%s::date[], %s::date[]) AS p (dari, sampai)
+                        WHERE (p.dari IS NULL OR s.{tanggal} >= p.dari)
+                          AND (p.sampai IS NULL OR s.{tanggal} < p.sampai)
+                    )
+                ''').format(tanggal=sql.Identifier(meta['tanggal'])),
+                    ([dari for dari, _ in rentang], [sampai for _, sampai in rentang]))
+
+        cursor.execute('SELECT COUNT(*) FROM impor_staging WHERE _alasan IS NOT NULL')
+        jumlah_ditolak = cursor.fetchone()[0]
+        cursor.execute(sql.SQL('''
+            SELECT _baris + 1, _alasan, {kolom} FROM impor_staging
+            WHERE _alasan IS NOT NULL ORDER BY _baris LIMIT %s
+        ''').format(**q), (BATAS_TAMPIL_DITOLAK,))
+        ditolak = cursor.fetchall()
+
+        cursor.execute(sql.SQL('''
+            INSERT INTO {tabel} ({kolom_tujuan})
+            SELECT {kolom}{nilai_tambahan} FROM impor_staging WHERE _alasan IS NULL ORDER BY _baris
+        ''').format(**q))
+        jumlah_masuk = cursor.rowcount
         conn.commit()
-        st.success("Data supplier berhasil ditambahkan.")
-    except psycopg2.IntegrityError:
-        conn.rollback()
-        st.error("Error: ID Supplier sudah ada.")
+        naikkan_versi(tabel)
     except Exception as e:
         conn.rollback()
-        st.error(f"Error adding supplier: {e}")
+        st.error(f"Error importing {tabel}: {e}")
+        return
     finally:
         cursor.close()
-        conn.close()
+        release_connection(conn)
 
-# Lihat Supplier
-def lihat_supplier():
+    st.success(f"{jumlah_masuk} baris berhasil diimpor.")
+    if jumlah_ditolak:
+        st.warning(f"{jumlah_ditolak} baris ditolak dan tidak diimpor.")
+        label = dict(zip(meta['kolom'], meta['label']))
+        tampilkan_dataframe(ditolak, ['Baris', 'Alasan'] + [label[k] for k in kolom])
+        if jumlah_ditolak > BATAS_TAMPIL_DITOLAK:
+            st.caption(f"Menampilkan {BATAS_TAMPIL_DITOLAK} baris ditolak pertama.")
+
+def form_impor_csv(tabel):
+    meta = TABEL[tabel]
+    st.caption("Header CSV memakai nama kolom atau label berikut: "
+               + ", ".join(f"{k} / {l}" for k, l in zip(meta['kolom'], meta['label'])))
+    berkas = st.file_uploader("Pilih file CSV", type=['csv'], key=f"berkas_impor_{tabel}")
+    if berkas is not None and st.button("Impor", key=f"impor_{tabel}"):
+        impor_csv(tabel, berkas)
+
+# -------------------- LOG SIDIK JARI --------------------
+# Log mesin sidik jari: satu punch per baris, "<fingerprint_id> <tanggal> <jam> ..."
+# dipisah spasi, tab, koma atau titik koma (kolom tambahan dari mesin diabaikan).
+# Punch pertama karyawan di suatu hari menjadi satu baris absensi berstatus Hadir.
+# ID absensi dibentuk dari karyawan + tanggal, jadi memproses ulang log yang sama
+# atau dua ingester yang berjalan bersamaan tidak menggandakan data. Absensi
+# masuk ke outlet karyawannya; Fingerprint ID dicocokkan dengan karyawan satu
+# outlet saja bila outlet diberikan (mesin tiap cabang memberi nomor sendiri).
+POLA_PUNCH = re.compile(r'^\s*([^\s,;]+)[\s,;]+(\d{4}-\d{2}-\d{2})[ T]\d{2}:\d{2}')
+UKURAN_BATCH_SIDIK_JARI = 1000
+# Fingerprint yang belum dikenal memicu muat ulang daftar karyawan paling sering sekali per selang ini
+JEDA_MUAT_ULANG_KARYAWAN = 30
+
+QUERY_SIMPAN_ABSENSI = '''
+    INSERT INTO absensi (absensi_id, karyawan_id, tanggal, status, outlet_id)
+    SELECT v.absensi_id, v.karyawan_id, v.tanggal, v.status, v.outlet_id
+    FROM (VALUES %s) AS v (absensi_id, karyawan_id, tanggal, status, outlet_id)
+    WHERE NOT EXISTS (SELECT 1 FROM absensi a WHERE a.karyawan_id = v.karyawan_id AND a.tanggal = v.tanggal)
+    ON CONFLICT DO NOTHING
+    RETURNING absensi_id
+'''
+
+class PenerimaSidikJari:
+    def __init__(self, conn, outlet=None):
+        self.conn = conn
+        self.outlet = outlet
+        self.batch = []
+        # (karyawan_id, tanggal) yang sudah diantrekan di proses ini
+        self.sudah = set()
+        self.statistik = dict.fromkeys(['dibaca', 'disimpan', 'duplikat', 'tidak_dikenal', 'format_salah'], 0)
+        self.muat_karyawan()
+
+    def muat_karyawan(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute('''
+                SELECT fingerprint_id, karyawan_id, outlet_id FROM karyawan
+                WHERE fingerprint_id IS NOT NULL AND (%(outlet)s IS NULL OR outlet_id = %(outlet)s)
+            ''', {'outlet': self.outlet})
+            self.sidik_jari = {fingerprint: (karyawan, outlet) for fingerprint, karyawan, outlet in cursor.fetchall()}
+        self.conn.commit()
+        self.dimuat_pada = time.monotonic()
+
+    def terima(self, baris):
+        # Mengembalikan True bila batch sudah penuh dan perlu dikirim
+        self.statistik['dibaca'] += 1
+        cocok = POLA_PUNCH.match(baris)
+        try:
+            tanggal = date.fromisoformat(cocok.group(2)) if cocok else None
+        except ValueError:
+            tanggal = None
+        if tanggal is None:
+            self.statistik['format_salah'] += 1
+            return False
+
+        fingerprint = cocok.group(1)
+        if fingerprint not in self.sidik_jari and time.monotonic() - self.dimuat_pada > JEDA_MUAT_ULANG_KARYAWAN:
+            self.muat_karyawan()
+        if fingerprint not in self.sidik_jari:
+            self.statistik['tidak_dikenal'] += 1
+            return False
+        karyawan, outlet = self.sidik_jari[fingerprint]
+
+        if (karyawan, tanggal) in self.sudah:
+            self.statistik['duplikat'] += 1
+            return False
+        self.sudah.add((karyawan, tanggal))
+        self.batch.append((f"FP-{karyawan}-{tanggal:%Y%m%d}", karyawan, tanggal, 'Hadir', outlet))
+        return len(self.batch) >= UKURAN_BATCH_SIDIK_JARI
+
+    def kirim(self):
+        from psycopg2 import extras
+        if not self.batch:
+            return 0
+        try:
+            with self.conn.cursor() as cursor:
+                hasil = extras.execute_values(cursor, QUERY_SIMPAN_ABSENSI, self.batch,
+                                              page_size=len(self.batch), fetch=True)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        naikkan_versi('absensi')
+        # Sisanya sudah tercatat di database (impor sebelumnya atau input manual)
+        self.statistik['disimpan'] += len(hasil)
+        self.statistik['duplikat'] += len(self.batch) - len(hasil)
+        self.batch = []
+        return len(hasil)
+
+    def proses(self, baris_baris):
+        for baris in baris_baris:
+            if self.terima(baris):
+                self.kirim()
+        self.kirim()
+        return self.statistik
+
+def impor_log_sidik_jari(berkas):
     conn = get_connection()
     if conn is None:
         return
-    cursor = conn.cursor(cursor_factory=extras.DictCursor)
     try:
-        cursor.execute('SELECT * FROM supplier')
-        rows = cursor.fetchall()
-        if rows:
-            df = pd.DataFrame(rows, columns=['ID Supplier', 'Nama Supplier', 'Alamat'])
-            st.dataframe(df)
-            
-            # Opsi download CSV
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name='daftar_supplier.csv',
-                mime='text/csv',
-            )
-        else:
-            st.info("Belum ada data supplier.")
+        penerima = PenerimaSidikJari(conn, outlet_aktif())
+        statistik = penerima.proses(io.TextIOWrapper(berkas, encoding='utf-8', errors='replace'))
     except Exception as e:
-        st.error(f"Error fetching data: {e}")
+        st.error(f"Error importing fingerprint log: {e}")
+        return
     finally:
-        cursor.close()
-        conn.close()
+        release_connection(conn)
 
-# Perbarui Supplier
-def perbarui_supplier(supplier_id, supplier_name=None, address=None):
+    st.success(f"{statistik['disimpan']} absensi Hadir tersimpan dari {statistik['dibaca']} baris log.")
+    if statistik['duplikat']:
+        st.info(f"{statistik['duplikat']} punch berulang di hari yang sama dilewati.")
+    if statistik['tidak_dikenal']:
+        st.warning(f"{statistik['tidak_dikenal']} punch dengan Fingerprint ID yang tidak terdaftar di data karyawan.")
+    if statistik['format_salah']:
+        st.warning(f"{statistik['format_salah']} baris tidak dikenali formatnya.")
+
+def form_log_sidik_jari():
+    st.caption("Satu punch per baris: Fingerprint ID, lalu tanggal dan jam (YYYY-MM-DD HH:MM[:SS]). "
+               "Punch pertama tiap karyawan per hari dicatat sebagai Hadir. "
+               "Fingerprint ID dicocokkan dengan karyawan outlet ini saja.")
+    berkas = st.file_uploader("Pilih file log", type=['txt', 'log', 'dat', 'csv'], key="berkas_log_sidik_jari")
+    if berkas is not None and st.button("Proses Log", key="proses_log_sidik_jari"):
+        impor_log_sidik_jari(berkas)
+
+# -------------------- PESANAN --------------------
+# Satu pesanan = header transaksi + baris detail_transaksi (menu, qty, harga saat
+# dipesan). Semua dikirim dalam satu statement: CTE mengambil harga dari menu.harga,
+# INSERT header dengan total dari baris-barisnya, lalu INSERT semua baris. Berapa
+# pun jumlah item tetap satu round trip, dan total tidak bisa berbeda dari isinya.
+# Statement yang sama memotong stok bahan baku sesuai resep (lihat RESEP).
+DDL_DETAIL_TRANSAKSI = """
+CREATE TABLE IF NOT EXISTS detail_transaksi (
+    transaksi_id text NOT NULL,
+    tanggal_pembelian date NOT NULL,
+    baris integer NOT NULL,
+    menu_id text NOT NULL REFERENCES menu (menu_id),
+    qty integer NOT NULL CHECK (qty > 0),
+    harga numeric NOT NULL,
+    PRIMARY KEY (transaksi_id, baris),
+    FOREIGN KEY (transaksi_id, tanggal_pembelian) REFERENCES transaksi (transaksi_id, tanggal_pembelian)
+        ON UPDATE CASCADE ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS detail_transaksi_menu_idx ON detail_transaksi (menu_id) INCLUDE (qty, harga);
+CREATE INDEX IF NOT EXISTS detail_transaksi_transaksi_idx ON detail_transaksi (transaksi_id, tanggal_pembelian);
+"""
+
+# Header hanya dibuat bila semua menu ditemukan (HAVING), jadi menu yang baru
+# dihapus membatalkan seluruh pesanan alih-alih menyimpan total yang kurang.
+QUERY_SIMPAN_PESANAN = """
+    WITH baris (baris, menu_id, qty) AS (VALUES %s),
+    harga AS (
+        SELECT b.baris, b.menu_id, b.qty, m.harga
+        FROM baris b JOIN menu m ON m.menu_id = b.menu_id
+    ),
+    kepala AS (
+        INSERT INTO transaksi (transaksi_id, tanggal_pembelian, pelanggan_id, karyawan_id, total_transaksi, outlet_id)
+        SELECT {transaksi_id}, {tanggal}, {pelanggan_id}, {karyawan_id}, SUM(harga * qty), {outlet}
+        FROM harga
+        HAVING COUNT(*) = {jumlah}
+        RETURNING transaksi_id, tanggal_pembelian, total_transaksi
+    ),
+    detail AS (
+        INSERT INTO detail_transaksi (transaksi_id, tanggal_pembelian, baris, menu_id, qty, harga)
+        SELECT k.transaksi_id, k.tanggal_pembelian, h.baris, h.menu_id, h.qty, h.harga
+        FROM kepala k CROSS JOIN harga h
+        RETURNING 1
+    ),
+    pakai AS (
+        SELECT r.bahan_id, SUM(r.jumlah * h.qty) AS jumlah
+        FROM harga h JOIN resep r ON r.menu_id = h.menu_id
+        GROUP BY r.bahan_id
+    ),
+    -- Stok yang dipotong milik outlet pesanan. Baris bahan dikunci berurutan
+    -- bahan_id: dua kasir yang memesan bahan yang sama selalu mengunci dengan
+    -- urutan sama, jadi saling menunggu tanpa deadlock
+    kunci AS (
+        SELECT b.bahan_id, p.jumlah
+        FROM bahan_baku b JOIN pakai p ON p.bahan_id = b.bahan_id
+        WHERE b.outlet_id = {outlet}
+        ORDER BY b.bahan_id
+        FOR UPDATE OF b
+    ),
+    stok AS (
+        UPDATE bahan_baku b SET stock = b.stock - k.jumlah
+        FROM kunci k
+        WHERE b.outlet_id = {outlet} AND b.bahan_id = k.bahan_id
+        RETURNING b.nama_bahan, b.stock
+    )
+    SELECT total_transaksi, (SELECT COUNT(*) FROM detail),
+           (SELECT array_agg(nama_bahan ORDER BY nama_bahan) FROM stok WHERE stock < 0)
+    FROM kepala
+"""
+
+def simpan_pesanan(transaksi_id, tanggal_pembelian, pelanggan_id, karyawan_id, item):
+    # item: daftar (menu_id, qty)
+    from psycopg2 import extras
     conn = get_connection()
     if conn is None:
         return
-    cursor = conn.cursor()
-    fields = []
-    params = []
-    if supplier_name:
-        fields.append("supplier_name = %s")
-        params.append(supplier_name)
-    if address:
-        fields.append("address = %s")
-        params.append(address)
-    
-    if not fields:
-        st.warning("Tidak ada field yang diperbarui.")
-        return
-    
-    params.append(supplier_id)
-    sql_query = f"UPDATE supplier SET {', '.join(fields)} WHERE supplier_id = %s"
-    
+    baris = [(i, menu_id, qty) for i, (menu_id, qty) in enumerate(item, start=1)]
+    query = sql.SQL(QUERY_SIMPAN_PESANAN).format(
+        transaksi_id=sql.Literal(transaksi_id),
+        tanggal=sql.Literal(tanggal_pembelian),
+        pelanggan_id=sql.Literal(pelanggan_id),
+        karyawan_id=sql.Literal(karyawan_id),
+        outlet=sql.Literal(outlet_aktif()),
+        jumlah=sql.Literal(len(baris)),
+    )
     try:
-        cursor.execute(sql_query, params)
-        if cursor.rowcount == 0:
-            st.warning("Supplier tidak ditemukan.")
-        else:
-            conn.commit()
-            st.success("Data supplier berhasil diperbarui.")
+        with conn.cursor() as cursor:
+            hasil = extras.execute_values(cursor, query.as_string(conn), baris, template='(%s::integer, %s::text, %s::integer)',
+                                          page_size=len(baris), fetch=True)
+        if not hasil:
+            conn.rollback()
+            st.error("Pesanan tidak disimpan: sebagian menu tidak ditemukan (mungkin baru dihapus).")
+            return
+        conn.commit()
+        naikkan_versi('transaksi')
+        naikkan_versi('bahan_baku')
+        total, jumlah, minus = hasil[0]
+        st.success(f"Pesanan {transaksi_id} tersimpan: {jumlah} item, total Rp {total:,.0f}.")
+        if minus:
+            st.warning(f"Stok menjadi minus, periksa persediaan: {', '.join(minus)}.")
+    except psycopg2.errors.UniqueViolation:
+        conn.rollback()
+        st.error("Error: ID Transaksi sudah ada.")
     except Exception as e:
         conn.rollback()
-        st.error(f"Error updating supplier: {e}")
+        st.error(f"Error saving order: {e}")
     finally:
-        cursor.close()
-        conn.close()
+        release_connection(conn)
 
-# Hapus Supplier
-def hapus_supplier(supplier_id):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
+def form_pesanan():
+    import pandas as pd
     try:
-        cursor.execute('DELETE FROM supplier WHERE supplier_id = %s', (supplier_id,))
-        if cursor.rowcount == 0:
-            st.warning("Supplier tidak ditemukan.")
+        menu = baca_tabel('menu', 'semua')
+    except Exception as e:
+        st.error(f"Error fetching data: {e}")
+        return
+    if menu is None:
+        return
+    if not menu:
+        st.info("Belum ada data menu.")
+        return
+    i_kunci, i_nama, i_harga = (TABEL['menu']['kolom'].index(k) for k in ('menu_id', 'nama_menu', 'harga'))
+    opsi = {f"{r[i_kunci]} - {r[i_nama]}": (r[i_kunci], r[i_harga]) for r in menu}
+
+    pelanggan_id = pilih_baris('pelanggan', "Pelanggan", "Belum ada data pelanggan.")
+    karyawan_id = pilih_baris('karyawan', "Karyawan", "Belum ada data karyawan.")
+    with st.form("form_pesanan"):
+        transaksi_id = st.text_input("ID Transaksi")
+        tanggal_pembelian = st.date_input("Tanggal Pembelian")
+        item = st.data_editor(
+            pd.DataFrame({'Menu': pd.Series(dtype='object'), 'Qty': pd.Series(dtype='int')}),
+            column_config={
+                'Menu': st.column_config.SelectboxColumn("Menu", options=list(opsi), required=True),
+                'Qty': st.column_config.NumberColumn("Qty", min_value=1, step=1, default=1, required=True),
+            },
+            num_rows="dynamic", hide_index=True, key="item_pesanan"
+        )
+        submit = st.form_submit_button("Simpan Pesanan")
+
+    if submit:
+        item = [(opsi[r['Menu']][0], int(r['Qty'])) for _, r in item.iterrows()
+                if r['Menu'] in opsi and not pd.isna(r['Qty']) and r['Qty'] > 0]
+        if not transaksi_id or not tanggal_pembelian:
+            st.error("ID Transaksi dan Tanggal wajib diisi.")
+        elif not item:
+            st.error("Pesanan belum berisi menu.")
         else:
-            conn.commit()
-            st.success("Data supplier berhasil dihapus.")
+            simpan_pesanan(transaksi_id, tanggal_pembelian, pelanggan_id, karyawan_id, item)
+
+def lihat_detail_pesanan(transaksi_id):
+    query = sql.SQL("""
+        SELECT d.baris, d.menu_id, m.nama_menu, d.qty, d.harga, d.qty * d.harga
+        FROM detail_transaksi d JOIN menu m ON m.menu_id = d.menu_id
+        WHERE d.transaksi_id = %s
+        ORDER BY d.baris
+    """)
+    try:
+        rows = baca_tercache(('transaksi', 'menu'), query, (transaksi_id,))
     except Exception as e:
-        conn.rollback()
-        st.error(f"Error deleting supplier: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+        st.error(f"Error fetching data: {e}")
+        return
+    if rows is None:
+        return
+    if not rows:
+        st.info("Transaksi ini tidak punya detail pesanan (diinput tanpa item).")
+        return
+    tampilkan_dataframe(rows, ["No", "ID Menu", "Nama Menu", "Qty", "Harga", "Subtotal"])
+    st.caption(f"Total: Rp {sum(r[5] for r in rows):,.0f}")
 
-# -------------------- BAHAN BAKU --------------------
-# Tambah Bahan Baku
-def tambah_bahan_baku(bahan_id, nama_bahan, stock, satuan, harga_bahan, supplier_id):
+# -------------------- RESEP --------------------
+# Resep menghubungkan menu dengan jumlah bahan baku per porsi. Pesanan memotong
+# stok dalam statement simpan pesanan: kebutuhan dijumlah per bahan dulu, lalu
+# satu UPDATE ... FROM untuk semua bahan, bukan satu UPDATE per item.
+DDL_RESEP = """
+CREATE TABLE IF NOT EXISTS resep (
+    menu_id text NOT NULL REFERENCES menu (menu_id) ON DELETE CASCADE,
+    -- Kode bahan; stok yang dipotong milik bahan_baku outlet tempat pesanan dibuat
+    bahan_id text NOT NULL,
+    jumlah numeric NOT NULL CHECK (jumlah > 0),
+    PRIMARY KEY (menu_id, bahan_id)
+);
+CREATE INDEX IF NOT EXISTS resep_bahan_idx ON resep (bahan_id);
+-- Database lama membuat stock sebagai integer; resep butuh pecahan (0,2 kg)
+ALTER TABLE bahan_baku ALTER COLUMN stock TYPE numeric;
+"""
+
+def simpan_resep(menu_id, bahan):
+    # bahan: daftar (bahan_id, jumlah); resep lama diganti seluruhnya
+    from psycopg2 import extras
     conn = get_connection()
     if conn is None:
         return
-    cursor = conn.cursor()
     try:
-        cursor.execute('''
-            INSERT INTO bahan_baku (bahan_id, nama_bahan, stock, satuan, harga_bahan, supplier_id)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        ''', (bahan_id, nama_bahan, stock, satuan, harga_bahan, supplier_id))
+        with conn.cursor() as cursor:
+            cursor.execute('DELETE FROM resep WHERE menu_id = %s', (menu_id,))
+            if bahan:
+                extras.execute_values(cursor, 'INSERT INTO resep (menu_id, bahan_id, jumlah) VALUES %s',
+                                      [(menu_id, b, j) for b, j in bahan], page_size=len(bahan))
         conn.commit()
-        st.success("Data bahan baku berhasil ditambahkan.")
-    except psycopg2.IntegrityError:
-        conn.rollback()
-        st.error("Error: ID Bahan Baku sudah ada.")
+        naikkan_versi('menu')
+        st.success(f"Resep tersimpan: {len(bahan)} bahan.")
     except Exception as e:
         conn.rollback()
-        st.error(f"Error adding bahan baku: {e}")
+        st.error(f"Error saving recipe: {e}")
     finally:
-        cursor.close()
-        conn.close()
+        release_connection(conn)
 
-# Lihat Bahan Baku
-def lihat_bahan_baku():
-    conn = get_connection()
-    if conn is None:
+def form_resep(menu_id):
+    import pandas as pd
+    try:
+        bahan = baca_tabel('bahan_baku', 'semua')
+        resep = baca_tercache(('menu', 'bahan_baku'), sql.SQL(
+            'SELECT bahan_id, jumlah FROM resep WHERE menu_id = %s ORDER BY bahan_id'
+        ), (menu_id,))
+    except Exception as e:
+        st.error(f"Error fetching data: {e}")
+        return
+    if bahan is None or resep is None:
         return
-    cursor = conn.cursor(cursor_factory=extras.DictCursor)
+    if not bahan:
+        st.info("Belum ada data bahan baku.")
+        return
+    meta = TABEL['bahan_baku']
+    i_kunci, i_nama, i_satuan = (meta['kolom'].index(k) for k in ('bahan_id', 'nama_bahan', 'satuan'))
+    opsi = {f"{r[i_kunci]} - {r[i_nama]} ({r[i_satuan] or '-'})": r[i_kunci] for r in bahan}
+    label = {v: k for k, v in opsi.items()}
+
+    with st.form(f"form_resep_{menu_id}"):
+        isi = st.data_editor(
+            pd.DataFrame({
+                'Bahan': pd.Series([label.get(b) for b, _ in resep], dtype='object'),
+                'Jumlah per Porsi': pd.Series([float(j) for _, j in resep], dtype='float'),
+            }),
+            column_config={
+                'Bahan': st.column_config.SelectboxColumn("Bahan", options=list(opsi), required=True),
+                'Jumlah per Porsi': st.column_config.NumberColumn("Jumlah per Porsi", min_value=0.0, required=True),
+            },
+            num_rows="dynamic", hide_index=True, key=f"isi_resep_{menu_id}"
+        )
+        submit = st.form_submit_button("Simpan Resep")
+
+    if submit:
+        gabung = {}
+        for _, r in isi.iterrows():
+            if r['Bahan'] in opsi and not pd.isna(r['Jumlah per Porsi']) and r['Jumlah per Porsi'] > 0:
+                gabung[opsi[r['Bahan']]] = gabung.get(opsi[r['Bahan']], 0) + r['Jumlah per Porsi']
+        simpan_resep(menu_id, list(gabung.items()))
+
+# -------------------- NOTIFIKASI STOK --------------------
+# Trigger di bahan_baku mengirim NOTIFY saat stok turun melewati stok_minimum.
+# Satu thread per proses mendengarkan kanal itu lewat koneksi khusus di luar pool
+# (LISTEN terikat ke satu koneksi) dan menaruh peringatan di antrean memori. Tiap
+# sesi memeriksa antrean itu lewat fragment berkala, jadi database tidak di-polling.
+KANAL_STOK = 'stok_minimum'
+# Tanpa notifikasi selama ini, koneksi LISTEN di-ping untuk mendeteksi putus
+JEDA_PING_PENDENGAR = 60
+
+DDL_NOTIFIKASI_STOK = """
+ALTER TABLE bahan_baku ADD COLUMN IF NOT EXISTS stok_minimum numeric;
+
+CREATE OR REPLACE FUNCTION notifikasi_stok_minimum() RETURNS trigger AS $$
+BEGIN
+    -- Hanya saat melewati batas: stok yang sudah di bawah minimum tidak diulang
+    PERFORM pg_notify('stok_minimum', json_build_object(
+        'outlet_id', b.outlet_id, 'bahan_id', b.bahan_id, 'nama_bahan', b.nama_bahan,
+        'stock', b.stock, 'satuan', b.satuan, 'stok_minimum', b.stok_minimum
+    )::text)
+    FROM baru b JOIN lama l ON l.outlet_id = b.outlet_id AND l.bahan_id = b.bahan_id
+    WHERE b.stock < b.stok_minimum
+      AND NOT COALESCE(l.stock < l.stok_minimum, false);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_stok_minimum ON bahan_baku;
+CREATE TRIGGER trg_stok_minimum AFTER UPDATE ON bahan_baku
+    REFERENCING OLD TABLE AS lama NEW TABLE AS baru
+    FOR EACH STATEMENT EXECUTE FUNCTION notifikasi_stok_minimum();
+"""
+
+# Versi sebelum outlet, dipakai migrasi 8 apa adanya; migrasi 9 (pasang_outlet)
+# menggantinya dengan versi per outlet di atas.
+DDL_NOTIFIKASI_STOK_AWAL = """
+ALTER TABLE bahan_baku ADD COLUMN IF NOT EXISTS stok_minimum numeric;
+
+CREATE OR REPLACE FUNCTION notifikasi_stok_minimum() RETURNS trigger AS $$
+BEGIN
+    -- Hanya saat melewati batas: stok yang sudah di bawah minimum tidak diulang
+    PERFORM pg_notify('stok_minimum', json_build_object(
+        'bahan_id', b.bahan_id, 'nama_bahan', b.nama_bahan, 'stock', b.stock,
+        'satuan', b.satuan, 'stok_minimum', b.stok_minimum
+    )::text)
+    FROM baru b JOIN lama l ON l.bahan_id = b.bahan_id
+    WHERE b.stock < b.stok_minimum
+      AND NOT COALESCE(l.stock < l.stok_minimum, false);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_stok_minimum ON bahan_baku;
+CREATE TRIGGER trg_stok_minimum AFTER UPDATE ON bahan_baku
+    REFERENCING OLD TABLE AS lama NEW TABLE AS baru
+    FOR EACH STATEMENT EXECUTE FUNCTION notifikasi_stok_minimum();
+"""
+
+class PendengarStok:
+    def __init__(self, db, ukuran=100):
+        self.db = db
+        # (nomor urut, isi notifikasi); sesi mengingat nomor terakhir yang sudah ditampilkan
+        self.peringatan = deque(maxlen=ukuran)
+        self.nomor = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self._jalan, name="pendengar-stok", daemon=True).start()
+
+    def sejak(self, nomor):
+        with self.lock:
+            return [(n, isi) for n, isi in self.peringatan if n > nomor], self.nomor
+
+    def _jalan(self):
+        jeda = 1
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.db)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(sql.SQL('LISTEN {}').format(sql.Identifier(KANAL_STOK)))
+                jeda = 1
+                while True:
+                    if not select.select([conn], [], [], JEDA_PING_PENDENGAR)[0]:
+                        with conn.cursor() as cursor:
+                            cursor.execute('SELECT 1')
+                        continue
+                    conn.poll()
+                    with self.lock:
+                        for notif in conn.notifies:
+                            self.nomor += 1
+                            self.peringatan.append((self.nomor, json.loads(notif.payload)))
+                    conn.notifies.clear()
+            except Exception as e:
+                log.warning("Pendengar stok terputus, coba lagi dalam %d detik: %s", jeda, e)
+                time.sleep(jeda)
+                jeda = min(jeda * 2, 60)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+@st.cache_resource
+def get_pendengar_stok(database=DATABASE_UTAMA):
+    # Satu pendengar per database; peringatan disaring per outlet oleh sesi
+    return PendengarStok(get_konfigurasi().database[database])
+
+@st.fragment(run_every=1)
+def notifikasi_stok():
+    # Hanya membaca antrean memori proses; tidak ada query ke database
+    database, outlet = database_aktif(), outlet_aktif()
+    kunci = f"notifikasi_stok_terakhir_{database}"
+    baru, terakhir = get_pendengar_stok(database).sejak(st.session_state.get(kunci, -1))
+    if kunci in st.session_state:
+        for _, isi in baru:
+            if isi.get('outlet_id') != outlet:
+                continue
+            st.toast(f"Stok {isi['nama_bahan']} tinggal {isi['stock']:g} {isi['satuan'] or ''} "
+                     f"(minimum {isi['stok_minimum']:g}).", icon="⚠️")
+    # Sesi baru mulai dari notifikasi terbaru, tidak menampilkan yang lama
+    st.session_state[kunci] = terakhir
+
+# -------------------- PEMILIH BARIS --------------------
+# Pengganti selectbox berisi seluruh tabel: hasil pencarian selalu dibatasi
+# BATAS_PILIHAN baris, jadi latensinya tidak ikut membesar bersama tabel.
+BATAS_PILIHAN = 50
+
+def pola_like(kata):
+    return kata.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def jenis_pilihan(tabel, kata):
+    if len(kata) >= 3:
+        # Cukup panjang untuk indeks trigram: cocokkan di mana saja, tanpa beda huruf besar/kecil
+        return 'pilih_cari', (f"%{pola_like(kata)}%", BATAS_PILIHAN)
+    if kata:
+        # Terlalu pendek untuk trigram: awalan ID lewat indeks text_pattern_ops
+        return 'pilih_awalan', (f"{pola_like(kata)}%", BATAS_PILIHAN)
+    return 'pilih', (BATAS_PILIHAN,)
+
+def pilih_baris(tabel, label, pesan_kosong):
+    kata = st.text_input(f"Cari {label}", key=f"cari_{tabel}", placeholder="Ketik ID atau nama").strip()
     try:
-        cursor.execute('SELECT * FROM bahan_baku')
-        rows = cursor.fetchall()
-        if rows:
-            df = pd.DataFrame(rows, columns=['ID Bahan Baku', 'Nama Bahan', 'Stock', 'Satuan', 'Harga Bahan', 'ID Supplier'])
-            st.dataframe(df)
-            
-            # Opsi download CSV
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name='daftar_bahan_baku.csv',
-                mime='text/csv',
-            )
-        else:
-            st.info("Belum ada data bahan baku.")
+        rows = baca_tabel(tabel, *jenis_pilihan(tabel, kata))
     except Exception as e:
         st.error(f"Error fetching data: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+        return None
+    if rows is None:
+        return None
+    if not rows:
+        st.info(f"Tidak ada {label.lower()} yang cocok dengan \"{kata}\"." if kata else pesan_kosong)
+        return None
+
+    opsi = {row[0]: f"{row[0]} - {row[1]}" for row in rows}
+    pilihan = st.selectbox(f"Pilih {label}", list(opsi), format_func=opsi.get, key=f"pilih_{tabel}")
+    if len(rows) == BATAS_PILIHAN:
+        st.caption(f"Menampilkan {BATAS_PILIHAN} hasil pertama, ketik lebih spesifik untuk mempersempit.")
+    return pilihan
+
+def indeks_pencarian(trigram=True):
+    # Daftar (tabel, nama indeks, definisi) untuk buat_indeks
+    indeks = []
+    for tabel, meta in TABEL.items():
+        indeks.append((tabel, f"{tabel}_{meta['kunci']}_prefix",
+                       sql.SQL('({} text_pattern_ops)').format(sql.Identifier(meta['kunci']))))
+        if trigram:
+            for kolom in meta['cari']:
+                indeks.append((tabel, f"{tabel}_{kolom}_trgm",
+                               sql.SQL('USING gin ({} gin_trgm_ops)').format(sql.Identifier(kolom))))
+    return indeks
+
+def pasang_indeks_pencarian(conn):
+    # CONCURRENTLY tidak boleh di dalam transaksi, dan tidak mengunci tulis
+    # ke tabel selama indeks dibangun.
+    try:
+        jalankan_tanpa_transaksi(conn, ['CREATE EXTENSION IF NOT EXISTS pg_trgm'])
+        trigram = True
+    except psycopg2.Error:
+        trigram = False
+    buat_indeks(conn, indeks_pencarian(trigram))
+    return trigram
+
+# -------------------- CRUD FUNCTIONS --------------------
+# Pembungkus tipis di atas repositori; tanda tangan fungsi tetap sama untuk UI.
+# Saat memperbarui, isian teks kosong dari form dianggap tidak diubah (or None).
+# -------------------- KARYAWAN --------------------
+# Tambah Karyawan
+def tambah_karyawan(karyawan_id, employee_name, position, fingerprint_id=None):
+    tambah_baris('karyawan', karyawan_id=karyawan_id, employee_name=employee_name, position=position, fingerprint_id=fingerprint_id)
+
+# Lihat Karyawan
+def lihat_karyawan():
+    lihat_tabel('karyawan')
+
+# Perbarui Karyawan
+def perbarui_karyawan(karyawan_id, employee_name=None, position=None, fingerprint_id=None):
+    perbarui_baris(
+        'karyawan', karyawan_id,
+        employee_name=employee_name or None,
+        position=position or None,
+        fingerprint_id=fingerprint_id
+    )
+
+# Hapus Karyawan
+def hapus_karyawan(karyawan_id):
+    hapus_baris('karyawan', karyawan_id)
+
+# -------------------- PELANGGAN --------------------
+# Tambah Pelanggan
+def tambah_pelanggan(pelanggan_id, cus_name, contact_info):
+    tambah_baris('pelanggan', pelanggan_id=pelanggan_id, cus_name=cus_name, contact_info=contact_info)
+
+# Lihat Pelanggan
+def lihat_pelanggan():
+    lihat_tabel('pelanggan')
+
+# Perbarui Pelanggan
+def perbarui_pelanggan(pelanggan_id, cus_name=None, contact_info=None):
+    perbarui_baris(
+        'pelanggan', pelanggan_id,
+        cus_name=cus_name or None,
+        contact_info=contact_info or None
+    )
+
+# Hapus Pelanggan
+def hapus_pelanggan(pelanggan_id):
+    hapus_baris('pelanggan', pelanggan_id)
+
+# -------------------- SUPPLIER --------------------
+# Tambah Supplier
+def tambah_supplier(supplier_id, supplier_name, address):
+    tambah_baris('supplier', supplier_id=supplier_id, supplier_name=supplier_name, address=address)
+
+# Lihat Supplier
+def lihat_supplier():
+    lihat_tabel('supplier')
+
+# Perbarui Supplier
+def perbarui_supplier(supplier_id, supplier_name=None, address=None):
+    perbarui_baris(
+        'supplier', supplier_id,
+        supplier_name=supplier_name or None,
+        address=address or None
+    )
+
+# Hapus Supplier
+def hapus_supplier(supplier_id):
+    hapus_baris('supplier', supplier_id)
+
+# -------------------- BAHAN BAKU --------------------
+# Tambah Bahan Baku
+def tambah_bahan_baku(bahan_id, nama_bahan, stock, satuan, harga_bahan, supplier_id, stok_minimum=None):
+    tambah_baris('bahan_baku', bahan_id=bahan_id, nama_bahan=nama_bahan, stock=stock, satuan=satuan, harga_bahan=harga_bahan, supplier_id=supplier_id, stok_minimum=stok_minimum)
+
+# Lihat Bahan Baku
+def lihat_bahan_baku():
+    lihat_tabel('bahan_baku')
 
 # Perbarui Bahan Baku
-def perbarui_bahan_baku(bahan_id, nama_bahan=None, stock=None, satuan=None, harga_bahan=None, supplier_id=None):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
-    fields = []
-    params = []
-    if nama_bahan:
-        fields.append("nama_bahan = %s")
-        params.append(nama_bahan)
-    if stock is not None:
-        fields.append("stock = %s")
-        params.append(stock)
-    if satuan:
-        fields.append("satuan = %s")
-        params.append(satuan)
-    if harga_bahan is not None:
-        fields.append("harga_bahan = %s")
-        params.append(harga_bahan)
-    if supplier_id:
-        fields.append("supplier_id = %s")
-        params.append(supplier_id)
-    
-    if not fields:
-        st.warning("Tidak ada field yang diperbarui.")
-        return
-    
-    params.append(bahan_id)
-    sql_query = f"UPDATE bahan_baku SET {', '.join(fields)} WHERE bahan_id = %s"
-    
-    try:
-        cursor.execute(sql_query, params)
-        if cursor.rowcount == 0:
-            st.warning("Bahan Baku tidak ditemukan.")
-        else:
-            conn.commit()
-            st.success("Data bahan baku berhasil diperbarui.")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Error updating bahan baku: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+def perbarui_bahan_baku(bahan_id, nama_bahan=None, stock=None, satuan=None, harga_bahan=None, supplier_id=None, stok_minimum=None):
+    perbarui_baris(
+        'bahan_baku', bahan_id,
+        nama_bahan=nama_bahan or None,
+        stock=stock,
+        satuan=satuan or None,
+        harga_bahan=harga_bahan,
+        supplier_id=supplier_id or None,
+        stok_minimum=stok_minimum
+    )
 
 # Hapus Bahan Baku
 def hapus_bahan_baku(bahan_id):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
-    try:
-        cursor.execute('DELETE FROM bahan_baku WHERE bahan_id = %s', (bahan_id,))
-        if cursor.rowcount == 0:
-            st.warning("Bahan Baku tidak ditemukan.")
-        else:
-            conn.commit()
-            st.success("Data bahan baku berhasil dihapus.")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Error deleting bahan baku: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    hapus_baris('bahan_baku', bahan_id)
 
 # -------------------- MENU --------------------
 # Tambah Menu
 def tambah_menu(menu_id, nama_menu, harga):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            INSERT INTO menu (menu_id, nama_menu, harga)
-            VALUES (%s, %s, %s)
-        ''', (menu_id, nama_menu, harga))
-        conn.commit()
-        st.success("Data menu berhasil ditambahkan.")
-    except psycopg2.IntegrityError:
-        conn.rollback()
-        st.error("Error: ID Menu sudah ada.")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Error adding menu: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    tambah_baris('menu', menu_id=menu_id, nama_menu=nama_menu, harga=harga)
 
 # Lihat Menu
 def lihat_menu():
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor(cursor_factory=extras.DictCursor)
-    try:
-        cursor.execute('SELECT * FROM menu')
-        rows = cursor.fetchall()
-        if rows:
-            df = pd.DataFrame(rows, columns=['ID Menu', 'Nama Menu', 'Harga'])
-            st.dataframe(df)
-            
-            # Opsi download CSV
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name='daftar_menu.csv',
-                mime='text/csv',
-            )
-        else:
-            st.info("Belum ada data menu.")
-    except Exception as e:
-        st.error(f"Error fetching data: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    lihat_tabel('menu')
 
 # Perbarui Menu
 def perbarui_menu(menu_id, nama_menu=None, harga=None):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
-    fields = []
-    params = []
-    if nama_menu:
-        fields.append("nama_menu = %s")
-        params.append(nama_menu)
-    if harga is not None:
-        fields.append("harga = %s")
-        params.append(harga)
-    
-    if not fields:
-        st.warning("Tidak ada field yang diperbarui.")
-        return
-    
-    params.append(menu_id)
-    sql_query = f"UPDATE menu SET {', '.join(fields)} WHERE menu_id = %s"
-    
-    try:
-        cursor.execute(sql_query, params)
-        if cursor.rowcount == 0:
-            st.warning("Menu tidak ditemukan.")
-        else:
-            conn.commit()
-            st.success("Data menu berhasil diperbarui.")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Error updating menu: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    perbarui_baris(
+        'menu', menu_id,
+        nama_menu=nama_menu or None,
+        harga=harga
+    )
 
 # Hapus Menu
 def hapus_menu(menu_id):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
-    try:
-        cursor.execute('DELETE FROM menu WHERE menu_id = %s', (menu_id,))
-        if cursor.rowcount == 0:
-            st.warning("Menu tidak ditemukan.")
-        else:
-            conn.commit()
-            st.success("Data menu berhasil dihapus.")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Error deleting menu: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    hapus_baris('menu', menu_id)
 
 # -------------------- TRANSAKSI --------------------
 # Tambah Transaksi
 def tambah_transaksi(transaksi_id, tanggal_pembelian, pelanggan_id, karyawan_id, total_transaksi):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            INSERT INTO transaksi (transaksi_id, tanggal_pembelian, pelanggan_id, karyawan_id, total_transaksi)
-            VALUES (%s, %s, %s, %s, %s)
-        ''', (transaksi_id, tanggal_pembelian, pelanggan_id, karyawan_id, total_transaksi))
-        conn.commit()
-        st.success("Data transaksi berhasil ditambahkan.")
-    except psycopg2.IntegrityError:
-        conn.rollback()
-        st.error("Error: ID Transaksi sudah ada.")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Error adding transaksi: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    tambah_baris('transaksi', transaksi_id=transaksi_id, tanggal_pembelian=tanggal_pembelian, pelanggan_id=pelanggan_id, karyawan_id=karyawan_id, total_transaksi=total_transaksi)
 
 # Lihat Transaksi
-def lihat_transaksi():
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor(cursor_factory=extras.DictCursor)
-    try:
-        cursor.execute('SELECT * FROM transaksi')
-        rows = cursor.fetchall()
-        if rows:
-            df = pd.DataFrame(rows, columns=['ID Transaksi', 'Tanggal Pembelian', 'ID Pelanggan', 'ID Karyawan', 'Total Transaksi'])
-            st.dataframe(df)
-            
-            # Opsi download CSV
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name='daftar_transaksi.csv',
-                mime='text/csv',
-            )
-        else:
-            st.info("Belum ada data transaksi.")
-    except Exception as e:
-        st.error(f"Error fetching data: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+def lihat_transaksi(rentang=None):
+    lihat_tabel('transaksi', rentang)
 
 # Perbarui Transaksi
 def perbarui_transaksi(transaksi_id, tanggal_pembelian=None, pelanggan_id=None, karyawan_id=None, total_transaksi=None):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
-    fields = []
-    params = []
-    if tanggal_pembelian:
-        fields.append("tanggal_pembelian = %s")
-        params.append(tanggal_pembelian)
-    if pelanggan_id:
-        fields.append("pelanggan_id = %s")
-        params.append(pelanggan_id)
-    if karyawan_id:
-        fields.append("karyawan_id = %s")
-        params.append(karyawan_id)
-    if total_transaksi is not None:
-        fields.append("total_transaksi = %s")
-        params.append(total_transaksi)
-    
-    if not fields:
-        st.warning("Tidak ada field yang diperbarui.")
-        return
-    
-    params.append(transaksi_id)
-    sql_query = f"UPDATE transaksi SET {', '.join(fields)} WHERE transaksi_id = %s"
-    
-    try:
-        cursor.execute(sql_query, params)
-        if cursor.rowcount == 0:
-            st.warning("Transaksi tidak ditemukan.")
-        else:
-            conn.commit()
-            st.success("Data transaksi berhasil diperbarui.")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Error updating transaksi: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    perbarui_baris(
+        'transaksi', transaksi_id,
+        tanggal_pembelian=tanggal_pembelian or None,
+        pelanggan_id=pelanggan_id or None,
+        karyawan_id=karyawan_id or None,
+        total_transaksi=total_transaksi
+    )
 
 # Hapus Transaksi
 def hapus_transaksi(transaksi_id):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
-    try:
-        cursor.execute('DELETE FROM transaksi WHERE transaksi_id = %s', (transaksi_id,))
-        if cursor.rowcount == 0:
-            st.warning("Transaksi tidak ditemukan.")
-        else:
-            conn.commit()
-            st.success("Data transaksi berhasil dihapus.")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Error deleting transaksi: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    hapus_baris('transaksi', transaksi_id)
 
 # -------------------- FEEDBACK --------------------
 # Tambah Feedback
 def tambah_feedback(feedback_id, pelanggan_id, karyawan_id, tanggal, rating, komentar):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            INSERT INTO feedback (feedback_id, pelanggan_id, karyawan_id, tanggal, rating, komentar)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        ''', (feedback_id, pelanggan_id, karyawan_id, tanggal, rating, komentar))
-        conn.commit()
-        st.success("Data feedback berhasil ditambahkan.")
-    except psycopg2.IntegrityError:
-        conn.rollback()
-        st.error("Error: ID Feedback sudah ada.")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Error adding feedback: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    tambah_baris('feedback', feedback_id=feedback_id, pelanggan_id=pelanggan_id, karyawan_id=karyawan_id, tanggal=tanggal, rating=rating, komentar=komentar)
 
 # Lihat Feedback
-def lihat_feedback():
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor(cursor_factory=extras.DictCursor)
-    try:
-        cursor.execute('SELECT * FROM feedback')
-        rows = cursor.fetchall()
-        if rows:
-            df = pd.DataFrame(rows, columns=['ID Feedback', 'ID Pelanggan', 'ID Karyawan', 'Tanggal', 'Rating', 'Komentar'])
-            st.dataframe(df)
-            
-            # Opsi download CSV
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name='daftar_feedback.csv',
-                mime='text/csv',
-            )
-        else:
-            st.info("Belum ada data feedback.")
-    except Exception as e:
-        st.error(f"Error fetching data: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+def lihat_feedback(rentang=None):
+    lihat_tabel('feedback', rentang)
 
 # Perbarui Feedback
 def perbarui_feedback(feedback_id, pelanggan_id=None, karyawan_id=None, tanggal=None, rating=None, komentar=None):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
-    fields = []
-    params = []
-    if pelanggan_id:
-        fields.append("pelanggan_id = %s")
-        params.append(pelanggan_id)
-    if karyawan_id:
-        fields.append("karyawan_id = %s")
-        params.append(karyawan_id)
-    if tanggal:
-        fields.append("tanggal = %s")
-        params.append(tanggal)
-    if rating is not None:
-        fields.append("rating = %s")
-        params.append(rating)
-    if komentar:
-        fields.append("komentar = %s")
-        params.append(komentar)
-    
-    if not fields:
-        st.warning("Tidak ada field yang diperbarui.")
-        return
-    
-    params.append(feedback_id)
-    sql_query = f"UPDATE feedback SET {', '.join(fields)} WHERE feedback_id = %s"
-    
-    try:
-        cursor.execute(sql_query, params)
-        if cursor.rowcount == 0:
-            st.warning("Feedback tidak ditemukan.")
-        else:
-            conn.commit()
-            st.success("Data feedback berhasil diperbarui.")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Error updating feedback: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    perbarui_baris(
+        'feedback', feedback_id,
+        pelanggan_id=pelanggan_id or None,
+        karyawan_id=karyawan_id or None,
+        tanggal=tanggal or None,
+        rating=rating,
+        komentar=komentar or None
+    )
 
 # Hapus Feedback
 def hapus_feedback(feedback_id):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
-    try:
-        cursor.execute('DELETE FROM feedback WHERE feedback_id = %s', (feedback_id,))
-        if cursor.rowcount == 0:
-            st.warning("Feedback tidak ditemukan.")
-        else:
-            conn.commit()
-            st.success("Data feedback berhasil dihapus.")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Error deleting feedback: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    hapus_baris('feedback', feedback_id)
 
 # -------------------- ABSENSI SIDIK JARI --------------------
 # Tambah Absensi
 def tambah_absensi(absensi_id, karyawan_id, tanggal, status):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            INSERT INTO absensi (absensi_id, karyawan_id, tanggal, status)
-            VALUES (%s, %s, %s, %s)
-        ''', (absensi_id, karyawan_id, tanggal, status))
-        conn.commit()
-        st.success("Data absensi berhasil ditambahkan.")
-    except psycopg2.IntegrityError:
-        conn.rollback()
-        st.error("Error: ID Absensi sudah ada.")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Error adding absensi: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    tambah_baris('absensi', absensi_id=absensi_id, karyawan_id=karyawan_id, tanggal=tanggal, status=status)
 
 # Lihat Absensi
-def lihat_absensi():
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor(cursor_factory=extras.DictCursor)
-    try:
-        cursor.execute('SELECT * FROM absensi')
-        rows = cursor.fetchall()
-        if rows:
-            df = pd.DataFrame(rows, columns=['ID Absensi', 'ID Karyawan', 'Tanggal', 'Status'])
-            st.dataframe(df)
-            
-            # Opsi download CSV
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name='daftar_absensi.csv',
-                mime='text/csv',
-            )
-        else:
-            st.info("Belum ada data absensi.")
-    except Exception as e:
-        st.error(f"Error fetching data: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+def lihat_absensi(rentang=None):
+    lihat_tabel('absensi', rentang)
 
 # Perbarui Absensi
 def perbarui_absensi(absensi_id, karyawan_id=None, tanggal=None, status=None):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
-    fields = []
-    params = []
-    if karyawan_id:
-        fields.append("karyawan_id = %s")
-        params.append(karyawan_id)
-    if tanggal:
-        fields.append("tanggal = %s")
-        params.append(tanggal)
-    if status:
-        fields.append("status = %s")
-        params.append(status)
-    
-    if not fields:
-        st.warning("Tidak ada field yang diperbarui.")
-        return
-    
-    params.append(absensi_id)
-    sql_query = f"UPDATE absensi SET {', '.join(fields)} WHERE absensi_id = %s"
-    
-    try:
-        cursor.execute(sql_query, params)
-        if cursor.rowcount == 0:
-            st.warning("Absensi tidak ditemukan.")
-        else:
-            conn.commit()
-            st.success("Data absensi berhasil diperbarui.")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Error updating absensi: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    perbarui_baris(
+        'absensi', absensi_id,
+        karyawan_id=karyawan_id or None,
+        tanggal=tanggal or None,
+        status=status or None
+    )
 
 # Hapus Absensi
 def hapus_absensi(absensi_id):
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
-    try:
-        cursor.execute('DELETE FROM absensi WHERE absensi_id = %s', (absensi_id,))
-        if cursor.rowcount == 0:
-            st.warning("Absensi tidak ditemukan.")
-        else:
-            conn.commit()
-            st.success("Data absensi berhasil dihapus.")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Error deleting absensi: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    hapus_baris('absensi', absensi_id)
 
 # -------------------- CRUD UI --------------------
 # -------------------- KARYAWAN --------------------
@@ -951,20 +2573,8 @@ def manage_karyawan():
     
     elif action == "Perbarui":
         st.subheader("Perbarui Data Karyawan")
-        conn = get_connection()
-        if conn is None:
-            return
-        cursor = conn.cursor()
-        cursor.execute('SELECT karyawan_id, employee_name FROM karyawan')
-        karyawan_list = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if karyawan_list:
-            karyawan_ids = [f"{k[0]} - {k[1]}" for k in karyawan_list]
-            selected_karyawan = st.selectbox("Pilih Karyawan", karyawan_ids)
-            karyawan_id = selected_karyawan.split(" - ")[0]
-            
+        karyawan_id = pilih_baris('karyawan', "Karyawan", "Belum ada data karyawan.")
+        if karyawan_id is not None:
             with st.form("form_perbarui_karyawan"):
                 employee_name = st.text_input("Nama Karyawan")
                 position = st.selectbox("Posisi", ["Waiter", "Cashier", "Chef", "Manager", "Operational"])
@@ -976,29 +2586,13 @@ def manage_karyawan():
                         st.error("Nama dan Posisi wajib diisi.")
                     else:
                         perbarui_karyawan(karyawan_id, employee_name, position, fingerprint_id)
-        else:
-            st.info("Belum ada data karyawan.")
     
     elif action == "Hapus":
         st.subheader("Hapus Data Karyawan")
-        conn = get_connection()
-        if conn is None:
-            return
-        cursor = conn.cursor()
-        cursor.execute('SELECT karyawan_id, employee_name FROM karyawan')
-        karyawan_list = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if karyawan_list:
-            karyawan_ids = [f"{k[0]} - {k[1]}" for k in karyawan_list]
-            selected_karyawan = st.selectbox("Pilih Karyawan", karyawan_ids)
-            karyawan_id = selected_karyawan.split(" - ")[0]
-            
+        karyawan_id = pilih_baris('karyawan', "Karyawan", "Belum ada data karyawan.")
+        if karyawan_id is not None:
             if st.button("Hapus"):
                 hapus_karyawan(karyawan_id)
-        else:
-            st.info("Belum ada data karyawan.")
 
 # -------------------- PELANGGAN --------------------
 def manage_pelanggan():
@@ -1025,20 +2619,8 @@ def manage_pelanggan():
     
     elif action == "Perbarui":
         st.subheader("Perbarui Data Pelanggan")
-        conn = get_connection()
-        if conn is None:
-            return
-        cursor = conn.cursor()
-        cursor.execute('SELECT pelanggan_id, cus_name FROM pelanggan')
-        pelanggan_list = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if pelanggan_list:
-            pelanggan_ids = [f"{p[0]} - {p[1]}" for p in pelanggan_list]
-            selected_pelanggan = st.selectbox("Pilih Pelanggan", pelanggan_ids)
-            pelanggan_id = selected_pelanggan.split(" - ")[0]
-            
+        pelanggan_id = pilih_baris('pelanggan', "Pelanggan", "Belum ada data pelanggan.")
+        if pelanggan_id is not None:
             with st.form("form_perbarui_pelanggan"):
                 cus_name = st.text_input("Nama Pelanggan")
                 contact_info = st.text_input("Kontak Informasi")
@@ -1049,29 +2631,13 @@ def manage_pelanggan():
                         st.error("Nama dan Kontak Informasi wajib diisi.")
                     else:
                         perbarui_pelanggan(pelanggan_id, cus_name, contact_info)
-        else:
-            st.info("Belum ada data pelanggan.")
     
     elif action == "Hapus":
-        st.subheader("Hapus Data Pelanggan")
-        conn = get_connection()
-        if conn is None:
-            return
-        cursor = conn.cursor()
-        cursor.execute('SELECT pelanggan_id, cus_name FROM pelanggan')
-        pelanggan_list = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if pelanggan_list:
-            pelanggan_ids = [f"{p[0]} - {p[1]}" for p in pelanggan_list]
-            selected_pelanggan = st.selectbox("Pilih Pelanggan", pelanggan_ids)
-            pelanggan_id = selected_pelanggan.split(" - ")[0]
-            
+        st.subheader("Hapus Data Pelanggan")
+        pelanggan_id = pilih_baris('pelanggan', "Pelanggan", "Belum ada data pelanggan.")
+        if pelanggan_id is not None:
             if st.button("Hapus"):
                 hapus_pelanggan(pelanggan_id)
-        else:
-            st.info("Belum ada data pelanggan.")
 
 # -------------------- SUPPLIER --------------------
 def manage_supplier():
@@ -1098,20 +2664,8 @@ def manage_supplier():
     
     elif action == "Perbarui":
         st.subheader("Perbarui Data Supplier")
-        conn = get_connection()
-        if conn is None:
-            return
-        cursor = conn.cursor()
-        cursor.execute('SELECT supplier_id, supplier_name FROM supplier')
-        supplier_list = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if supplier_list:
-            supplier_ids = [f"{s[0]} - {s[1]}" for s in supplier_list]
-            selected_supplier = st.selectbox("Pilih Supplier", supplier_ids)
-            supplier_id = selected_supplier.split(" - ")[0]
-            
+        supplier_id = pilih_baris('supplier', "Supplier", "Belum ada data supplier.")
+        if supplier_id is not None:
             with st.form("form_perbarui_supplier"):
                 supplier_name = st.text_input("Nama Supplier")
                 address = st.text_input("Alamat")
@@ -1122,34 +2676,18 @@ def manage_supplier():
                         st.error("Nama dan Alamat wajib diisi.")
                     else:
                         perbarui_supplier(supplier_id, supplier_name, address)
-        else:
-            st.info("Belum ada data supplier.")
     
     elif action == "Hapus":
         st.subheader("Hapus Data Supplier")
-        conn = get_connection()
-        if conn is None:
-            return
-        cursor = conn.cursor()
-        cursor.execute('SELECT supplier_id, supplier_name FROM supplier')
-        supplier_list = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if supplier_list:
-            supplier_ids = [f"{s[0]} - {s[1]}" for s in supplier_list]
-            selected_supplier = st.selectbox("Pilih Supplier", supplier_ids)
-            supplier_id = selected_supplier.split(" - ")[0]
-            
+        supplier_id = pilih_baris('supplier', "Supplier", "Belum ada data supplier.")
+        if supplier_id is not None:
             if st.button("Hapus"):
                 hapus_supplier(supplier_id)
-        else:
-            st.info("Belum ada data supplier.")
 
 # -------------------- BAHAN BAKU --------------------
 def manage_bahan_baku():
     st.header("Kelola Data Bahan Baku")
-    action = st.selectbox("Pilih Aksi", ["Tambah", "Lihat", "Perbarui", "Hapus"])
+    action = st.selectbox("Pilih Aksi", ["Tambah", "Lihat", "Perbarui", "Hapus", "Impor CSV"])
     
     if action == "Tambah":
         st.subheader("Tambah Data Bahan Baku")
@@ -1160,13 +2698,14 @@ def manage_bahan_baku():
             satuan = st.selectbox("Satuan", ["kg", "liter", "butir", "pack", "pcs"])
             harga_bahan = st.number_input("Harga Bahan", min_value=0.0, step=1000.0)
             supplier_id = st.text_input("ID Supplier")
+            stok_minimum = st.number_input("Stok Minimum (peringatan saat stok di bawah ini)", min_value=0.0, value=None)
             submit = st.form_submit_button("Simpan")
             
             if submit:
                 if not bahan_id or not nama_bahan or not satuan or not harga_bahan or not supplier_id:
                     st.error("Semua field wajib diisi.")
                 else:
-                    tambah_bahan_baku(bahan_id, nama_bahan, stock, satuan, harga_bahan, supplier_id)
+                    tambah_bahan_baku(bahan_id, nama_bahan, stock, satuan, harga_bahan, supplier_id, stok_minimum)
     
     elif action == "Lihat":
         st.subheader("Daftar Bahan Baku")
@@ -1174,61 +2713,38 @@ def manage_bahan_baku():
     
     elif action == "Perbarui":
         st.subheader("Perbarui Data Bahan Baku")
-        conn = get_connection()
-        if conn is None:
-            return
-        cursor = conn.cursor()
-        cursor.execute('SELECT bahan_id, nama_bahan FROM bahan_baku')
-        bahan_baku_list = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if bahan_baku_list:
-            bahan_ids = [f"{b[0]} - {b[1]}" for b in bahan_baku_list]
-            selected_bahan = st.selectbox("Pilih Bahan Baku", bahan_ids)
-            bahan_id = selected_bahan.split(" - ")[0]
-            
+        bahan_id = pilih_baris('bahan_baku', "Bahan Baku", "Belum ada data bahan baku.")
+        if bahan_id is not None:
             with st.form("form_perbarui_bahan_baku"):
                 nama_bahan = st.text_input("Nama Bahan")
                 stock = st.number_input("Stock", min_value=0, step=1)
                 satuan = st.selectbox("Satuan", ["kg", "liter", "butir", "pack", "pcs"])
                 harga_bahan = st.number_input("Harga Bahan", min_value=0.0, step=1000.0)
                 supplier_id = st.text_input("ID Supplier")
+                stok_minimum = st.number_input("Stok Minimum (kosongkan jika tidak diubah)", min_value=0.0, value=None)
                 submit = st.form_submit_button("Perbarui")
                 
                 if submit:
                     if not nama_bahan or not satuan or not harga_bahan or not supplier_id:
                         st.error("Nama, Satuan, Harga Bahan, dan ID Supplier wajib diisi.")
                     else:
-                        perbarui_bahan_baku(bahan_id, nama_bahan, stock, satuan, harga_bahan, supplier_id)
-        else:
-            st.info("Belum ada data bahan baku.")
+                        perbarui_bahan_baku(bahan_id, nama_bahan, stock, satuan, harga_bahan, supplier_id, stok_minimum)
     
     elif action == "Hapus":
         st.subheader("Hapus Data Bahan Baku")
-        conn = get_connection()
-        if conn is None:
-            return
-        cursor = conn.cursor()
-        cursor.execute('SELECT bahan_id, nama_bahan FROM bahan_baku')
-        bahan_baku_list = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if bahan_baku_list:
-            bahan_ids = [f"{b[0]} - {b[1]}" for b in bahan_baku_list]
-            selected_bahan = st.selectbox("Pilih Bahan Baku", bahan_ids)
-            bahan_id = selected_bahan.split(" - ")[0]
-            
+        bahan_id = pilih_baris('bahan_baku', "Bahan Baku", "Belum ada data bahan baku.")
+        if bahan_id is not None:
             if st.button("Hapus"):
                 hapus_bahan_baku(bahan_id)
-        else:
-            st.info("Belum ada data bahan baku.")
+    
+    elif action == "Impor CSV":
+        st.subheader("Impor CSV Data Bahan Baku")
+        form_impor_csv('bahan_baku')
 
 # -------------------- MENU --------------------
 def manage_menu():
     st.header("Kelola Data Menu")
-    action = st.selectbox("Pilih Aksi", ["Tambah", "Lihat", "Perbarui", "Hapus"])
+    action = st.selectbox("Pilih Aksi", ["Tambah", "Lihat", "Perbarui", "Hapus", "Resep"])
     
     if action == "Tambah":
         st.subheader("Tambah Data Menu")
@@ -1250,20 +2766,8 @@ def manage_menu():
     
     elif action == "Perbarui":
         st.subheader("Perbarui Data Menu")
-        conn = get_connection()
-        if conn is None:
-            return
-        cursor = conn.cursor()
-        cursor.execute('SELECT menu_id, nama_menu FROM menu')
-        menu_list = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if menu_list:
-            menu_ids = [f"{m[0]} - {m[1]}" for m in menu_list]
-            selected_menu = st.selectbox("Pilih Menu", menu_ids)
-            menu_id = selected_menu.split(" - ")[0]
-            
+        menu_id = pilih_baris('menu', "Menu", "Belum ada data menu.")
+        if menu_id is not None:
             with st.form("form_perbarui_menu"):
                 nama_menu = st.text_input("Nama Menu")
                 harga = st.number_input("Harga Menu", min_value=0.0, step=1000.0)
@@ -1274,34 +2778,24 @@ def manage_menu():
                         st.error("Nama dan Harga Menu wajib diisi.")
                     else:
                         perbarui_menu(menu_id, nama_menu, harga)
-        else:
-            st.info("Belum ada data menu.")
     
     elif action == "Hapus":
         st.subheader("Hapus Data Menu")
-        conn = get_connection()
-        if conn is None:
-            return
-        cursor = conn.cursor()
-        cursor.execute('SELECT menu_id, nama_menu FROM menu')
-        menu_list = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if menu_list:
-            menu_ids = [f"{m[0]} - {m[1]}" for m in menu_list]
-            selected_menu = st.selectbox("Pilih Menu", menu_ids)
-            menu_id = selected_menu.split(" - ")[0]
-            
+        menu_id = pilih_baris('menu', "Menu", "Belum ada data menu.")
+        if menu_id is not None:
             if st.button("Hapus"):
                 hapus_menu(menu_id)
-        else:
-            st.info("Belum ada data menu.")
+    
+    elif action == "Resep":
+        st.subheader("Resep Menu")
+        menu_id = pilih_baris('menu', "Menu", "Belum ada data menu.")
+        if menu_id is not None:
+            form_resep(menu_id)
 
 # -------------------- TRANSAKSI --------------------
 def manage_transaksi():
     st.header("Kelola Data Transaksi")
-    action = st.selectbox("Pilih Aksi", ["Tambah", "Lihat", "Perbarui", "Hapus"])
+    action = st.selectbox("Pilih Aksi", ["Tambah", "Input Pesanan", "Lihat", "Detail Pesanan", "Perbarui", "Hapus", "Impor CSV"])
     
     if action == "Tambah":
         st.subheader("Tambah Data Transaksi")
@@ -1319,26 +2813,24 @@ def manage_transaksi():
                 else:
                     tambah_transaksi(transaksi_id, tanggal_pembelian, pelanggan_id, karyawan_id, total_transaksi)
     
+    elif action == "Input Pesanan":
+        st.subheader("Input Pesanan")
+        form_pesanan()
+    
     elif action == "Lihat":
         st.subheader("Daftar Transaksi")
-        lihat_transaksi()
+        lihat_transaksi(pilih_rentang('transaksi'))
+    
+    elif action == "Detail Pesanan":
+        st.subheader("Detail Pesanan")
+        transaksi_id = pilih_baris('transaksi', "Transaksi", "Belum ada data transaksi.")
+        if transaksi_id is not None:
+            lihat_detail_pesanan(transaksi_id)
     
     elif action == "Perbarui":
         st.subheader("Perbarui Data Transaksi")
-        conn = get_connection()
-        if conn is None:
-            return
-        cursor = conn.cursor()
-        cursor.execute('SELECT transaksi_id, tanggal_pembelian FROM transaksi')
-        transaksi_list = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if transaksi_list:
-            transaksi_ids = [f"{t[0]} - {t[1]}" for t in transaksi_list]
-            selected_transaksi = st.selectbox("Pilih Transaksi", transaksi_ids)
-            transaksi_id = selected_transaksi.split(" - ")[0]
-            
+        transaksi_id = pilih_baris('transaksi', "Transaksi", "Belum ada data transaksi.")
+        if transaksi_id is not None:
             with st.form("form_perbarui_transaksi"):
                 tanggal_pembelian = st.date_input("Tanggal Pembelian")
                 pelanggan_id = st.text_input("ID Pelanggan")
@@ -1351,29 +2843,17 @@ def manage_transaksi():
                         st.error("Tanggal dan Total Transaksi wajib diisi.")
                     else:
                         perbarui_transaksi(transaksi_id, tanggal_pembelian, pelanggan_id, karyawan_id, total_transaksi)
-        else:
-            st.info("Belum ada data transaksi.")
     
     elif action == "Hapus":
         st.subheader("Hapus Data Transaksi")
-        conn = get_connection()
-        if conn is None:
-            return
-        cursor = conn.cursor()
-        cursor.execute('SELECT transaksi_id, tanggal_pembelian FROM transaksi')
-        transaksi_list = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if transaksi_list:
-            transaksi_ids = [f"{t[0]} - {t[1]}" for t in transaksi_list]
-            selected_transaksi = st.selectbox("Pilih Transaksi", transaksi_ids)
-            transaksi_id = selected_transaksi.split(" - ")[0]
-            
+        transaksi_id = pilih_baris('transaksi', "Transaksi", "Belum ada data transaksi.")
+        if transaksi_id is not None:
             if st.button("Hapus"):
                 hapus_transaksi(transaksi_id)
-        else:
-            st.info("Belum ada data transaksi.")
+    
+    elif action == "Impor CSV":
+        st.subheader("Impor CSV Data Transaksi")
+        form_impor_csv('transaksi')
 
 # -------------------- FEEDBACK --------------------
 def manage_feedback():
@@ -1399,24 +2879,12 @@ def manage_feedback():
     
     elif action == "Lihat":
         st.subheader("Daftar Feedback")
-        lihat_feedback()
+        lihat_feedback(pilih_rentang('feedback'))
     
     elif action == "Perbarui":
         st.subheader("Perbarui Data Feedback")
-        conn = get_connection()
-        if conn is None:
-            return
-        cursor = conn.cursor()
-        cursor.execute('SELECT feedback_id, tanggal FROM feedback')
-        feedback_list = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if feedback_list:
-            feedback_ids = [f"{f[0]} - {f[1]}" for f in feedback_list]
-            selected_feedback = st.selectbox("Pilih Feedback", feedback_ids)
-            feedback_id = selected_feedback.split(" - ")[0]
-            
+        feedback_id = pilih_baris('feedback', "Feedback", "Belum ada data feedback.")
+        if feedback_id is not None:
             with st.form("form_perbarui_feedback"):
                 pelanggan_id = st.text_input("ID Pelanggan")
                 karyawan_id = st.text_input("ID Karyawan")
@@ -1430,34 +2898,18 @@ def manage_feedback():
                         st.error("ID Pelanggan, ID Karyawan, Tanggal, dan Rating wajib diisi.")
                     else:
                         perbarui_feedback(feedback_id, pelanggan_id, karyawan_id, tanggal, rating, komentar)
-        else:
-            st.info("Belum ada data feedback.")
     
     elif action == "Hapus":
         st.subheader("Hapus Data Feedback")
-        conn = get_connection()
-        if conn is None:
-            return
-        cursor = conn.cursor()
-        cursor.execute('SELECT feedback_id, tanggal FROM feedback')
-        feedback_list = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if feedback_list:
-            feedback_ids = [f"{f[0]} - {f[1]}" for f in feedback_list]
-            selected_feedback = st.selectbox("Pilih Feedback", feedback_ids)
-            feedback_id = selected_feedback.split(" - ")[0]
-            
+        feedback_id = pilih_baris('feedback', "Feedback", "Belum ada data feedback.")
+        if feedback_id is not None:
             if st.button("Hapus"):
                 hapus_feedback(feedback_id)
-        else:
-            st.info("Belum ada data feedback.")
 
 # -------------------- ABSENSI SIDIK JARI --------------------
 def manage_absensi():
     st.header("Kelola Data Absensi Sidik Jari")
-    action = st.selectbox("Pilih Aksi", ["Tambah", "Lihat", "Perbarui", "Hapus"])
+    action = st.selectbox("Pilih Aksi", ["Tambah", "Lihat", "Perbarui", "Hapus", "Impor CSV", "Impor Log Sidik Jari"])
     
     if action == "Tambah":
         st.subheader("Tambah Data Absensi")
@@ -1465,7 +2917,7 @@ def manage_absensi():
             absensi_id = st.text_input("ID Absensi")
             karyawan_id = st.text_input("ID Karyawan")
             tanggal = st.date_input("Tanggal")
-            status = st.selectbox("Status", ["Hadir", "Tidak Hadir", "Izin", "Cuti"])
+            status = st.selectbox("Status", TABEL['absensi']['nilai']['status'])
             submit = st.form_submit_button("Simpan")
             
             if submit:
@@ -1476,28 +2928,16 @@ def manage_absensi():
     
     elif action == "Lihat":
         st.subheader("Daftar Absensi")
-        lihat_absensi()
+        lihat_absensi(pilih_rentang('absensi'))
     
     elif action == "Perbarui":
         st.subheader("Perbarui Data Absensi")
-        conn = get_connection()
-        if conn is None:
-            return
-        cursor = conn.cursor()
-        cursor.execute('SELECT absensi_id, tanggal FROM absensi')
-        absensi_list = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if absensi_list:
-            absensi_ids = [f"{a[0]} - {a[1]}" for a in absensi_list]
-            selected_absensi = st.selectbox("Pilih Absensi", absensi_ids)
-            absensi_id = selected_absensi.split(" - ")[0]
-            
+        absensi_id = pilih_baris('absensi', "Absensi", "Belum ada data absensi.")
+        if absensi_id is not None:
             with st.form("form_perbarui_absensi"):
                 karyawan_id = st.text_input("ID Karyawan")
                 tanggal = st.date_input("Tanggal")
-                status = st.selectbox("Status", ["Hadir", "Tidak Hadir", "Izin", "Cuti"])
+                status = st.selectbox("Status", TABEL['absensi']['nilai']['status'])
                 submit = st.form_submit_button("Perbarui")
                 
                 if submit:
@@ -1505,242 +2945,1172 @@ def manage_absensi():
                         st.error("ID Karyawan, Tanggal, dan Status wajib diisi.")
                     else:
                         perbarui_absensi(absensi_id, karyawan_id, tanggal, status)
-        else:
-            st.info("Belum ada data absensi.")
     
     elif action == "Hapus":
         st.subheader("Hapus Data Absensi")
-        conn = get_connection()
-        if conn is None:
-            return
-        cursor = conn.cursor()
-        cursor.execute('SELECT absensi_id, tanggal FROM absensi')
-        absensi_list = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if absensi_list:
-            absensi_ids = [f"{a[0]} - {a[1]}" for a in absensi_list]
-            selected_absensi = st.selectbox("Pilih Absensi", absensi_ids)
-            absensi_id = selected_absensi.split(" - ")[0]
-            
+        absensi_id = pilih_baris('absensi', "Absensi", "Belum ada data absensi.")
+        if absensi_id is not None:
             if st.button("Hapus"):
                 hapus_absensi(absensi_id)
-        else:
-            st.info("Belum ada data absensi.")
-
-# -------------------- FUNGSI LAPORAN --------------------
-def total_transaksi_per_hari():
-    conn = get_connection()
-    if conn is None:
-        return
-    cursor = conn.cursor()
     
-    try:
+    elif action == "Impor CSV":
+        st.subheader("Impor CSV Data Absensi")
+        form_impor_csv('absensi')
+
+    elif action == "Impor Log Sidik Jari":
+        st.subheader("Impor Log Mesin Sidik Jari")
+        form_log_sidik_jari()
+
+# -------------------- REKAP HARIAN --------------------
+# Ringkasan penjualan per outlet per tanggal yang dijaga trigger statement-level pada
+# transaksi. Trigger membaca transition table, jadi impor massal (COPY/INSERT
+# ... SELECT) memperbarui rekap sekali per statement, bukan sekali per baris.
+DDL_REKAP_HARIAN = '''
+CREATE TABLE IF NOT EXISTS transaksi_harian (
+    outlet_id text NOT NULL,
+    tanggal date NOT NULL,
+    total numeric NOT NULL DEFAULT 0,
+    jumlah bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (outlet_id, tanggal)
+);
+
+CREATE OR REPLACE FUNCTION rekap_transaksi_harian() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE transaksi_harian h
+        SET total = h.total - l.total, jumlah = h.jumlah - l.jumlah
+        FROM (
+            SELECT outlet_id, tanggal_pembelian AS tanggal,
+                   SUM(COALESCE(total_transaksi, 0)) AS total, COUNT(*) AS jumlah
+            FROM lama
+            WHERE tanggal_pembelian IS NOT NULL
+            GROUP BY outlet_id, tanggal_pembelian
+        ) l
+        WHERE h.outlet_id = l.outlet_id AND h.tanggal = l.tanggal;
+        DELETE FROM transaksi_harian
+        WHERE jumlah <= 0 AND (outlet_id, tanggal) IN (SELECT outlet_id, tanggal_pembelian FROM lama);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO transaksi_harian AS h (outlet_id, tanggal, total, jumlah)
+        SELECT outlet_id, tanggal_pembelian, SUM(COALESCE(total_transaksi, 0)), COUNT(*)
+        FROM baru
+        WHERE tanggal_pembelian IS NOT NULL
+        GROUP BY outlet_id, tanggal_pembelian
+        ON CONFLICT (outlet_id, tanggal) DO UPDATE
+        SET total = h.total + EXCLUDED.total, jumlah = h.jumlah + EXCLUDED.jumlah;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+'''
+
+# Dipisah agar bisa dipasang ulang setelah tabel transaksi diganti (partisi)
+DDL_TRIGGER_REKAP_HARIAN = '''
+DROP TRIGGER IF EXISTS trg_rekap_harian_insert ON transaksi;
+DROP TRIGGER IF EXISTS trg_rekap_harian_update ON transaksi;
+DROP TRIGGER IF EXISTS trg_rekap_harian_delete ON transaksi;
+CREATE TRIGGER trg_rekap_harian_insert AFTER INSERT ON transaksi
+    REFERENCING NEW TABLE AS baru
+    FOR EACH STATEMENT EXECUTE FUNCTION rekap_transaksi_harian();
+CREATE TRIGGER trg_rekap_harian_update AFTER UPDATE ON transaksi
+    REFERENCING OLD TABLE AS lama NEW TABLE AS baru
+    FOR EACH STATEMENT EXECUTE FUNCTION rekap_transaksi_harian();
+CREATE TRIGGER trg_rekap_harian_delete AFTER DELETE ON transaksi
+    REFERENCING OLD TABLE AS lama
+    FOR EACH STATEMENT EXECUTE FUNCTION rekap_transaksi_harian();
+'''
+
+def bangun_ulang_rekap_harian(conn):
+    # Kunci SHARE menahan tulis ke transaksi selama hitung ulang agar rekap
+    # tidak kehilangan transaksi yang masuk di tengah proses.
+    with conn.cursor() as cursor:
+        cursor.execute('''
+            LOCK TABLE transaksi IN SHARE MODE;
+            DELETE FROM transaksi_harian;
+            INSERT INTO transaksi_harian (outlet_id, tanggal, total, jumlah)
+            SELECT outlet_id, tanggal_pembelian, SUM(COALESCE(total_transaksi, 0)), COUNT(*)
+            FROM transaksi
+            WHERE tanggal_pembelian IS NOT NULL
+            GROUP BY outlet_id, tanggal_pembelian
+        ''')
+        jumlah_hari = cursor.rowcount
+    conn.commit()
+    naikkan_versi('transaksi')
+    return jumlah_hari
+
+def pasang_rekap_harian(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(DDL_REKAP_HARIAN)
+        cursor.execute(DDL_TRIGGER_REKAP_HARIAN)
+    conn.commit()
+    return bangun_ulang_rekap_harian(conn)
+
+# Versi sebelum outlet, dipakai migrasi 3 apa adanya: database lama baru
+# mendapat kolom outlet_id di migrasi 9, yang lalu memasang versi per outlet.
+DDL_REKAP_HARIAN_AWAL = '''
+CREATE TABLE IF NOT EXISTS transaksi_harian (
+    tanggal date PRIMARY KEY,
+    total numeric NOT NULL DEFAULT 0,
+    jumlah bigint NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION rekap_transaksi_harian() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE transaksi_harian h
+        SET total = h.total - l.total, jumlah = h.jumlah - l.jumlah
+        FROM (
+            SELECT tanggal_pembelian AS tanggal,
+                   SUM(COALESCE(total_transaksi, 0)) AS total, COUNT(*) AS jumlah
+            FROM lama
+            WHERE tanggal_pembelian IS NOT NULL
+            GROUP BY tanggal_pembelian
+        ) l
+        WHERE h.tanggal = l.tanggal;
+        DELETE FROM transaksi_harian
+        WHERE jumlah <= 0 AND tanggal IN (SELECT tanggal_pembelian FROM lama);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO transaksi_harian AS h (tanggal, total, jumlah)
+        SELECT tanggal_pembelian, SUM(COALESCE(total_transaksi, 0)), COUNT(*)
+        FROM baru
+        WHERE tanggal_pembelian IS NOT NULL
+        GROUP BY tanggal_pembelian
+        ON CONFLICT (tanggal) DO UPDATE
+        SET total = h.total + EXCLUDED.total, jumlah = h.jumlah + EXCLUDED.jumlah;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+'''
+
+def pasang_rekap_harian_awal(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(DDL_REKAP_HARIAN_AWAL)
+        cursor.execute(DDL_TRIGGER_REKAP_HARIAN)
         cursor.execute('''
-            SELECT tanggal_pembelian, SUM(total_transaksi) as total
+            LOCK TABLE transaksi IN SHARE MODE;
+            DELETE FROM transaksi_harian;
+            INSERT INTO transaksi_harian (tanggal, total, jumlah)
+            SELECT tanggal_pembelian, SUM(COALESCE(total_transaksi, 0)), COUNT(*)
             FROM transaksi
+            WHERE tanggal_pembelian IS NOT NULL
             GROUP BY tanggal_pembelian
-            ORDER BY tanggal_pembelian DESC
         ''')
-        rows = cursor.fetchall()
-        if rows:
-            df = pd.DataFrame(rows, columns=['Tanggal', 'Total Transaksi'])
-            st.dataframe(df)
-            
-            # Opsi download CSV
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name='total_transaksi_per_hari.csv',
-                mime='text/csv',
-            )
-        else:
-            st.info("Belum ada transaksi.")
-    except Exception as e:
-        st.error(f"Error fetching laporan: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    conn.commit()
 
-def stok_bahan_baku_laporan():
+def hitung_ulang_rekap_harian():
     conn = get_connection()
     if conn is None:
         return
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute('''
-            SELECT nama_bahan, stock, satuan
-            FROM bahan_baku
-            ORDER BY nama_bahan ASC
-        ''')
-        rows = cursor.fetchall()
-        if rows:
-            df = pd.DataFrame(rows, columns=['Nama Bahan', 'Stok', 'Satuan'])
-            st.dataframe(df)
-            
-            # Opsi download CSV
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name='stok_bahan_baku.csv',
-                mime='text/csv',
-            )
-        else:
-            st.info("Belum ada data bahan baku.")
+        jumlah_hari = bangun_ulang_rekap_harian(conn)
+        st.success(f"Rekap harian dihitung ulang ({jumlah_hari} baris outlet per hari).")
     except Exception as e:
-        st.error(f"Error fetching laporan: {e}")
+        conn.rollback()
+        st.error(f"Error rebuilding rekap harian: {e}")
     finally:
-        cursor.close()
-        conn.close()
+        release_connection(conn)
+
+# -------------------- RATING KARYAWAN --------------------
+# Agregat rating per karyawan yang dijaga trigger statement-level pada feedback,
+# sama seperti rekap harian. rating_karyawan (satu baris per karyawan) melayani
+# laporan tanpa rentang; rating_karyawan_harian melayani rentang tanggal,
+# rata-rata 30 hari terakhir dan grafik tren. Jendela 30 hari dihitung saat
+# dibaca dari rekap harian karena bergeser tiap hari tanpa ada feedback baru.
+HARI_RATING_TERAKHIR = 30
+
+DDL_RATING_KARYAWAN = '''
+CREATE TABLE IF NOT EXISTS rating_karyawan (
+    outlet_id text NOT NULL,
+    karyawan_id text NOT NULL,
+    jumlah bigint NOT NULL DEFAULT 0,
+    total bigint NOT NULL DEFAULT 0,
+    rating_1 bigint NOT NULL DEFAULT 0,
+    rating_2 bigint NOT NULL DEFAULT 0,
+    rating_3 bigint NOT NULL DEFAULT 0,
+    rating_4 bigint NOT NULL DEFAULT 0,
+    rating_5 bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (outlet_id, karyawan_id)
+);
+CREATE TABLE IF NOT EXISTS rating_karyawan_harian (
+    outlet_id text NOT NULL,
+    karyawan_id text NOT NULL,
+    tanggal date NOT NULL,
+    jumlah bigint NOT NULL DEFAULT 0,
+    total bigint NOT NULL DEFAULT 0,
+    rating_1 bigint NOT NULL DEFAULT 0,
+    rating_2 bigint NOT NULL DEFAULT 0,
+    rating_3 bigint NOT NULL DEFAULT 0,
+    rating_4 bigint NOT NULL DEFAULT 0,
+    rating_5 bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (outlet_id, karyawan_id, tanggal)
+);
+-- Rata-rata 30 hari terakhir semua karyawan satu outlet
+CREATE INDEX IF NOT EXISTS rating_karyawan_harian_tanggal_idx
+    ON rating_karyawan_harian (outlet_id, tanggal) INCLUDE (karyawan_id, jumlah, total);
+
+CREATE OR REPLACE FUNCTION rekap_rating_karyawan() RETURNS trigger AS $$
+DECLARE
+    -- %1$s: tanda (-1 untuk baris lama, 1 untuk baris baru), %2$I: transition table
+    terapkan CONSTANT text := $q$
+        WITH selisih AS (
+            SELECT outlet_id, karyawan_id, tanggal,
+                   %1$s * COUNT(*) AS jumlah, %1$s * SUM(rating) AS total,
+                   %1$s * COUNT(*) FILTER (WHERE rating = 1) AS rating_1,
+                   %1$s * COUNT(*) FILTER (WHERE rating = 2) AS rating_2,
+                   %1$s * COUNT(*) FILTER (WHERE rating = 3) AS rating_3,
+                   %1$s * COUNT(*) FILTER (WHERE rating = 4) AS rating_4,
+                   %1$s * COUNT(*) FILTER (WHERE rating = 5) AS rating_5
+            FROM %2$I
+            WHERE karyawan_id IS NOT NULL
+            GROUP BY outlet_id, karyawan_id, tanggal
+        ), harian AS (
+            INSERT INTO rating_karyawan_harian AS r
+            SELECT * FROM selisih
+            ON CONFLICT (outlet_id, karyawan_id, tanggal) DO UPDATE
+            SET jumlah = r.jumlah + EXCLUDED.jumlah, total = r.total + EXCLUDED.total,
+                rating_1 = r.rating_1 + EXCLUDED.rating_1, rating_2 = r.rating_2 + EXCLUDED.rating_2,
+                rating_3 = r.rating_3 + EXCLUDED.rating_3, rating_4 = r.rating_4 + EXCLUDED.rating_4,
+                rating_5 = r.rating_5 + EXCLUDED.rating_5
+        )
+        INSERT INTO rating_karyawan AS r
+        SELECT outlet_id, karyawan_id, SUM(jumlah), SUM(total),
+               SUM(rating_1), SUM(rating_2), SUM(rating_3), SUM(rating_4), SUM(rating_5)
+        FROM selisih
+        GROUP BY outlet_id, karyawan_id
+        ON CONFLICT (outlet_id, karyawan_id) DO UPDATE
+        SET jumlah = r.jumlah + EXCLUDED.jumlah, total = r.total + EXCLUDED.total,
+            rating_1 = r.rating_1 + EXCLUDED.rating_1, rating_2 = r.rating_2 + EXCLUDED.rating_2,
+            rating_3 = r.rating_3 + EXCLUDED.rating_3, rating_4 = r.rating_4 + EXCLUDED.rating_4,
+            rating_5 = r.rating_5 + EXCLUDED.rating_5
+    $q$;
+BEGIN
+    -- Transition table juga terlihat oleh query dinamis (EXECUTE)
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        EXECUTE format(terapkan, -1, 'lama');
+        DELETE FROM rating_karyawan_harian
+        WHERE jumlah <= 0 AND (outlet_id, karyawan_id, tanggal) IN (SELECT outlet_id, karyawan_id, tanggal FROM lama);
+        DELETE FROM rating_karyawan
+        WHERE jumlah <= 0 AND (outlet_id, karyawan_id) IN (SELECT outlet_id, karyawan_id FROM lama);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        EXECUTE format(terapkan, 1, 'baru');
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_rating_karyawan_insert ON feedback;
+DROP TRIGGER IF EXISTS trg_rating_karyawan_update ON feedback;
+DROP TRIGGER IF EXISTS trg_rating_karyawan_delete ON feedback;
+CREATE TRIGGER trg_rating_karyawan_insert AFTER INSERT ON feedback
+    REFERENCING NEW TABLE AS baru
+    FOR EACH STATEMENT EXECUTE FUNCTION rekap_rating_karyawan();
+CREATE TRIGGER trg_rating_karyawan_update AFTER UPDATE ON feedback
+    REFERENCING OLD TABLE AS lama NEW TABLE AS baru
+    FOR EACH STATEMENT EXECUTE FUNCTION rekap_rating_karyawan();
+CREATE TRIGGER trg_rating_karyawan_delete AFTER DELETE ON feedback
+    REFERENCING OLD TABLE AS lama
+    FOR EACH STATEMENT EXECUTE FUNCTION rekap_rating_karyawan();
+'''
+
+def bangun_ulang_rating_karyawan(conn):
+    # Kunci SHARE menahan tulis ke feedback selama hitung ulang
+    with conn.cursor() as cursor:
+        cursor.execute('''
+            LOCK TABLE feedback IN SHARE MODE;
+            DELETE FROM rating_karyawan_harian;
+            INSERT INTO rating_karyawan_harian
+            SELECT outlet_id, karyawan_id, tanggal, COUNT(*), SUM(rating),
+                   COUNT(*) FILTER (WHERE rating = 1), COUNT(*) FILTER (WHERE rating = 2),
+                   COUNT(*) FILTER (WHERE rating = 3), COUNT(*) FILTER (WHERE rating = 4),
+                   COUNT(*) FILTER (WHERE rating = 5)
+            FROM feedback
+            WHERE karyawan_id IS NOT NULL
+            GROUP BY outlet_id, karyawan_id, tanggal;
+            DELETE FROM rating_karyawan;
+            INSERT INTO rating_karyawan
+            SELECT outlet_id, karyawan_id, SUM(jumlah), SUM(total),
+                   SUM(rating_1), SUM(rating_2), SUM(rating_3), SUM(rating_4), SUM(rating_5)
+            FROM rating_karyawan_harian
+            GROUP BY outlet_id, karyawan_id
+        ''')
+        jumlah_karyawan = cursor.rowcount
+    conn.commit()
+    naikkan_versi('feedback')
+    return jumlah_karyawan
 
-def feedback_per_karyawan():
+def pasang_rating_karyawan(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(DDL_RATING_KARYAWAN)
+    conn.commit()
+    return bangun_ulang_rating_karyawan(conn)
+
+def hitung_ulang_rating_karyawan():
     conn = get_connection()
     if conn is None:
         return
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute('''
-            SELECT k.employee_name, AVG(f.rating) as rata_rata_rating
+        jumlah_karyawan = bangun_ulang_rating_karyawan(conn)
+        st.success(f"Rating karyawan dihitung ulang ({jumlah_karyawan} karyawan).")
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Error rebuilding rating karyawan: {e}")
+    finally:
+        release_connection(conn)
+
+# -------------------- PARTISI BULANAN --------------------
+# transaksi dan absensi dipartisi RANGE per bulan pada kolom 'tanggal'-nya, jadi
+# query berfilter tanggal hanya membaca partisi bulan yang relevan. Partisi
+# DEFAULT menampung tanggal di luar partisi yang ada; saat partisi bulan baru
+# dibuat, baris bulan itu dipindah dari DEFAULT. Primary key tabel berpartisi
+# wajib memuat kolom partisi sehingga menjadi (ID, tanggal); keunikan ID sendiri
+# dijaga trigger cek_id_unik_partisi.
+# Butuh PostgreSQL 15 atau lebih baru: versi lama menjalankan UPDATE yang
+# memindah baris ke partisi lain sebagai DELETE + INSERT bagi foreign key, jadi
+# mengganti bulan tanggal_pembelian memicu ON DELETE CASCADE detail_transaksi
+# dan menghapus baris pesanannya, bukan ON UPDATE CASCADE.
+TABEL_PARTISI = ['transaksi', 'absensi']
+VERSI_POSTGRES_PARTISI = 150000
+BULAN_DEPAN_PARTISI = 3
+
+DDL_CEK_ID_UNIK = '''
+CREATE OR REPLACE FUNCTION cek_id_unik_partisi() RETURNS trigger AS $$
+DECLARE
+    baris jsonb := to_jsonb(NEW);
+    ada boolean;
+BEGIN
+    -- TG_ARGV: tabel induk, kolom ID, kolom tanggal. Kunci advisory per ID
+    -- mengantrekan insert bersamaan dengan ID sama tapi tanggal berbeda.
+    PERFORM pg_advisory_xact_lock(hashtext(TG_ARGV[0] || ':' || (baris ->> TG_ARGV[1])));
+    EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE %I = $1 AND %I <> $2)', TG_ARGV[0], TG_ARGV[1], TG_ARGV[2])
+        INTO ada USING baris ->> TG_ARGV[1], (baris ->> TG_ARGV[2])::date;
+    IF ada THEN
+        RAISE EXCEPTION 'duplicate key value violates unique constraint "%_%"', TG_ARGV[0], TG_ARGV[1]
+            USING ERRCODE = 'unique_violation',
+                  DETAIL = format('Key (%s)=(%s) already exists.', TG_ARGV[1], baris ->> TG_ARGV[1]);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+'''
+
+def _bulan_berikut(bulan):
+    return date(bulan.year + bulan.month // 12, bulan.month % 12 + 1, 1)
+
+def tambah_bulan(tanggal, jumlah):
+    bulan = tanggal.replace(day=1)
+    for _ in range(jumlah):
+        bulan = _bulan_berikut(bulan)
+    return bulan
+
+def tabel_berpartisi(cursor, tabel):
+    cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)", (tabel,))
+    baris = cursor.fetchone()
+    return bool(baris and baris[0])
+
+def rentang_partisi(cursor, tabel):
+    # [dari, sampai) tiap partisi, None untuk MINVALUE/MAXVALUE. None bila ada
+    # partisi DEFAULT, karena semua tanggal tertampung.
+    cursor.execute('''
+        SELECT pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+    ''', (tabel,))
+    rentang = []
+    for (batas,) in cursor.fetchall():
+        if batas == 'DEFAULT':
+            return None
+        rentang.append(tuple(
+            None if b in ('MINVALUE', 'MAXVALUE') else b.strip("'")
+            for b in re.match(r"FOR VALUES FROM \((.+)\) TO \((.+)\)", batas).groups()
+        ))
+    return rentang
+
+def buat_partisi_bulanan(conn, tabel, dari, sampai):
+    # Buat partisi tiap bulan dari bulan `dari` sampai bulan `sampai` yang belum
+    # ada. Tidak commit; pemanggil yang menutup transaksi.
+    q = {
+        'tabel': sql.Identifier(tabel),
+        'default': sql.Identifier(f"{tabel}_default"),
+        'kolom': sql.Identifier(TABEL[tabel]['tanggal']),
+    }
+    dibuat = []
+    bulan = dari.replace(day=1)
+    with conn.cursor() as cursor:
+        while bulan <= sampai:
+            akhir = _bulan_berikut(bulan)
+            nama = f"{tabel}_p{bulan:%Y_%m}"
+            cursor.execute('SELECT to_regclass(%s) IS NULL', (nama,))
+            if cursor.fetchone()[0]:
+                # Dibuat terpisah lalu di-ATTACH supaya baris bulan ini yang sudah
+                # masuk partisi DEFAULT bisa dipindah lebih dulu
+                cursor.execute(sql.SQL('''
+                    CREATE TABLE {partisi} (LIKE {tabel} INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+                    WITH pindah AS (
+                        DELETE FROM {default} WHERE {kolom} >= %(awal)s AND {kolom} < %(akhir)s RETURNING *
+                    )
+                    INSERT INTO {partisi} SELECT * FROM pindah;
+                    ALTER TABLE {tabel} ATTACH PARTITION {partisi} FOR VALUES FROM (%(awal)s) TO (%(akhir)s);
+                ''').format(partisi=sql.Identifier(nama), **q), {'awal': bulan, 'akhir': akhir})
+                dibuat.append(nama)
+            bulan = akhir
+    return dibuat
+
+def partisi_tabel(conn, tabel):
+    # Ganti tabel biasa dengan tabel berpartisi berisi data yang sama. Berjalan
+    # dalam transaksi pemanggil; tabel terkunci penuh sampai commit.
+    meta = TABEL[tabel]
+    q = {
+        'tabel': sql.Identifier(tabel),
+        'lama': sql.Identifier(f"{tabel}_lama"),
+        'default': sql.Identifier(f"{tabel}_default"),
+        'kunci': sql.Identifier(meta['kunci']),
+        'kolom': sql.Identifier(meta['tanggal']),
+    }
+    with conn.cursor() as cursor:
+        if tabel_berpartisi(cursor, tabel):
+            return False
+        cursor.execute(sql.SQL('''
+            LOCK TABLE {tabel} IN ACCESS EXCLUSIVE MODE;
+            ALTER TABLE {tabel} RENAME TO {lama};
+            CREATE TABLE {tabel} (LIKE {lama} INCLUDING DEFAULTS) PARTITION BY RANGE ({kolom});
+            CREATE TABLE {default} PARTITION OF {tabel} DEFAULT;
+        ''').format(**q))
+        cursor.execute(sql.SQL('SELECT MIN({kolom}), MAX({kolom}) FROM {lama}').format(**q))
+        awal, akhir = cursor.fetchone()
+        batas = tambah_bulan(date.today(), BULAN_DEPAN_PARTISI)
+        buat_partisi_bulanan(conn, tabel, min(awal or date.today(), date.today()), max(akhir or batas, batas))
+
+        # Indeks, constraint dan trigger lama ikut terhapus bersama tabel lama,
+        # lalu dibuat ulang di tabel baru (tanpa CONCURRENTLY: tabel masih terkunci)
+        cursor.execute(sql.SQL('''
+            INSERT INTO {tabel} SELECT * FROM {lama};
+            DROP TABLE {lama};
+            ALTER TABLE {tabel} ADD PRIMARY KEY ({kunci}, {kolom});
+        ''').format(**q))
+        # Database yang dipartisi sebelum migrasi outlet belum punya kolom outlet_id
+        cursor.execute(sql.SQL('''
+            SELECT EXISTS (SELECT 1 FROM pg_attribute WHERE attrelid = {tabel}::regclass AND attname = 'outlet_id')
+        ''').format(tabel=sql.Literal(tabel)))
+        ada_outlet = cursor.fetchone()[0]
+        fk = dict(meta['fk'], **({'outlet_id': ('outlet', 'outlet_id')} if ada_outlet else {}))
+        for kolom_fk, (tabel_ref, kolom_ref) in fk.items():
+            cursor.execute(sql.SQL('ALTER TABLE {tabel} ADD FOREIGN KEY ({fk}) REFERENCES {ref} ({kolom_ref})').format(
+                fk=sql.Identifier(kolom_fk), ref=sql.Identifier(tabel_ref), kolom_ref=sql.Identifier(kolom_ref), **q
+            ))
+        cursor.execute(DDL_CEK_ID_UNIK)
+        cursor.execute(sql.SQL('''
+            CREATE TRIGGER {trigger} BEFORE INSERT ON {tabel}
+            FOR EACH ROW EXECUTE FUNCTION cek_id_unik_partisi({arg_tabel}, {arg_kunci}, {arg_kolom})
+        ''').format(
+            trigger=sql.Identifier(f"trg_{tabel}_id_unik"),
+            arg_tabel=sql.Literal(tabel), arg_kunci=sql.Literal(meta['kunci']), arg_kolom=sql.Literal(meta['tanggal']),
+            **q
+        ))
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+        trigram = cursor.fetchone()[0]
+        for indeks in INDEKS_LAPORAN + (INDEKS_OUTLET if ada_outlet else []) + indeks_pencarian(trigram):
+            if indeks[0] == tabel:
+                cursor.execute(perintah_indeks(*indeks, serentak=False))
+        cursor.execute("SELECT to_regclass('transaksi_harian') IS NOT NULL")
+        if tabel == 'transaksi' and cursor.fetchone()[0]:
+            cursor.execute(DDL_TRIGGER_REKAP_HARIAN)
+        cursor.execute(sql.SQL('ANALYZE {tabel}').format(**q))
+    return True
+
+def partisi_bulanan(conn):
+    for tabel in TABEL_PARTISI:
+        partisi_tabel(conn, tabel)
+
+# -------------------- MIGRASI SKEMA --------------------
+# Setiap langkah idempoten (IF NOT EXISTS / OR REPLACE), jadi aman dijalankan
+# di database lama yang tabelnya sudah dibuat manual. Langkah berupa string SQL
+# dijalankan dalam satu transaksi bersama pencatatan versinya; langkah berupa
+# fungsi menerima koneksi dan mengatur transaksinya sendiri (mis. CREATE INDEX
+# CONCURRENTLY yang tidak boleh di dalam transaksi).
+DDL_SKEMA_DASAR = '''
+CREATE TABLE IF NOT EXISTS karyawan (
+    karyawan_id text PRIMARY KEY,
+    employee_name text NOT NULL,
+    position text NOT NULL,
+    fingerprint_id text
+);
+CREATE TABLE IF NOT EXISTS pelanggan (
+    pelanggan_id text PRIMARY KEY,
+    cus_name text NOT NULL,
+    contact_info text
+);
+CREATE TABLE IF NOT EXISTS supplier (
+    supplier_id text PRIMARY KEY,
+    supplier_name text NOT NULL,
+    address text
+);
+CREATE TABLE IF NOT EXISTS bahan_baku (
+    bahan_id text PRIMARY KEY,
+    nama_bahan text NOT NULL,
+    stock numeric NOT NULL DEFAULT 0,
+    satuan text,
+    harga_bahan numeric,
+    supplier_id text REFERENCES supplier (supplier_id)
+);
+CREATE TABLE IF NOT EXISTS menu (
+    menu_id text PRIMARY KEY,
+    nama_menu text NOT NULL,
+    harga numeric NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transaksi (
+    transaksi_id text PRIMARY KEY,
+    tanggal_pembelian date NOT NULL,
+    pelanggan_id text REFERENCES pelanggan (pelanggan_id),
+    karyawan_id text REFERENCES karyawan (karyawan_id),
+    total_transaksi numeric NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS feedback (
+    feedback_id text PRIMARY KEY,
+    pelanggan_id text REFERENCES pelanggan (pelanggan_id),
+    karyawan_id text REFERENCES karyawan (karyawan_id),
+    tanggal date NOT NULL,
+    rating integer NOT NULL,
+    komentar text
+);
+CREATE TABLE IF NOT EXISTS absensi (
+    absensi_id text PRIMARY KEY,
+    karyawan_id text REFERENCES karyawan (karyawan_id),
+    tanggal date NOT NULL,
+    status text NOT NULL
+);
+'''
+
+# Indeks untuk kolom yang difilter, di-JOIN, diurutkan dan dikelompokkan oleh
+# laporan serta paginasi keyset. INCLUDE membuat laporan cukup index-only scan.
+INDEKS_LAPORAN = [
+    ('transaksi', 'transaksi_tanggal_idx', '(tanggal_pembelian, transaksi_id)'),
+    ('feedback', 'feedback_karyawan_idx', '(karyawan_id) INCLUDE (rating)'),
+    ('feedback', 'feedback_tanggal_idx', '(tanggal, feedback_id)'),
+    ('absensi', 'absensi_karyawan_tanggal_idx', '(karyawan_id, tanggal) INCLUDE (status)'),
+    ('absensi', 'absensi_tanggal_idx', '(tanggal, absensi_id)'),
+    ('bahan_baku', 'bahan_baku_supplier_idx', '(supplier_id)'),
+    ('bahan_baku', 'bahan_baku_nama_idx', '(nama_bahan) INCLUDE (stock, satuan)'),
+]
+# Query tabel per outlet selalu menyaring outlet_id dulu, jadi indeksnya
+# diawali outlet_id; outlet kecil tidak ikut membaca indeks outlet yang ramai.
+INDEKS_OUTLET = [
+    ('karyawan', 'karyawan_outlet_idx', '(outlet_id, karyawan_id)'),
+    ('transaksi', 'transaksi_outlet_tanggal_idx', '(outlet_id, tanggal_pembelian, transaksi_id)'),
+    ('feedback', 'feedback_outlet_tanggal_idx', '(outlet_id, tanggal, feedback_id) INCLUDE (karyawan_id, rating)'),
+    ('absensi', 'absensi_outlet_tanggal_idx', '(outlet_id, tanggal, absensi_id) INCLUDE (karyawan_id, status)'),
+    ('bahan_baku', 'bahan_baku_outlet_nama_idx', '(outlet_id, nama_bahan) INCLUDE (stock, satuan, stok_minimum)'),
+]
+
+def jalankan_tanpa_transaksi(conn, daftar_perintah):
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            for perintah in daftar_perintah:
+                cursor.execute(perintah)
+    finally:
+        conn.autocommit = False
+
+def perintah_indeks(tabel, nama, definisi, serentak=True):
+    return sql.SQL('CREATE INDEX {serentak} IF NOT EXISTS {nama} ON {tabel} {definisi}').format(
+        serentak=sql.SQL('CONCURRENTLY' if serentak else ''),
+        nama=sql.Identifier(nama),
+        tabel=sql.Identifier(tabel),
+        definisi=sql.SQL(definisi) if isinstance(definisi, str) else definisi
+    )
+
+def buat_indeks(conn, daftar_indeks):
+    # CONCURRENTLY tidak boleh di dalam transaksi dan tidak mengunci tulis selama
+    # indeks dibangun. Tabel berpartisi belum mendukungnya, jadi di sana indeks
+    # dibuat biasa (Postgres membangunnya per partisi).
+    with conn.cursor() as cursor:
+        berpartisi = {tabel for tabel, _, _ in daftar_indeks if tabel_berpartisi(cursor, tabel)}
+    conn.commit()
+    jalankan_tanpa_transaksi(conn, [
+        perintah_indeks(tabel, nama, definisi, serentak=tabel not in berpartisi)
+        for tabel, nama, definisi in daftar_indeks
+    ])
+
+MIGRASI = [
+    (1, "Skema dasar delapan tabel", DDL_SKEMA_DASAR),
+    (2, "Indeks laporan dan paginasi", lambda conn: buat_indeks(conn, INDEKS_LAPORAN)),
+    (3, "Rekap transaksi harian", pasang_rekap_harian_awal),
+    (4, "Indeks pencarian pemilih baris", pasang_indeks_pencarian),
+    (5, "Partisi bulanan transaksi dan absensi", partisi_bulanan),
+    (6, "Detail transaksi per menu", DDL_DETAIL_TRANSAKSI),
+    (7, "Resep menu dan potong stok", DDL_RESEP),
+    (8, "Stok minimum dan notifikasi stok menipis", DDL_NOTIFIKASI_STOK_AWAL),
+    (9, "Outlet pada data karyawan, transaksi, bahan baku, absensi dan feedback", pasang_outlet),
+    (10, "Indeks per outlet", lambda conn: buat_indeks(conn, INDEKS_OUTLET)),
+    (11, "Penanda entri jurnal offline yang sudah diterapkan", DDL_JURNAL_DITERAPKAN),
+    (12, "Agregat rating per karyawan", pasang_rating_karyawan),
+]
+VERSI_SKEMA_TERBARU = MIGRASI[-1][0]
+# Kunci advisory agar dua proses tidak menjalankan migrasi bersamaan
+KUNCI_MIGRASI = 7_260_001
+
+def versi_skema(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+        if not cursor.fetchone()[0]:
+            versi = 0
+        else:
+            cursor.execute('SELECT COALESCE(MAX(versi), 0) FROM schema_version')
+            versi = cursor.fetchone()[0]
+    conn.commit()
+    return versi
+
+def jalankan_migrasi(conn):
+    dijalankan = []
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_lock(%s)', (KUNCI_MIGRASI,))
+        try:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    versi integer PRIMARY KEY,
+                    keterangan text NOT NULL,
+                    dijalankan_pada timestamptz NOT NULL DEFAULT now()
+                )
+            ''')
+            conn.commit()
+            sekarang = versi_skema(conn)
+            for versi, keterangan, langkah in MIGRASI:
+                if versi <= sekarang:
+                    continue
+                if langkah is partisi_bulanan and conn.server_version < VERSI_POSTGRES_PARTISI:
+                    raise RuntimeError(
+                        f"Migrasi {versi} ({keterangan}) butuh PostgreSQL "
+                        f"{VERSI_POSTGRES_PARTISI // 10000} atau lebih baru; server ini versi {conn.server_version // 10000}."
+                    )
+                if callable(langkah):
+                    langkah(conn)
+                else:
+                    cursor.execute(langkah)
+                cursor.execute('INSERT INTO schema_version (versi, keterangan) VALUES (%s, %s)', (versi, keterangan))
+                conn.commit()
+                dijalankan.append((versi, keterangan))
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', (KUNCI_MIGRASI,))
+            conn.commit()
+    return dijalankan
+
+@st.cache_data(ttl=60, show_spinner=False)
+def cek_skema(database=DATABASE_UTAMA):
+    conn = get_pool(database).pinjam()
+    try:
+        return versi_skema(conn)
+    finally:
+        release_connection(conn)
+
+def periksa_skema_saat_mulai():
+    # Semua database outlet diperiksa, bukan hanya milik outlet aktif
+    for database in get_konfigurasi().database:
+        try:
+            versi = cek_skema(database)
+        except Exception:
+            # Gagal koneksi sudah dilaporkan oleh halaman yang memakai database
+            continue
+        if versi >= VERSI_SKEMA_TERBARU:
+            continue
+        if get_konfigurasi().auto_migrate:
+            try:
+                conn = get_pool(database).pinjam()
+            except Exception as e:
+                st.error(f"Error connecting to database: {e}")
+                continue
+            try:
+                dijalankan = jalankan_migrasi(conn)
+                cek_skema.clear()
+                if dijalankan:
+                    st.toast(f"Migrasi skema [{database}] dijalankan sampai versi {dijalankan[-1][0]}.")
+            except Exception as e:
+                st.error(f"Error running migrations: {e}")
+            finally:
+                release_connection(conn)
+        else:
+            st.warning(f"Skema [{database}] versi {versi}, terbaru versi {VERSI_SKEMA_TERBARU}. "
+                       f"Jalankan `python kelola.py --database {database} migrasi`.")
+
+# -------------------- FUNGSI LAPORAN --------------------
+# Tiap laporan dipisah menjadi pengambil data (data_*: hanya query, tanpa st.*,
+# aman dijalankan di thread lain) dan tampilan generik tampilkan_laporan.
+# data_* mengembalikan (query, params, rows, catatan); query dan params dipakai lagi
+# untuk ekspor CSV. Laporan bertanggal menerima rentang (dari, sampai) inklusif;
+# tanpa rentang seluruh riwayat dihitung. Semua laporan untuk outlet aktif saja.
+SEMUA_TANGGAL = (date.min, date.max)
+
+def data_total_transaksi_per_hari(rentang=None):
+    params = (outlet_aktif(), *(rentang or SEMUA_TANGGAL))
+    query = sql.SQL('''
+        SELECT tanggal, total, jumlah, ROUND(total / NULLIF(jumlah, 0), 2)
+        FROM transaksi_harian
+        WHERE outlet_id = %s AND tanggal BETWEEN %s AND %s
+        ORDER BY tanggal DESC
+    ''')
+    try:
+        return query, params, baca_tercache('transaksi', query, params), None
+    except psycopg2.errors.UndefinedTable:
+        # Rekap belum dipasang: hitung langsung dari transaksi
+        query = sql.SQL('''
+            SELECT tanggal_pembelian, SUM(total_transaksi), COUNT(*), ROUND(AVG(total_transaksi), 2)
+            FROM transaksi
+            WHERE outlet_id = %s AND tanggal_pembelian BETWEEN %s AND %s
+            GROUP BY tanggal_pembelian
+            ORDER BY tanggal_pembelian DESC
+        ''')
+        catatan = "Tabel rekap belum dipasang, jalankan `python kelola.py rekap-harian`."
+        return query, params, baca_tercache('transaksi', query, params), catatan
+
+def data_stok_bahan_baku():
+    query = sql.SQL('''
+        SELECT nama_bahan, stock, satuan, stok_minimum
+        FROM bahan_baku
+        WHERE outlet_id = %s
+        ORDER BY nama_bahan ASC
+    ''')
+    params = (outlet_aktif(),)
+    return query, params, baca_tercache('bahan_baku', query, params), None
+
+def data_feedback_per_karyawan(rentang=None):
+    # Dibaca dari agregat rating: satu baris per karyawan tanpa rentang,
+    # satu baris per karyawan per hari dengan rentang
+    outlet = outlet_aktif()
+    if rentang:
+        sumber = sql.SQL('''(
+            SELECT karyawan_id, SUM(jumlah)::bigint AS jumlah, SUM(total)::bigint AS total,
+                   SUM(rating_1)::bigint AS rating_1, SUM(rating_2)::bigint AS rating_2,
+                   SUM(rating_3)::bigint AS rating_3, SUM(rating_4)::bigint AS rating_4,
+                   SUM(rating_5)::bigint AS rating_5
+            FROM rating_karyawan_harian
+            WHERE outlet_id = %s AND tanggal BETWEEN %s AND %s
+            GROUP BY karyawan_id
+        )''')
+        params = (outlet, *rentang, outlet)
+    else:
+        sumber = sql.SQL('(SELECT * FROM rating_karyawan WHERE outlet_id = %s)')
+        params = (outlet, outlet)
+    query = sql.SQL('''
+        SELECT k.employee_name, r.jumlah, ROUND(r.total::numeric / r.jumlah, 2) AS rata_rata_rating,
+               ROUND(b.total::numeric / b.jumlah, 2),
+               r.rating_1, r.rating_2, r.rating_3, r.rating_4, r.rating_5
+        FROM {sumber} r
+        JOIN karyawan k ON k.karyawan_id = r.karyawan_id
+        LEFT JOIN (
+            SELECT karyawan_id, SUM(jumlah) AS jumlah, SUM(total) AS total
+            FROM rating_karyawan_harian
+            WHERE outlet_id = %s AND tanggal > CURRENT_DATE - {hari}
+            GROUP BY karyawan_id
+        ) b ON b.karyawan_id = r.karyawan_id
+        ORDER BY rata_rata_rating DESC, k.employee_name
+    ''').format(sumber=sumber, hari=sql.Literal(HARI_RATING_TERAKHIR))
+    try:
+        return query, params, baca_tercache(('feedback', 'karyawan'), query, params), None
+    except psycopg2.errors.UndefinedTable:
+        # Agregat belum dipasang: hitung langsung dari feedback
+        params = (outlet, *(rentang or SEMUA_TANGGAL))
+        query = sql.SQL('''
+            SELECT k.employee_name, COUNT(*), ROUND(AVG(f.rating), 2) AS rata_rata_rating,
+                   ROUND(AVG(f.rating) FILTER (WHERE f.tanggal > CURRENT_DATE - {hari}), 2),
+                   COUNT(*) FILTER (WHERE f.rating = 1), COUNT(*) FILTER (WHERE f.rating = 2),
+                   COUNT(*) FILTER (WHERE f.rating = 3), COUNT(*) FILTER (WHERE f.rating = 4),
+                   COUNT(*) FILTER (WHERE f.rating = 5)
             FROM feedback f
             JOIN karyawan k ON f.karyawan_id = k.karyawan_id
-            GROUP BY k.employee_name
-            ORDER BY rata_rata_rating DESC
-        ''')
-        rows = cursor.fetchall()
-        if rows:
-            df = pd.DataFrame(rows, columns=['Nama Karyawan', 'Rata-rata Rating'])
-            st.dataframe(df)
-            
-            # Opsi download CSV
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name='feedback_per_karyawan.csv',
-                mime='text/csv',
-            )
-        else:
-            st.info("Belum ada feedback.")
+            WHERE f.outlet_id = %s AND f.tanggal BETWEEN %s AND %s
+            GROUP BY k.karyawan_id, k.employee_name
+            ORDER BY rata_rata_rating DESC, k.employee_name
+        ''').format(hari=sql.Literal(HARI_RATING_TERAKHIR))
+        catatan = "Tabel rating karyawan belum dipasang, jalankan `python kelola.py rating-karyawan`."
+        return query, params, baca_tercache(('feedback', 'karyawan'), query, params), catatan
+
+def data_tren_rating(karyawan_id, rentang=None):
+    # Rata-rata mingguan satu karyawan: hanya baris rekap harian karyawan itu
+    params = (outlet_aktif(), karyawan_id, *(rentang or SEMUA_TANGGAL))
+    query = sql.SQL('''
+        SELECT date_trunc('week', tanggal)::date, ROUND(SUM(total)::numeric / SUM(jumlah), 2)::float8, SUM(jumlah)
+        FROM rating_karyawan_harian
+        WHERE outlet_id = %s AND karyawan_id = %s AND tanggal BETWEEN %s AND %s
+        GROUP BY 1
+        ORDER BY 1
+    ''')
+    return baca_tercache('feedback', query, params)
+
+def data_absensi_per_karyawan(rentang=None):
+    params = (outlet_aktif(), *(rentang or SEMUA_TANGGAL))
+    query = sql.SQL('''
+        SELECT k.employee_name, COUNT(a.absensi_id) as total_absensi,
+               SUM(CASE WHEN a.status = 'Hadir' THEN 1 ELSE 0 END) as hadir,
+               SUM(CASE WHEN a.status = 'Tidak Hadir' THEN 1 ELSE 0 END) as tidak_hadir,
+               SUM(CASE WHEN a.status = 'Izin' THEN 1 ELSE 0 END) as izin,
+               SUM(CASE WHEN a.status = 'Cuti' THEN 1 ELSE 0 END) as cuti
+        FROM absensi a
+        JOIN karyawan k ON a.karyawan_id = k.karyawan_id
+        WHERE a.outlet_id = %s AND a.tanggal BETWEEN %s AND %s
+        GROUP BY k.employee_name
+        ORDER BY k.employee_name ASC
+    ''')
+    return query, params, baca_tercache(('absensi', 'karyawan'), query, params), None
+
+# Matriks absensi bulanan: karyawan x tanggal berisi kode status. Satu query
+# GROUP BY (karyawan, tanggal) lewat indeks (outlet_id, tanggal) lalu dibentuk
+# dengan pivot pandas; tidak ada query atau loop per karyawan. Bukan bagian
+# LAPORAN karena tampilannya grid berwarna, bukan tabel baris biasa.
+MATRIKS_ABSENSI = "Matriks Absensi Bulanan"
+# Urutan = prioritas bila satu hari punya lebih dari satu catatan
+KODE_ABSENSI = {'Hadir': 'H', 'Izin': 'I', 'Cuti': 'C', 'Tidak Hadir': 'A'}
+WARNA_ABSENSI = {'H': '#c8e6c9', 'I': '#fff59d', 'C': '#90caf9', 'A': '#ef9a9a'}
+NAMA_BULAN = ['Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni', 'Juli',
+              'Agustus', 'September', 'Oktober', 'November', 'Desember']
+BULAN_MATRIKS = 24
+
+def data_matriks_absensi(bulan):
+    # bulan: tanggal 1 bulan yang diminta; karyawan tanpa catatan tetap muncul
+    outlet = outlet_aktif()
+    params = (outlet, bulan, tambah_bulan(bulan, 1), outlet)
+    query = sql.SQL('''
+        SELECT k.karyawan_id, k.employee_name, a.tanggal, a.kode
+        FROM karyawan k
+        LEFT JOIN (
+            SELECT karyawan_id, tanggal, ({kode}::text[])[MIN(array_position({status}::text[], status))] AS kode
+            FROM absensi
+            WHERE outlet_id = %s AND tanggal >= %s AND tanggal < %s
+            GROUP BY karyawan_id, tanggal
+        ) a ON a.karyawan_id = k.karyawan_id
+        WHERE k.outlet_id = %s
+        ORDER BY k.employee_name, k.karyawan_id
+    ''').format(kode=sql.Literal(list(KODE_ABSENSI.values())), status=sql.Literal(list(KODE_ABSENSI)))
+    return query, params, baca_tercache(('absensi', 'karyawan'), query, params)
+
+def bentuk_matriks_absensi(rows, bulan):
+    # Mengembalikan (matriks, kolom hari): Nama, satu kolom per tanggal, lalu jumlah per status
+    import pandas as pd
+    hari = pd.date_range(bulan, tambah_bulan(bulan, 1), inclusive='left').date
+    df = pd.DataFrame(rows, columns=['ID', 'Nama Karyawan', 'tanggal', 'kode'])
+    karyawan = df[['ID', 'Nama Karyawan']].drop_duplicates('ID').set_index('ID')
+    kode = (df.dropna(subset=['tanggal'])
+              .pivot(index='ID', columns='tanggal', values='kode')
+              .reindex(index=karyawan.index, columns=hari)
+              .fillna(''))
+    kode.columns = kolom_hari = [str(h.day) for h in hari]
+    # Hitung per status langsung di array numpy grid, bukan per kolom DataFrame
+    grid = kode.to_numpy()
+    jumlah = pd.DataFrame({status: (grid == k).sum(axis=1) for status, k in KODE_ABSENSI.items()}, index=kode.index)
+    return pd.concat([karyawan, kode, jumlah], axis=1), kolom_hari
+
+def gaya_absensi(df):
+    # Sekali replace untuk seluruh grid, bukan fungsi per sel
+    return df.replace({k: f'background-color: {w}; color: #000' for k, w in WARNA_ABSENSI.items()})
+
+LAPORAN = {
+    "Total Transaksi per Hari": {
+        'data': data_total_transaksi_per_hari,
+        'kolom': ['Tanggal', 'Total Transaksi', 'Jumlah Transaksi', 'Rata-rata'],
+        'file': 'total_transaksi_per_hari',
+        'kosong': "Belum ada transaksi.",
+        'rentang': True,
+    },
+    "Stok Bahan Baku": {
+        'data': data_stok_bahan_baku,
+        'kolom': ['Nama Bahan', 'Stok', 'Satuan', 'Stok Minimum'],
+        'file': 'stok_bahan_baku',
+        'kosong': "Belum ada data bahan baku.",
+        'rentang': False,
+    },
+    "Feedback per Karyawan": {
+        'data': data_feedback_per_karyawan,
+        'kolom': ['Nama Karyawan', 'Jumlah Feedback', 'Rata-rata Rating', f'Rata-rata {HARI_RATING_TERAKHIR} Hari',
+                  'Rating 1', 'Rating 2', 'Rating 3', 'Rating 4', 'Rating 5'],
+        'file': 'feedback_per_karyawan',
+        'kosong': "Belum ada feedback.",
+        'rentang': True,
+    },
+    "Absensi per Karyawan": {
+        'data': data_absensi_per_karyawan,
+        'kolom': ['Nama Karyawan', 'Total Absensi', 'Hadir', 'Tidak Hadir', 'Izin', 'Cuti'],
+        'file': 'absensi_per_karyawan',
+        'kosong': "Belum ada data absensi.",
+        'rentang': True,
+    },
+}
+
+def ambil_laporan(nama, rentang=None):
+    laporan = LAPORAN[nama]
+    if laporan['rentang']:
+        return laporan['data'](rentang)
+    return laporan['data']()
+
+def tampilkan_laporan(nama, hasil):
+    laporan = LAPORAN[nama]
+    query, params, rows, catatan = hasil
+    if catatan:
+        st.caption(catatan)
+    if rows is None:
+        return
+    if rows:
+        df = tampilkan_dataframe(rows, laporan['kolom'])
+
+        # Opsi download CSV/Parquet/Arrow
+        tombol_ekspor(query_berlabel(query, df.columns), laporan['file'], params)
+    else:
+        st.info(laporan['kosong'])
+
+def laporan_tunggal(nama, rentang=None):
+    try:
+        tampilkan_laporan(nama, ambil_laporan(nama, rentang))
     except Exception as e:
         st.error(f"Error fetching laporan: {e}")
-    finally:
-        cursor.close()
-        conn.close()
 
-def absensi_per_karyawan():
-    conn = get_connection()
-    if conn is None:
+def total_transaksi_per_hari(rentang=None):
+    laporan_tunggal("Total Transaksi per Hari", rentang)
+
+def stok_bahan_baku_laporan():
+    laporan_tunggal("Stok Bahan Baku")
+
+def feedback_per_karyawan(rentang=None):
+    laporan_tunggal("Feedback per Karyawan", rentang)
+
+# Spec Vega-Lite ditulis langsung: st.line_chart membangun chart Altair di
+# setiap rerun (dan memuat altair saat pertama kali), jauh lebih lambat
+SPEC_TREN_RATING = {
+    'mark': {'type': 'line', 'point': True},
+    'encoding': {
+        'x': {'field': 'Minggu', 'type': 'temporal'},
+        'y': {'field': 'Rata-rata Rating', 'type': 'quantitative', 'scale': {'domain': [1, 5]}},
+        'tooltip': [
+            {'field': 'Minggu', 'type': 'temporal'},
+            {'field': 'Rata-rata Rating', 'type': 'quantitative'},
+            {'field': 'Jumlah Feedback', 'type': 'quantitative'},
+        ],
+    },
+}
+
+def tren_rating_karyawan(rentang=None):
+    import pandas as pd
+    st.subheader("Tren Rating Karyawan")
+    karyawan_id = pilih_baris('karyawan', "Karyawan", "Belum ada data karyawan.")
+    if karyawan_id is None:
         return
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute('''
-            SELECT k.employee_name, COUNT(a.absensi_id) as total_absensi,
-                   SUM(CASE WHEN a.status = 'Hadir' THEN 1 ELSE 0 END) as hadir,
-                   SUM(CASE WHEN a.status = 'Tidak Hadir' THEN 1 ELSE 0 END) as tidak_hadir,
-                   SUM(CASE WHEN a.status = 'Izin' THEN 1 ELSE 0 END) as izin,
-                   SUM(CASE WHEN a.status = 'Cuti' THEN 1 ELSE 0 END) as cuti
-            FROM absensi a
-            JOIN karyawan k ON a.karyawan_id = k.karyawan_id
-            GROUP BY k.employee_name
-            ORDER BY k.employee_name ASC
-        ''')
-        rows = cursor.fetchall()
-        if rows:
-            df = pd.DataFrame(rows, columns=['Nama Karyawan', 'Total Absensi', 'Hadir', 'Tidak Hadir', 'Izin', 'Cuti'])
-            st.dataframe(df)
-            
-            # Opsi download CSV
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name='absensi_per_karyawan.csv',
-                mime='text/csv',
-            )
-        else:
-            st.info("Belum ada data absensi.")
+        rows = data_tren_rating(karyawan_id, rentang)
+    except psycopg2.errors.UndefinedTable:
+        st.caption("Tabel rating karyawan belum dipasang, jalankan `python kelola.py rating-karyawan`.")
+        return
     except Exception as e:
-        st.error(f"Error fetching laporan absensi: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+        st.error(f"Error fetching laporan: {e}")
+        return
+    if rows is None:
+        return
+    if not rows:
+        st.info("Belum ada feedback untuk karyawan ini.")
+        return
+    df = pd.DataFrame(rows, columns=['Minggu', 'Rata-rata Rating', 'Jumlah Feedback'])
+    st.vega_lite_chart(df, SPEC_TREN_RATING)
+    st.caption(f"Rata-rata per minggu dari {int(df['Jumlah Feedback'].sum())} feedback.")
+
+def absensi_per_karyawan(rentang=None):
+    laporan_tunggal("Absensi per Karyawan", rentang)
+
+def matriks_absensi_bulanan():
+    awal = date.today().year * 12 + date.today().month - 1
+    pilihan = [date(m // 12, m % 12 + 1, 1) for m in range(awal, awal - BULAN_MATRIKS, -1)]
+    bulan = st.selectbox("Bulan", pilihan, format_func=lambda b: f"{NAMA_BULAN[b.month - 1]} {b.year}",
+                         key="bulan_matriks_absensi")
+    try:
+        _, _, rows = data_matriks_absensi(bulan)
+    except Exception as e:
+        st.error(f"Error fetching laporan: {e}")
+        return
+    if rows is None:
+        return
+    if not rows:
+        st.info("Belum ada data karyawan.")
+        return
+    with ukur('dataframe'):
+        matriks, kolom_hari = bentuk_matriks_absensi(rows, bulan)
+    with ukur('render'):
+        st.dataframe(matriks.style.apply(gaya_absensi, axis=None, subset=kolom_hari))
+    st.caption("H = Hadir, I = Izin, C = Cuti, A = Tidak Hadir; sel kosong berarti tidak ada catatan.")
+    st.download_button("Download CSV", matriks.to_csv().encode('utf-8'), file_name=f"absensi_{bulan:%Y_%m}.csv",
+                       mime="text/csv", key="unduh_matriks_absensi")
+
+# -------------------- DASBOR LAPORAN --------------------
+# Semua laporan dijalankan paralel, masing-masing dengan koneksi pool sendiri,
+# jadi waktu tunggu = laporan paling lambat, bukan jumlah semuanya. Worker hanya
+# menjalankan data_*; semua st.* tetap di thread skrip, panel diisi begitu
+# hasilnya datang.
+def _ambil_berwaktu(nama, rentang, outlet):
+    # Worker tidak punya session_state; outlet sesi diteruskan lewat OUTLET_AKTIF
+    OUTLET_AKTIF.set(outlet)
+    mulai = time.perf_counter()
+    hasil = ambil_laporan(nama, rentang)
+    if hasil[2] is None:
+        raise RuntimeError("Tidak ada koneksi database.")
+    return hasil, time.perf_counter() - mulai
+
+def dasbor_laporan(rentang=None):
+    # Pool dan cache dibuat di thread skrip; worker cukup memakai objek yang sama
+    get_pool(database_aktif())
+    get_pool_replika()
+    get_status_replika()
+    get_cache_baca()
+
+    kolom = st.columns(2)
+    panel = {}
+    for i, nama in enumerate(LAPORAN):
+        with kolom[i % 2]:
+            st.subheader(nama)
+            panel[nama] = st.empty()
+            panel[nama].caption("Memuat...")
+
+    mulai = time.perf_counter()
+    durasi_total = 0.0
+    with ThreadPoolExecutor(max_workers=len(LAPORAN)) as eksekutor:
+        tugas = {eksekutor.submit(_ambil_berwaktu, nama, rentang, outlet_aktif()): nama for nama in LAPORAN}
+        for selesai in as_completed(tugas):
+            nama = tugas[selesai]
+            with panel[nama].container():
+                try:
+                    hasil, durasi = selesai.result()
+                except Exception as e:
+                    st.error(f"Error fetching laporan: {e}")
+                    continue
+                durasi_total += durasi
+                tampilkan_laporan(nama, hasil)
+                st.caption(f"Selesai dalam {durasi * 1000:.0f} ms")
+    st.caption(f"Dasbor dimuat dalam {(time.perf_counter() - mulai) * 1000:.0f} ms "
+               f"(jumlah waktu semua laporan {durasi_total * 1000:.0f} ms).")
+
+# -------------------- DIAGNOSTIK --------------------
+# Halaman tersembunyi: muncul di sidebar bila URL memuat ?diagnostik=1 atau
+# secrets [diagnostik] tampil = true.
+BATAS_HISTOGRAM_MS = [0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf')]
+
+def diagnostik_aktif():
+    return st.query_params.get("diagnostik") == "1" or get_konfigurasi().diagnostik_tampil
+
+def halaman_diagnostik():
+    import pandas as pd
+    st.header("Diagnostik Query")
+    instrumen = get_instrumen()
+    if st.button("Kosongkan Catatan"):
+        instrumen.kosongkan()
+    status = get_status_replika()
+    if status is not None:
+        lag = status.lag()
+        if status.galat:
+            st.warning(f"Replika tidak bisa dipakai, baca ke primer: {status.galat}")
+        elif lag is None or lag > status.batas_lag:
+            st.warning(f"Replika tertinggal lebih dari {status.batas_lag:g} detik, baca ke primer.")
+        else:
+            st.caption(f"Replika menyusul primer {lag:.1f} detik yang lalu.")
+    catatan, lambat = instrumen.salinan()
+    if not catatan:
+        st.info("Belum ada catatan query.")
+        return
+
+    df = pd.DataFrame(catatan, columns=['Waktu', 'Fungsi', 'Fase', 'Durasi', 'Gagal'])
+    df['ms'] = df['Durasi'] * 1000
+    st.caption(f"{len(df)} catatan terakhir (buffer {instrumen.catatan.maxlen}), "
+               f"ambang query lambat {instrumen.ambang_lambat_ms:.0f} ms.")
+
+    st.subheader("Fungsi Paling Berat")
+    ringkasan = df.groupby(['Fungsi', 'Fase'])['ms'].agg(
+        Jumlah='count',
+        p50=lambda d: d.quantile(0.50),
+        p95=lambda d: d.quantile(0.95),
+        p99=lambda d: d.quantile(0.99),
+        Maks='max',
+        Total='sum',
+    )
+    ringkasan['Gagal'] = df.groupby(['Fungsi', 'Fase'])['Gagal'].sum()
+    st.dataframe(ringkasan.sort_values('Total', ascending=False).round(1))
+
+    st.subheader("Histogram Durasi")
+    fase = st.selectbox("Fase", ["Semua"] + sorted(df['Fase'].unique()), key="fase_histogram")
+    durasi = df['ms'] if fase == "Semua" else df.loc[df['Fase'] == fase, 'ms']
+    label = [f"{a:g}-{b:g} ms" if b != float('inf') else f">{a:g} ms"
+             for a, b in zip(BATAS_HISTOGRAM_MS, BATAS_HISTOGRAM_MS[1:])]
+    kelompok = pd.cut(durasi, BATAS_HISTOGRAM_MS, labels=label, right=False)
+    st.bar_chart(kelompok.value_counts(sort=False).rename("Jumlah"))
+
+    st.subheader("Query Lambat dan Gagal Terakhir")
+    if lambat:
+        df_lambat = pd.DataFrame(lambat, columns=['Waktu', 'Fungsi', 'Fase', 'Durasi', 'Gagal', 'Query', 'Parameter'])
+        df_lambat['Waktu'] = pd.to_datetime(df_lambat['Waktu'], unit='s')
+        df_lambat['ms'] = (df_lambat.pop('Durasi') * 1000).round(1)
+        st.dataframe(df_lambat.iloc[::-1])
+    else:
+        st.info("Belum ada query di atas ambang.")
 
 # -------------------- MAIN APP --------------------
+def halaman_beranda():
+    st.subheader("Selamat Datang di Restorify")
+    st.write("""
+        Aplikasi ini membantu Anda dalam mengelola operasi restoran secara efisien.
+        Anda dapat mengelola data karyawan, pelanggan, supplier, bahan baku, menu, transaksi,
+        feedback, dan juga fitur absensi sidik jari (mockup). Tubes Manajemen Data (Radhitya, Chindy, Hasyir)
+    """)
+    st.image(
+        "https://img.freepik.com/free-vector/woman-wearing-medical-mask-client_52683-41295.jpg",
+        use_container_width=True
+    )
+
+def halaman_laporan():
+    st.header("Laporan Sistem Manajemen Restoran")
+    if st.toggle("Mode dasbor (semua laporan)", key="mode_dasbor_laporan"):
+        dasbor_laporan(pilih_rentang('laporan'))
+        return
+    laporan_options = [*LAPORAN, MATRIKS_ABSENSI]
+    selected_laporan = st.selectbox("Pilih Laporan", laporan_options)
+    rentang = pilih_rentang('laporan') if LAPORAN.get(selected_laporan, {}).get('rentang') else None
+    
+    if selected_laporan == "Total Transaksi per Hari":
+        if st.button("Hitung Ulang Rekap"):
+            hitung_ulang_rekap_harian()
+        total_transaksi_per_hari(rentang)
+    elif selected_laporan == "Stok Bahan Baku":
+        stok_bahan_baku_laporan()
+    elif selected_laporan == "Feedback per Karyawan":
+        if st.button("Hitung Ulang Rating"):
+            hitung_ulang_rating_karyawan()
+        feedback_per_karyawan(rentang)
+        tren_rating_karyawan(rentang)
+    elif selected_laporan == "Absensi per Karyawan":
+        absensi_per_karyawan(rentang)
+    elif selected_laporan == MATRIKS_ABSENSI:
+        matriks_absensi_bulanan()
+
+# Menu navigasi -> fungsi halaman; hanya halaman yang dipilih yang dibangun
+HALAMAN = {
+    "Beranda": halaman_beranda,
+    "Karyawan": manage_karyawan,
+    "Pelanggan": manage_pelanggan,
+    "Supplier": manage_supplier,
+    "Bahan Baku": manage_bahan_baku,
+    "Menu": manage_menu,
+    "Transaksi": manage_transaksi,
+    "Feedback": manage_feedback,
+    "Absensi Sidik Jari": manage_absensi,
+    "Laporan": halaman_laporan,
+    "Diagnostik": halaman_diagnostik,
+}
+
 def main():
     st.set_page_config(page_title="Restorify", layout="wide")
     st.title("Restorify")
+    pilih_outlet()
+    with st.sidebar:
+        status_jurnal()
+    periksa_skema_saat_mulai()
+    notifikasi_stok()
 
-    
-    menu_options = [
-        "Beranda",
-        "Karyawan",
-        "Pelanggan",
-        "Supplier",
-        "Bahan Baku",
-        "Menu",
-        "Transaksi",
-        "Feedback",
-        "Absensi Sidik Jari",
-        "Laporan"  # Tambahkan menu laporan
-    ]
-    
+    menu_options = [nama for nama in HALAMAN if nama != "Diagnostik" or diagnostik_aktif()]
     selected_menu = st.sidebar.selectbox("Navigasi", menu_options)
-    
-    if selected_menu == "Beranda":
-        st.subheader("Selamat Datang di Restorify")
-        st.write("""
-            Aplikasi ini membantu Anda dalam mengelola operasi restoran secara efisien.
-            Anda dapat mengelola data karyawan, pelanggan, supplier, bahan baku, menu, transaksi,
-            feedback, dan juga fitur absensi sidik jari (mockup). Tubes Manajemen Data (Radhitya, Chindy, Hasyir)
-        """)
-        st.image(
-            "https://img.freepik.com/free-vector/woman-wearing-medical-mask-client_52683-41295.jpg",
-            use_container_width=True
-        )
-    
-    elif selected_menu == "Karyawan":
-        manage_karyawan()
-    
-    elif selected_menu == "Pelanggan":
-        manage_pelanggan()
-    
-    elif selected_menu == "Supplier":
-        manage_supplier()
-    
-    elif selected_menu == "Bahan Baku":
-        manage_bahan_baku()
-    
-    elif selected_menu == "Menu":
-        manage_menu()
-    
-    elif selected_menu == "Transaksi":
-        manage_transaksi()
-    
-    elif selected_menu == "Feedback":
-        manage_feedback()
-    
-    elif selected_menu == "Absensi Sidik Jari":
-        manage_absensi()
-    
-    elif selected_menu == "Laporan":
-        st.header("Laporan Sistem Manajemen Restoran")
-        laporan_options = ["Total Transaksi per Hari", "Stok Bahan Baku", "Feedback per Karyawan", "Absensi per Karyawan"]
-        selected_laporan = st.selectbox("Pilih Laporan", laporan_options)
-        
-        if selected_laporan == "Total Transaksi per Hari":
-            total_transaksi_per_hari()
-        elif selected_laporan == "Stok Bahan Baku":
-            stok_bahan_baku_laporan()
-        elif selected_laporan == "Feedback per Karyawan":
-            feedback_per_karyawan()
-        elif selected_laporan == "Absensi per Karyawan":
-            absensi_per_karyawan()
+    HALAMAN[selected_menu]()
 
 # -------------------- PENUTUP --------------------
 if __name__ == "__main__":
@@ -0,0 +1,553 @@
+# Database Restorify butuh PostgreSQL 15 atau lebih baru (partisi bulanan, migrasi 5).
+# Perintah pemeliharaan database Restorify, dijalankan di luar Streamlit:
+#   python kelola.py migrasi            jalankan migrasi skema yang belum diterapkan
+#   python kelola.py migrasi --status   tampilkan versi skema saja
+#   python kelola.py rekap-harian       pasang tabel + trigger rekap harian lalu hitung ulang
+#   python kelola.py rating-karyawan    pasang tabel + trigger agregat rating karyawan lalu hitung ulang
+#   python kelola.py indeks-pencarian   buat indeks trigram/awalan untuk pemilih baris
+#   python kelola.py partisi            buat partisi bulanan transaksi/absensi untuk bulan-bulan mendatang
+#   python kelola.py sidik-jari LOG     masukkan punch dari log mesin sidik jari ke absensi
+#       --ikuti                         terus pantau LOG dan proses baris baru (seperti tail -f)
+#       --outlet ID                     cocokkan Fingerprint ID dengan karyawan outlet ini saja
+#   python kelola.py seed --ganti       isi database lokal dengan data sintetis (volume bisa diatur)
+#   python kelola.py benchmark          ukur halaman Lihat, laporan dan CRUD lewat AppTest, tulis JSON
+#       --banding LAMA.json             bandingkan dengan hasil sebelumnya, tandai regresi
+#   python kelola.py waktu-impor        cek waktu `import app` terhadap anggaran (tanpa database)
+#   python kelola.py jurnal             kirim ulang jurnal offline ke semua database, tampilkan yang ditolak
+#       --buang-ditolak                 hapus entri yang ditolak database setelah diperiksa
+# Database outlet lain (bagian secrets yang dirujuk [outlet]) dipilih dengan
+#   python kelola.py --database NAMA <perintah>, mis. untuk menjalankan migrasi di tiap database.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime
+
+from psycopg2 import sql
+
+import app
+
+# -------------------- PERINTAH --------------------
+def perintah_migrasi(conn, args):
+    versi = app.versi_skema(conn)
+    print(f"Versi skema database: {versi}, terbaru: {app.VERSI_SKEMA_TERBARU}")
+    if args.status:
+        return
+    for versi, keterangan in app.jalankan_migrasi(conn):
+        print(f"  migrasi {versi}: {keterangan}")
+    print(f"Skema di versi {app.versi_skema(conn)}.")
+
+def perintah_rekap_harian(conn, args):
+    jumlah_hari = app.pasang_rekap_harian(conn)
+    print(f"Rekap harian terpasang dan dihitung ulang ({jumlah_hari} baris outlet per hari).")
+
+def perintah_rating_karyawan(conn, args):
+    jumlah_karyawan = app.pasang_rating_karyawan(conn)
+    print(f"Agregat rating karyawan terpasang dan dihitung ulang ({jumlah_karyawan} karyawan).")
+
+def perintah_indeks_pencarian(conn, args):
+    if app.pasang_indeks_pencarian(conn):
+        print("Indeks pencarian (trigram + awalan ID) terpasang.")
+    else:
+        print("Ekstensi pg_trgm tidak tersedia; hanya indeks awalan ID yang dipasang.")
+
+def perintah_partisi(conn, args):
+    # Dijalankan berkala (mis. cron bulanan) agar data baru tidak menumpuk di partisi DEFAULT
+    sampai = app.tambah_bulan(date.today(), args.bulan_depan)
+    with conn.cursor() as cursor:
+        for tabel in app.TABEL_PARTISI:
+            if not app.tabel_berpartisi(cursor, tabel):
+                print(f"{tabel}: belum dipartisi, jalankan `python kelola.py migrasi` dulu.")
+                continue
+            dibuat = app.buat_partisi_bulanan(conn, tabel, date.today(), sampai)
+            conn.commit()
+            print(f"{tabel}: {len(dibuat)} partisi baru" + (f" ({', '.join(dibuat)})" if dibuat else ""))
+            cursor.execute(sql.SQL('SELECT COUNT(*) FROM {}').format(sql.Identifier(f"{tabel}_default")))
+            sisa = cursor.fetchone()[0]
+            conn.commit()
+            if sisa:
+                print(f"  {sisa} baris di {tabel}_default (tanggal di luar partisi bulanan).")
+
+def perintah_sidik_jari(conn, args):
+    # Posisi byte terakhir yang sudah tersimpan dicatat di berkas offset, jadi
+    # ingester yang dijalankan ulang melanjutkan dari sana, bukan dari awal log.
+    berkas_offset = args.offset or args.log + '.offset'
+    posisi = 0
+    if os.path.exists(berkas_offset):
+        with open(berkas_offset) as f:
+            posisi = int(f.read().strip() or 0)
+
+    def simpan_posisi():
+        penerima.kirim()
+        with open(berkas_offset, 'w') as f:
+            f.write(str(posisi))
+
+    penerima = app.PenerimaSidikJari(conn, args.outlet)
+    with open(args.log, 'rb') as log:
+        if os.fstat(log.fileno()).st_size < posisi:
+            posisi = 0  # log dirotasi / dipotong
+        log.seek(posisi)
+        try:
+            while True:
+                baris = log.readline()
+                if baris.endswith(b'\n') or (baris and not args.ikuti):
+                    posisi = log.tell()
+                    if penerima.terima(baris.decode('utf-8', 'replace')):
+                        simpan_posisi()
+                    continue
+                # Akhir berkas (atau baris yang belum selesai ditulis mesin)
+                log.seek(posisi)
+                simpan_posisi()
+                if not args.ikuti:
+                    break
+                if os.fstat(log.fileno()).st_size < posisi:
+                    posisi = 0
+                    log.seek(0)
+                time.sleep(args.jeda)
+        except KeyboardInterrupt:
+            simpan_posisi()
+    s = penerima.statistik
+    print(f"{s['dibaca']} baris dibaca: {s['disimpan']} absensi tersimpan, {s['duplikat']} duplikat, "
+          f"{s['tidak_dikenal']} fingerprint tidak dikenal, {s['format_salah']} format salah.")
+
+# -------------------- DATA SINTETIS --------------------
+# Semua baris dibangkitkan di server dengan generate_series, jadi jutaan baris
+# tidak melewati jaringan. setseed per tabel membuat hasilnya sama tiap dijalankan
+# dengan --acak yang sama. Tanggal condong ke hari-hari terakhir dan sebagian kecil
+# pelanggan menjadi pelanggan tetap (distribusi pangkat), mirip data restoran asli.
+# Outlet pertama (UTAMA) mendapat karyawan terbanyak, jadi datanya paling besar;
+# transaksi, feedback dan absensi ikut outlet karyawannya, bahan baku ada di tiap outlet.
+SEED_SQL = [
+    ('outlet', '''
+        INSERT INTO outlet (outlet_id, nama_outlet)
+        SELECT CASE WHEN g = 1 THEN 'UTAMA' ELSE 'CBG' || lpad(g::text, 2, '0') END,
+               CASE WHEN g = 1 THEN 'Outlet Utama' ELSE 'Cabang ' || g END
+        FROM generate_series(1, %(outlet)s) g
+    '''),
+    ('supplier', '''
+        INSERT INTO supplier (supplier_id, supplier_name, address)
+        SELECT 'S' || lpad(g::text, 5, '0'), 'Supplier ' || g, 'Jl. Pasar No. ' || g
+        FROM generate_series(1, %(supplier)s) g
+    '''),
+    ('bahan_baku', '''
+        INSERT INTO bahan_baku (bahan_id, nama_bahan, stock, satuan, harga_bahan, supplier_id, stok_minimum, outlet_id)
+        SELECT 'B' || lpad(g::text, 6, '0'), 'Bahan ' || g, round((random() * 500)::numeric, 2),
+               (ARRAY['kg', 'liter', 'pcs', 'gram', 'pack'])[1 + floor(random() * 5)::int],
+               round((1000 + random() * 99000)::numeric, -2),
+               'S' || lpad((1 + floor(random() * %(supplier)s))::int::text, 5, '0'),
+               round((random() * 50)::numeric), o.outlet_id
+        FROM generate_series(1, %(bahan_baku)s) g CROSS JOIN outlet o
+    '''),
+    ('menu', '''
+        INSERT INTO menu (menu_id, nama_menu, harga)
+        SELECT 'M' || lpad(g::text, 5, '0'), 'Menu ' || g, round((10000 + random() * 90000)::numeric / 500) * 500
+        FROM generate_series(1, %(menu)s) g
+    '''),
+    ('karyawan', '''
+        INSERT INTO karyawan (karyawan_id, employee_name, position, fingerprint_id, outlet_id)
+        SELECT 'K' || lpad(g::text, 6, '0'), 'Karyawan ' || g,
+               (ARRAY['Chef', 'Waiter', 'Kasir', 'Barista', 'Manajer'])[1 + floor(random() * 5)::int], g::text,
+               o.daftar[1 + floor(cardinality(o.daftar) * power(random(), 2))::int]
+        FROM generate_series(1, %(karyawan)s) g
+        CROSS JOIN (SELECT array_agg(outlet_id ORDER BY outlet_id <> 'UTAMA', outlet_id) AS daftar FROM outlet) o
+    '''),
+    ('pelanggan', '''
+        INSERT INTO pelanggan (pelanggan_id, cus_name, contact_info)
+        SELECT 'P' || lpad(g::text, 8, '0'), 'Pelanggan ' || g, '08' || lpad(floor(random() * 1e10)::bigint::text, 10, '0')
+        FROM generate_series(1, %(pelanggan)s) g
+    '''),
+    ('transaksi', '''
+        INSERT INTO transaksi (transaksi_id, tanggal_pembelian, pelanggan_id, karyawan_id, total_transaksi, outlet_id)
+        SELECT x.*, k.outlet_id
+        FROM (
+            SELECT 'T' || lpad(g::text, 10, '0'),
+                   %(hari_ini)s::date - floor(%(hari)s * power(random(), 1.6))::int,
+                   'P' || lpad((1 + floor(%(pelanggan)s * power(random(), 2.5)))::int::text, 8, '0'),
+                   'K' || lpad((1 + floor(random() * %(karyawan)s))::int::text, 6, '0') AS karyawan_id,
+                   round((15000 + random() * 185000)::numeric / 500) * 500
+            FROM generate_series(1, %(transaksi)s) g
+        ) x JOIN karyawan k USING (karyawan_id)
+    '''),
+    ('feedback', '''
+        INSERT INTO feedback (feedback_id, pelanggan_id, karyawan_id, tanggal, rating, komentar, outlet_id)
+        SELECT x.*, k.outlet_id
+        FROM (
+            SELECT 'F' || lpad(g::text, 9, '0'),
+                   'P' || lpad((1 + floor(%(pelanggan)s * power(random(), 2.5)))::int::text, 8, '0'),
+                   'K' || lpad((1 + floor(random() * %(karyawan)s))::int::text, 6, '0') AS karyawan_id,
+                   %(hari_ini)s::date - floor(%(hari)s * power(random(), 1.6))::int,
+                   LEAST(5, 1 + floor(5 * power(random(), 0.4)))::int,
+                   (ARRAY['Enak', 'Pelayanan cepat', 'Kurang panas', 'Porsi pas', NULL])[1 + floor(random() * 5)::int]
+            FROM generate_series(1, %(feedback)s) g
+        ) x JOIN karyawan k USING (karyawan_id)
+    '''),
+    # Satu baris per karyawan per hari, dari hari terbaru mundur sampai jumlahnya tercapai
+    ('absensi', '''
+        INSERT INTO absensi (absensi_id, karyawan_id, tanggal, status, outlet_id)
+        SELECT 'A' || lpad(row_number() OVER ()::text, 10, '0'), karyawan_id, tanggal,
+               CASE WHEN r < 0.90 THEN 'Hadir' WHEN r < 0.94 THEN 'Izin' WHEN r < 0.97 THEN 'Cuti' ELSE 'Tidak Hadir' END,
+               outlet_id
+        FROM (
+            SELECT k.karyawan_id, k.outlet_id, d::date AS tanggal, random() AS r
+            FROM generate_series(%(hari_ini)s::date - %(hari)s, %(hari_ini)s::date, interval '1 day') d
+            CROSS JOIN karyawan k
+            ORDER BY d DESC, k.karyawan_id
+            LIMIT %(absensi)s
+        ) x
+    '''),
+]
+
+def perintah_seed(conn, args):
+    volume = {tabel: getattr(args, tabel) for tabel, _ in SEED_SQL}
+    volume.update(hari=args.hari, hari_ini=date.today())
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL(' UNION ALL ').join(
+            sql.SQL('SELECT EXISTS (SELECT 1 FROM {})').format(sql.Identifier(t)) for t in app.TABEL
+        ))
+        if any(ada for ada, in cursor.fetchall()) and not args.ganti:
+            print("Database tidak kosong; pakai --ganti untuk mengosongkan semua tabel dulu.", file=sys.stderr)
+            return 1
+        cursor.execute(sql.SQL('TRUNCATE {} CASCADE').format(
+            sql.SQL(', ').join(map(sql.Identifier, ['outlet', *app.TABEL]))))
+        for tabel in app.TABEL_PARTISI:
+            if app.tabel_berpartisi(cursor, tabel):
+                app.buat_partisi_bulanan(conn, tabel, date.fromordinal(date.today().toordinal() - args.hari),
+                                         app.tambah_bulan(date.today(), app.BULAN_DEPAN_PARTISI))
+        conn.commit()
+
+        for urutan, (tabel, query) in enumerate(SEED_SQL):
+            mulai = time.perf_counter()
+            cursor.execute('SELECT setseed(%s)', (((args.acak + urutan) % 1000) / 1000,))
+            # ID sintetis sudah unik dan rekap dihitung ulang sekali di akhir,
+            # jadi trigger buatan sendiri (bukan FK) dimatikan selama insert massal
+            cursor.execute(sql.SQL('ALTER TABLE {} DISABLE TRIGGER USER').format(sql.Identifier(tabel)))
+            cursor.execute(query, volume)
+            jumlah = cursor.rowcount
+            cursor.execute(sql.SQL('ALTER TABLE {} ENABLE TRIGGER USER').format(sql.Identifier(tabel)))
+            conn.commit()
+            print(f"{tabel}: {jumlah} baris ({time.perf_counter() - mulai:.1f} s)")
+
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL, to_regclass(%s) IS NOT NULL',
+                       ('transaksi_harian', 'rating_karyawan'))
+        rekap, rating = cursor.fetchone()
+        conn.commit()
+    if rekap:
+        print(f"Rekap harian dihitung ulang ({app.bangun_ulang_rekap_harian(conn)} baris outlet per hari).")
+    if rating:
+        print(f"Rating karyawan dihitung ulang ({app.bangun_ulang_rating_karyawan(conn)} karyawan).")
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    finally:
+        conn.autocommit = False
+
+# -------------------- JURNAL OFFLINE --------------------
+# Sama dengan yang dilakukan sidebar aplikasi tiap beberapa detik; berguna
+# setelah database pulih saat tidak ada sesi Streamlit yang terbuka.
+def perintah_jurnal(conn, args):
+    jurnal = app.get_jurnal()
+    gagal = False
+    for database in jurnal.database_menunggu():
+        try:
+            diterapkan, ditolak = app.kirim_ulang_jurnal(database)
+        except Exception as e:
+            print(f"[{database}] belum bisa dikirim: {e}", file=sys.stderr)
+            gagal = True
+            continue
+        print(f"[{database}] {diterapkan} entri dikirim, {ditolak} ditolak.")
+    for dicatat, outlet, tabel, jenis, params, galat in jurnal.daftar_ditolak():
+        print(f"  ditolak {dicatat} {outlet} {jenis} {tabel} {params[0] if params else ''}: {galat}")
+    if args.buang_ditolak:
+        print(f"{jurnal.buang_ditolak()} entri ditolak dibuang.")
+    menunggu, ditolak = jurnal.jumlah()
+    print(f"Jurnal offline: {menunggu} menunggu, {ditolak} ditolak.")
+    return 1 if gagal else None
+
+# -------------------- BENCHMARK --------------------
+# Tiap skenario dijalankan lewat AppTest seperti sesi pengguna sungguhan: halaman
+# Lihat dan laporan diukur "dingin" (cache baca dibatalkan dulu) dan "hangat"
+# (rerun yang sama), CRUD lewat fungsi repositori. Hasil ditulis ke JSON supaya
+# bisa dibandingkan antar-run dengan --banding.
+HALAMAN = {
+    'karyawan': "Karyawan",
+    'pelanggan': "Pelanggan",
+    'supplier': "Supplier",
+    'bahan_baku': "Bahan Baku",
+    'menu': "Menu",
+    'transaksi': "Transaksi",
+    'feedback': "Feedback",
+    'absensi': "Absensi Sidik Jari",
+}
+SKRIP_CRUD = '''
+import sys
+sys.path.insert(0, {folder!r})
+import datetime
+import app
+app.{fungsi}({argumen})
+'''
+
+def _pilih(at, label, nilai):
+    next(w for w in at.selectbox if w.label == label).select(nilai)
+
+def _ukur_run(at, timeout):
+    mulai = time.perf_counter()
+    at.run(timeout=timeout)
+    durasi = (time.perf_counter() - mulai) * 1000
+    gagal = [str(e.value) for e in at.exception] + [e.value for e in at.error]
+    return durasi, gagal
+
+def _bersihkan_cache():
+    for tabel in app.TABEL:
+        app.naikkan_versi(tabel)
+
+def _ukur_halaman(siapkan, ulang, timeout):
+    from streamlit.testing.v1 import AppTest
+    hasil = {'dingin_ms': [], 'hangat_ms': [], 'gagal': []}
+    for _ in range(ulang):
+        at = AppTest.from_file(app.__file__, default_timeout=timeout)
+        at.run()
+        siapkan(at)
+        _bersihkan_cache()
+        for jenis in ('dingin_ms', 'hangat_ms'):
+            durasi, gagal = _ukur_run(at, timeout)
+            hasil[jenis].append(round(durasi, 1))
+            hasil['gagal'] += gagal
+    return hasil
+
+def _buka_lihat(halaman):
+    def siapkan(at):
+        _pilih(at, "Navigasi", halaman)
+        at.run()
+        _pilih(at, "Pilih Aksi", "Lihat")
+    return siapkan
+
+def _buka_laporan(nama):
+    def siapkan(at):
+        _pilih(at, "Navigasi", "Laporan")
+        at.run()
+        _pilih(at, "Pilih Laporan", nama)
+    return siapkan
+
+def _buka_dasbor(at):
+    _pilih(at, "Navigasi", "Laporan")
+    at.run()
+    at.toggle(key="mode_dasbor_laporan").set_value(True)
+
+def _nilai_contoh(conn, tabel):
+    meta = app.TABEL[tabel]
+    nilai = {}
+    with conn.cursor() as cursor:
+        for kolom, tipe in zip(meta['kolom'], meta['tipe']):
+            if kolom == meta['kunci']:
+                continue
+            if kolom in meta['fk']:
+                tabel_ref, kolom_ref = meta['fk'][kolom]
+                cursor.execute(sql.SQL('SELECT {} FROM {} LIMIT 1').format(
+                    sql.Identifier(kolom_ref), sql.Identifier(tabel_ref)))
+                baris = cursor.fetchone()
+                nilai[kolom] = baris[0] if baris else None
+            else:
+                nilai[kolom] = {'numeric': 1000, 'integer': 4, 'date': date.today()}.get(tipe, "Benchmark")
+        cursor.execute(sql.SQL('DELETE FROM {} WHERE {} = %s').format(
+            sql.Identifier(tabel), sql.Identifier(meta['kunci'])), (f"BENCH-{tabel}",))
+    conn.commit()
+    return nilai
+
+def _ukur_crud(conn, tabel, ulang, timeout):
+    from streamlit.testing.v1 import AppTest
+    kunci = f"BENCH-{tabel}"
+    nilai = _nilai_contoh(conn, tabel)
+    folder = os.path.dirname(os.path.abspath(app.__file__))
+    langkah = {
+        'tambah': ('tambah_baris', f"{tabel!r}, **{ {app.TABEL[tabel]['kunci']: kunci, **nilai}!r}"),
+        'perbarui': ('perbarui_baris', f"{tabel!r}, {kunci!r}, **{nilai!r}"),
+        'hapus': ('hapus_baris', f"{tabel!r}, {kunci!r}"),
+    }
+    hasil = {}
+    for _ in range(ulang):
+        for nama, (fungsi, argumen) in langkah.items():
+            at = AppTest.from_string(SKRIP_CRUD.format(folder=folder, fungsi=fungsi, argumen=argumen),
+                                     default_timeout=timeout)
+            durasi, gagal = _ukur_run(at, timeout)
+            catatan = hasil.setdefault(f"crud:{tabel}:{nama}", {'waktu_ms': [], 'gagal': []})
+            catatan['waktu_ms'].append(round(durasi, 1))
+            catatan['gagal'] += gagal + [w.value for w in at.warning]
+    return hasil
+
+def _median(hasil):
+    return {k.replace('_ms', ''): round(statistics.median(v), 1) for k, v in hasil.items() if k.endswith('ms') and v}
+
+def perintah_benchmark(conn, args):
+    skenario = {}
+    for tabel, halaman in HALAMAN.items():
+        skenario[f"lihat:{tabel}"] = _ukur_halaman(_buka_lihat(halaman), args.ulang, args.timeout)
+    for nama in app.LAPORAN:
+        skenario[f"laporan:{nama}"] = _ukur_halaman(_buka_laporan(nama), args.ulang, args.timeout)
+    skenario["laporan:dasbor"] = _ukur_halaman(_buka_dasbor, args.ulang, args.timeout)
+    skenario["laporan:matriks_absensi"] = _ukur_halaman(_buka_laporan(app.MATRIKS_ABSENSI), args.ulang, args.timeout)
+    for tabel in app.TABEL:
+        skenario.update(_ukur_crud(conn, tabel, args.ulang, args.timeout))
+    for nama, hasil in skenario.items():
+        hasil['median_ms'] = _median(hasil)
+        hasil['gagal'] = sorted(set(hasil['gagal']))
+        print(f"{nama:45s} " + "  ".join(f"{k} {v:8.1f} ms" for k, v in hasil['median_ms'].items())
+              + ("  GAGAL" if hasil['gagal'] else ""))
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(app.__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    keluaran = {
+        'dibuat': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'ulang': args.ulang,
+        'jumlah_baris': {tabel: app.perkiraan_jumlah_baris(tabel)[0] for tabel in app.TABEL},
+        'skenario': skenario,
+    }
+    with open(args.keluaran, 'w') as f:
+        json.dump(keluaran, f, indent=2, default=str)
+    print(f"Hasil ditulis ke {args.keluaran}")
+
+    if args.banding:
+        with open(args.banding) as f:
+            lama = json.load(f)['skenario']
+        regresi = 0
+        print(f"\nDibandingkan dengan {args.banding} (toleransi {args.toleransi:.0%}):")
+        for nama, hasil in skenario.items():
+            for jenis, median in hasil['median_ms'].items():
+                sebelum = lama.get(nama, {}).get('median_ms', {}).get(jenis)
+                if not sebelum:
+                    continue
+                rasio = median / sebelum
+                tanda = "REGRESI" if rasio > 1 + args.toleransi else ""
+                regresi += bool(tanda)
+                print(f"{nama:45s} {jenis:7s} {sebelum:8.1f} -> {median:8.1f} ms  x{rasio:.2f} {tanda}")
+        if regresi:
+            print(f"{regresi} skenario melambat melewati toleransi.")
+            return 1
+
+# -------------------- WAKTU IMPOR --------------------
+# Server Streamlit sudah memuat streamlit sebelum app.py dijalankan, jadi yang
+# diukur hanya tambahan `import app` di interpreter baru. Modul berat hanya boleh
+# dimuat oleh halaman yang memakainya, bukan saat impor.
+MODUL_BERAT = ['pandas', 'pyarrow', 'numpy', 'psycopg2.extras', 'altair', 'plotly']
+ANGGARAN_IMPOR_MS = 150
+PENANDA_IMPOR = '--- import app ---'
+SKRIP_WAKTU_IMPOR = '''
+import sys, time
+sys.path.insert(0, {folder!r})
+import streamlit
+print({penanda!r}, file=sys.stderr, flush=True)
+mulai = time.perf_counter()
+import app
+print(time.perf_counter() - mulai)
+print(",".join(m for m in {berat!r} if m in sys.modules))
+'''
+
+def _ukur_impor():
+    skrip = SKRIP_WAKTU_IMPOR.format(folder=os.path.dirname(os.path.abspath(app.__file__)),
+                                     penanda=PENANDA_IMPOR, berat=MODUL_BERAT)
+    hasil = subprocess.run([sys.executable, '-X', 'importtime', '-c', skrip],
+                           capture_output=True, text=True, check=True)
+    durasi, berat = hasil.stdout.splitlines()[-2:]
+    # Baris -X importtime setelah penanda: "import time: self | kumulatif | modul"
+    modul = []
+    for baris in hasil.stderr.split(PENANDA_IMPOR, 1)[-1].splitlines():
+        bagian = baris.split('|')
+        if baris.startswith('import time:') and bagian[1].strip().isdigit():
+            modul.append((int(bagian[1]) / 1000, bagian[2].rstrip()))
+    return float(durasi) * 1000, [m for m in berat.split(',') if m], modul
+
+def perintah_waktu_impor(conn, args):
+    pengukuran = [_ukur_impor() for _ in range(args.ulang)]
+    median = statistics.median(p[0] for p in pengukuran)
+    _, berat, modul = min(pengukuran, key=lambda p: p[0])
+    print(f"import app: median {median:.0f} ms dari {args.ulang} kali (anggaran {args.batas_ms:.0f} ms)")
+    print("Impor paling lambat (kumulatif):")
+    for ms, nama in sorted(modul, reverse=True)[:10]:
+        print(f"  {ms:8.1f} ms  {nama.strip()}")
+    gagal = False
+    if berat:
+        print(f"GAGAL: modul berat dimuat saat impor: {', '.join(berat)}")
+        gagal = True
+    if median > args.batas_ms:
+        print(f"GAGAL: melebihi anggaran {args.batas_ms:.0f} ms")
+        gagal = True
+    return 1 if gagal else None
+
+PERINTAH = {
+    'migrasi': (perintah_migrasi, "Jalankan migrasi skema yang belum diterapkan"),
+    'rekap-harian': (perintah_rekap_harian, "Pasang tabel + trigger rekap harian lalu hitung ulang"),
+    'rating-karyawan': (perintah_rating_karyawan, "Pasang tabel + trigger agregat rating karyawan lalu hitung ulang"),
+    'indeks-pencarian': (perintah_indeks_pencarian, "Buat indeks trigram/awalan untuk pemilih baris"),
+    'partisi': (perintah_partisi, "Buat partisi bulanan transaksi/absensi untuk bulan-bulan mendatang"),
+    'sidik-jari': (perintah_sidik_jari, "Masukkan punch dari log mesin sidik jari ke absensi"),
+    'seed': (perintah_seed, "Isi database lokal dengan data sintetis"),
+    'benchmark': (perintah_benchmark, "Ukur halaman Lihat, laporan dan CRUD lewat AppTest"),
+    'waktu-impor': (perintah_waktu_impor, "Cek waktu import app terhadap anggaran"),
+    'jurnal': (perintah_jurnal, "Kirim ulang jurnal offline ke database"),
+}
+# Perintah yang tidak memakai koneksi --database (jurnal membuka koneksi ke
+# tiap database yang punya entri sendiri)
+TANPA_DATABASE = {'waktu-impor', 'jurnal'}
+
+# -------------------- MAIN --------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="kelola.py", description="Pemeliharaan database Restorify")
+    parser.add_argument('--database', default=app.DATABASE_UTAMA,
+                        help="Bagian secrets database yang dipakai (bawaan: database)")
+    sub = parser.add_subparsers(dest='perintah', required=True)
+    parsers = {nama: sub.add_parser(nama, help=bantuan) for nama, (_, bantuan) in PERINTAH.items()}
+    parsers['migrasi'].add_argument('--status', action='store_true', help="Hanya tampilkan versi skema")
+    parsers['partisi'].add_argument('--bulan-depan', type=int, default=app.BULAN_DEPAN_PARTISI,
+                                    help="Jumlah bulan ke depan yang disiapkan partisinya")
+    parsers['sidik-jari'].add_argument('log', help="Berkas log mesin sidik jari")
+    parsers['sidik-jari'].add_argument('--ikuti', action='store_true', help="Terus pantau baris baru")
+    parsers['sidik-jari'].add_argument('--offset', help="Berkas posisi baca (bawaan: <log>.offset)")
+    parsers['sidik-jari'].add_argument('--jeda', type=float, default=1.0, help="Detik antar pemeriksaan saat --ikuti")
+    parsers['sidik-jari'].add_argument('--outlet', help="Hanya karyawan outlet ini (Fingerprint ID per mesin cabang)")
+    seed = parsers['seed']
+    seed.add_argument('--ganti', action='store_true', help="Kosongkan semua tabel sebelum mengisi")
+    seed.add_argument('--acak', type=int, default=42, help="Seed pembangkit acak (hasil sama untuk nilai sama)")
+    seed.add_argument('--hari', type=int, default=365, help="Rentang riwayat data dalam hari")
+    for tabel, bawaan in [('outlet', 3), ('supplier', 50), ('bahan_baku', 500), ('menu', 150), ('karyawan', 200),
+                          ('pelanggan', 50_000), ('transaksi', 500_000), ('feedback', 50_000), ('absensi', 60_000)]:
+        seed.add_argument(f"--{tabel.replace('_', '-')}", dest=tabel, type=int, default=bawaan,
+                          help=f"Jumlah baris {tabel}{' per outlet' if tabel == 'bahan_baku' else ''} (bawaan {bawaan})")
+    bench = parsers['benchmark']
+    bench.add_argument('--ulang', type=int, default=3, help="Jumlah pengulangan tiap skenario")
+    bench.add_argument('--timeout', type=float, default=120, help="Batas detik per run AppTest")
+    bench.add_argument('--keluaran', default='benchmark.json', help="Berkas JSON hasil")
+    bench.add_argument('--banding', help="JSON hasil sebelumnya untuk dibandingkan")
+    bench.add_argument('--toleransi', type=float, default=0.2, help="Batas perlambatan sebelum ditandai regresi")
+    impor = parsers['waktu-impor']
+    impor.add_argument('--batas-ms', type=float, default=ANGGARAN_IMPOR_MS, help="Anggaran waktu import app dalam ms")
+    impor.add_argument('--ulang', type=int, default=5, help="Jumlah pengukuran (diambil median)")
+    parsers['jurnal'].add_argument('--buang-ditolak', action='store_true',
+                                   help="Hapus entri yang ditolak database")
+    args = parser.parse_args(argv)
+
+    fungsi, _ = PERINTAH[args.perintah]
+    if args.perintah in TANPA_DATABASE:
+        return fungsi(None, args) or 0
+    if args.database not in app.get_konfigurasi().database:
+        print(f"Database {args.database!r} tidak dirujuk bagian [outlet] di secrets.", file=sys.stderr)
+        return 1
+    conn = app.get_pool(args.database).pinjam()
+    try:
+        return fungsi(conn, args) or 0
+    except Exception as e:
+        conn.rollback()
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        app.release_connection(conn)
+
+if __name__ == "__main__":
+    sys.exit(main())
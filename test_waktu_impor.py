@@ -0,0 +1,21 @@
+# Anggaran waktu `import app` (sama dengan `python kelola.py waktu-impor`);
+# diukur di interpreter baru, tanpa database.
+import statistics
+
+import pytest
+
+import kelola
+
+ULANG = 5
+
+@pytest.fixture(scope='module')
+def pengukuran():
+    return [kelola._ukur_impor() for _ in range(ULANG)]
+
+def test_import_app_dalam_anggaran(pengukuran):
+    median = statistics.median(durasi for durasi, _, _ in pengukuran)
+    assert median < kelola.ANGGARAN_IMPOR_MS, f"import app {median:.0f} ms, anggaran {kelola.ANGGARAN_IMPOR_MS} ms"
+
+def test_import_app_tanpa_modul_berat(pengukuran):
+    for _, berat, _ in pengukuran:
+        assert berat == [], f"modul berat dimuat saat import app: {', '.join(berat)}"